@@ -0,0 +1,353 @@
+"""
+Mesures de performance sur une nomenclature synthétique (sans affichage).
+
+Chemins mesurés : chargement (load_data), sauvegarde Excel (save_data),
+suppression d'un sous-arbre (delete_node), import en masse (do_import)
+et migration par niveaux (migrate_data.migrate). L'application est construite
+sur un Treeview en mémoire (HeadlessTreeview) : aucun écran n'est nécessaire.
+Pour chaque mesure : durée (s) et pic mémoire Python (tracemalloc, Mo), écrits en JSON.
+
+    python benchmark.py --nodes 1000 10000 100000 --depth 6 --fan-out 8 --output resultats.json
+    python benchmark.py --nodes 1000000 --only load save --backend sqlite --no-memory
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import pandas as pd
+
+from tree_core import TreeCore
+from tree_model import TreeModel
+from storage import ExcelStorage, SQLiteStorage
+from save_worker import SaveWorker
+from excel_export import write_styled_workbook
+from search_index import SearchIndex
+from where_used import WhereUsedIndex
+from rollup import RollupIndex
+from bulk_import import DEFAULT_LAYOUT
+import tree_app
+
+# Dossier des scripts racine (migrate_data.py)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS = ("load", "save", "delete", "import", "migrate")
+
+WORDS = ["BEARING", "ROLLER", "GUIDE", "SHAFT", "SCREW", "NUT", "WASHER", "BRACKET", "MOTOR", "SENSOR",
+         "VALVE", "SPRING", "COVER", "PLATE", "PIPE", "SEAL", "GEAR", "CHAIN", "BELT", "PULLEY"]
+
+
+# ====== Nomenclature synthétique ======
+
+def synthetic_bom(nodes, depth=6, fan_out=8, text_length=30, orphan_rate=0.0, seed=0):
+    """DataFrame (ID, ParentID, Position, PartNumber, Description) d'un arbre de nodes noeuds.
+    Chaque parent reçoit en moyenne fan_out enfants, sur au plus depth niveaux ; une part
+    orphan_rate des noeuds pointe vers un parent inexistant (rattachés à la racine au chargement)."""
+    rng = random.Random(seed)
+    ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(nodes)]
+    parent_ids = [""] * nodes
+    # File des parents encore ouverts : (rang du noeud, niveau, enfants restants)
+    frontier = []
+    head = 0
+    for i in range(nodes):
+        while head < len(frontier) and frontier[head][2] == 0:
+            head += 1
+        if head < len(frontier):
+            parent, level, remaining = frontier[head]
+            frontier[head] = (parent, level, remaining - 1)
+            parent_ids[i] = ids[parent]
+            level += 1
+        else:
+            level = 0
+        if level < depth - 1:
+            frontier.append((i, level, rng.randint(1, 2 * fan_out - 1)))
+    for i in range(nodes):
+        if parent_ids[i] and rng.random() < orphan_rate:
+            parent_ids[i] = f"ORPHELIN-{i}"
+
+    def text(prefix_length):
+        words = []
+        length = 0
+        while length < text_length - prefix_length:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)[:max(text_length - prefix_length, 1)]
+
+    return pd.DataFrame({
+        "ID": ids,
+        "ParentID": parent_ids,
+        "Position": [f"{(i % 99 + 1) * 10:04d}" for i in range(nodes)],
+        "PartNumber": [f"{rng.randint(1000000, 9999999)}-{rng.randint(0, 9999):04d}" for _ in range(nodes)],
+        "Description": [f"{text(8)}, {rng.randint(1, 99)}X{rng.randint(1, 99)}" for _ in range(nodes)],
+    })
+
+
+def level_rows(df):
+    """Même arbre au format par niveaux (Position, PartNumber, Description, Niveau) en ordre préfixe,
+    comme le fichier source de migrate_data."""
+    model, _ = TreeModel.from_dataframe(df)
+    rows = []
+    for node_id, level in model.walk():
+        node = model.nodes[node_id]
+        rows.append((node["position"], node["part_number"], node["description"], level))
+    return pd.DataFrame(rows, columns=["Position", "PartNumber", "Description", "Niveau"])
+
+
+def fixed_width_text(lines, seed=0):
+    """Texte à colonnes fixes (format de DEFAULT_LAYOUT) pour l'import en masse."""
+    rng = random.Random(seed)
+    return "\n".join(f"{(i % 99 + 1) * 10:03d}"[-3:] + f" {rng.randint(1000000, 9999999)}-{i % 10000:04d}"
+                     + f"   {rng.choice(WORDS)} {rng.choice(WORDS)} {i}. reste" for i in range(lines))
+
+
+# ====== Application sans affichage ======
+
+class HeadlessTreeview:
+    """Treeview en mémoire : mêmes appels que ttk.Treeview pour les chemins mesurés.
+    Les enfants sont gardés dans un dict ordonné pour que la suppression coûte O(1), comme dans Tk."""
+
+    def __init__(self):
+        self.items = {"": {"parent": None, "children": {}, "text": "", "values": (), "open": False}}
+        self._selection = ()
+        self._focus = ""
+
+    def _attach(self, item, parent, index):
+        children = self.items[parent]["children"]
+        if index == "end" or int(index) >= len(children):
+            children[item] = None
+        else:
+            order = list(children)
+            order.insert(int(index), item)
+            self.items[parent]["children"] = dict.fromkeys(order)
+        self.items[item]["parent"] = parent
+
+    def insert(self, parent, index, iid=None, text="", values=(), open=False, **kw):
+        if iid in self.items:
+            raise ValueError(f"Item {iid} already exists")
+        self.items[iid] = {"parent": parent, "children": {}, "text": text, "values": values, "open": open}
+        self._attach(iid, parent, index)
+        return iid
+
+    def delete(self, *items):
+        for item in items:
+            if item not in self.items:
+                continue
+            parent = self.items[item]["parent"]
+            if parent is not None:
+                del self.items[parent]["children"][item]
+            stack = [item]
+            while stack:
+                stack.extend(self.items.pop(stack.pop())["children"])
+
+    def exists(self, item):
+        return item in self.items
+
+    def get_children(self, item=""):
+        return tuple(self.items[item]["children"])
+
+    def parent(self, item):
+        return self.items[item]["parent"]
+
+    def item(self, item, option=None, **kw):
+        if kw:
+            self.items[item].update(kw)
+            return None
+        if option is not None:
+            return self.items[item][option]
+        return dict(self.items[item])
+
+    def detach(self, item):
+        del self.items[self.items[item]["parent"]]["children"][item]
+        self.items[item]["parent"] = None
+
+    def move(self, item, parent, index):
+        if self.items[item]["parent"] is not None:
+            self.detach(item)
+        self._attach(item, parent, index)
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, items):
+        self._selection = tuple(items) if isinstance(items, (list, tuple)) else (items,)
+
+    def focus(self, item=None):
+        if item is None:
+            return self._focus
+        self._focus = item
+
+    def see(self, item):
+        pass
+
+
+class _Ignore:
+    """Remplace les widgets d'état (StringVar, Label) : tous les appels sont ignorés."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class HeadlessRoot(_Ignore):
+    """Racine Tk factice : les rappels différés ne sont jamais exécutés."""
+
+    def after(self, delay, callback=None, *args):
+        return None
+
+
+def headless_app(storage, excel_file):
+    """TreeApp sur un Treeview en mémoire (sans fenêtre Tk), prêt pour load_data().
+    excel_file : classeur écrit par save_data(), dans le dossier temporaire des mesures."""
+    app = tree_app.TreeApp.__new__(tree_app.TreeApp)
+    app.excel_file = excel_file
+    app.root = HeadlessRoot()
+    app.tree = HeadlessTreeview()
+    app.core = TreeCore(storage, view=app)
+    app.search_index = SearchIndex()
+    app.where_used = WhereUsedIndex()
+    app.rollup = RollupIndex()
+    app.status_var = _Ignore()
+    app.status_label = _Ignore()
+    app.save_worker = SaveWorker(write_styled_workbook)
+    app._save_after_id = None
+    app.lazy_mode = False
+    app.update_breadcrumb = lambda node_id: None
+    app.clear_breadcrumb = lambda: None
+    return app
+
+
+# ====== Mesures ======
+
+def measure(name, func, nodes, trace_memory=True, **info):
+    """Exécute func() une fois. Retourne le résultat JSON : durée, pic mémoire (Mo) et infos."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    rows = func()
+    seconds = time.perf_counter() - start
+    result = {"benchmark": name, "nodes": nodes, "seconds": round(seconds, 4)}
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_mb"] = round(peak / 1e6, 2)
+    if rows is not None:
+        result["rows"] = rows
+    result.update(info)
+    print(f"  {name:<10} {seconds:8.3f} s" + (f"  {result['peak_mb']:8.1f} Mo" if trace_memory else ""))
+    return result
+
+
+def open_backend(backend, workdir, df):
+    """Prépare le stockage (hors mesure) : classeur Excel, ou base SQLite importée.
+    Retourne (stockage, classeur sauvegardé ou exporté par save_data)."""
+    excel_path = os.path.join(workdir, "arbre.xlsx")
+    if backend == "excel":
+        df.to_excel(excel_path, index=False)
+        return ExcelStorage(excel_path), excel_path
+    db_path = os.path.join(workdir, "arbre.db")
+    model, _ = TreeModel.from_dataframe(df)
+    storage = SQLiteStorage(db_path)
+    storage.add_nodes(model, [node_id for node_id, _ in model.walk()])
+    return storage, excel_path
+
+
+def run_size(nodes, args, workdir):
+    """Toutes les mesures demandées pour une taille d'arbre."""
+    print(f"Arbre de {nodes} noeuds (profondeur {args.depth}, {args.fan_out} enfants en moyenne)")
+    df = synthetic_bom(nodes, args.depth, args.fan_out, args.text_length, args.orphan_rate, args.seed)
+    trace = not args.no_memory
+    results = []
+
+    storage, excel_path = open_backend(args.backend, workdir, df)
+    app = headless_app(storage, excel_path)
+    info = {"backend": args.backend}
+
+    # Chargement (stockage + remplissage du Treeview) : sert aussi de préparation aux mesures suivantes
+    def load():
+        app.load_data()
+        return len(app.model)
+    results.append(measure("load", load, nodes, trace, **info))
+
+    if "save" in args.only:
+        def save():
+            app.save_data()
+            app.save_worker.wait_idle()
+            return len(app.model)
+        results.append(measure("save", save, nodes, trace, **info))
+
+    if "delete" in args.only:
+        # Le plus grand sous-arbre sous une racine
+        roots = app.model.get_children("")
+        target = max((child_id for root_id in roots for child_id in app.model.get_children(root_id)),
+                     key=app.model.count_subtree, default=roots[0] if roots else None)
+        if target is not None:
+            size = app.model.count_subtree(target)
+            results.append(measure("delete", lambda: app.core.delete_subtree(target) or size, nodes, trace, **info))
+
+    if "import" in args.only:
+        text = fixed_width_text(args.import_lines, args.seed)
+        parent_id = app.model.get_children("")[0] if app.model.get_children("") else ""
+
+        def do_import():
+            new_ids, _ = app.core.import_fixed_width(parent_id, text, DEFAULT_LAYOUT)
+            return len(new_ids)
+        results.append(measure("import", do_import, nodes, trace, lines=args.import_lines, **info))
+
+    storage.close()
+
+    if "migrate" in args.only:
+        sys.path.insert(0, PROJECT_DIR)
+        import migrate_data
+        source = os.path.join(workdir, "niveaux.xlsx")
+        target = os.path.join(workdir, "migre.xlsx")
+        level_rows(df).to_excel(source, index=False)
+        results.append(measure("migrate", lambda: migrate_data.migrate(source, target), nodes, trace))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesures de performance sur une nomenclature synthétique")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000], help="Tailles d'arbre (1000 à 1000000)")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--fan-out", type=int, default=8)
+    parser.add_argument("--text-length", type=int, default=30, help="Longueur des descriptions")
+    parser.add_argument("--orphan-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=("sqlite", "excel"), default="sqlite")
+    parser.add_argument("--import-lines", type=int, default=10000, help="Lignes du texte de l'import en masse")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--no-memory", action="store_true", help="Sans tracemalloc (durées plus justes)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="bom_bench_")
+    try:
+        for nodes in args.nodes:
+            size_dir = os.path.join(workdir, str(nodes))
+            os.makedirs(size_dir)
+            # Les sorties des scripts (migration) ne sont pas mesurées
+            results.extend(run_size(nodes, args, size_dir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
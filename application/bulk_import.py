@@ -0,0 +1,155 @@
+"""
+Découpage du texte collé dans « Importer Masse » (colonnes à largeur fixe).
+Le module ne dépend pas de Tkinter : toutes les lignes sont découpées en une
+passe vectorisée (pandas), puis l'interface applique le résultat en un seul lot.
+"""
+from collections import namedtuple
+import os
+import uuid
+import numpy as np
+import pandas as pd
+
+# Une ligne importée (line_no : numéro de ligne dans le texte collé, à partir de 1)
+ImportRow = namedtuple("ImportRow", ["line_no", "position", "part_number", "description"])
+
+# Une ligne rejetée et la raison du rejet
+RejectedLine = namedtuple("RejectedLine", ["line_no", "text", "reason"])
+
+# Délimitation des colonnes (index de caractère, 0 = début de ligne)
+ColumnLayout = namedtuple("ColumnLayout", ["pos_start", "pos_end", "pn_start", "pn_end", "desc_start", "stop_char"])
+
+# Valeurs par défaut des champs du dialogue
+DEFAULT_LAYOUT = ColumnLayout(0, 3, 4, 16, 19, ".")
+
+# Détection des colonnes : une colonne de caractères est un séparateur si elle est vide
+# (espace ou fin de ligne) dans au moins cette proportion des lignes
+GUTTER_RATIO = 0.95
+
+# Largeur maximale analysée et nombre de lignes traitées par bloc (mémoire bornée)
+DETECT_MAX_WIDTH = 300
+DETECT_CHUNK_LINES = 10000
+
+# Largeur maximale d'un champ considéré comme une Position (ex: "0010")
+MAX_POSITION_WIDTH = 6
+
+
+def parse_fixed_width(text, layout):
+    """Découpe toutes les lignes de text selon layout.
+    Retourne (rows, rejects) : listes d'ImportRow et de RejectedLine dans l'ordre du texte.
+    Les lignes vides sont ignorées sans être rejetées."""
+    lines = pd.Series(text.split("\n"), dtype=object).str.rstrip()
+    lines.index = range(1, len(lines) + 1)
+    lines = lines[lines != ""]
+    if lines.empty:
+        return [], []
+
+    lengths = lines.str.len()
+    position = lines.str.slice(layout.pos_start, layout.pos_end).str.strip()
+    part_number = lines.str.slice(layout.pn_start, layout.pn_end).str.strip()
+    description = lines.str.slice(layout.desc_start)
+    if layout.stop_char:
+        description = description.str.partition(layout.stop_char, expand=False).str[0]
+    description = description.str.strip()
+
+    too_short = lengths <= layout.pn_start
+    no_pn = ~too_short & (part_number == "")
+    valid = ~(too_short | no_pn)
+
+    rows = [ImportRow(*values) for values in zip(lines.index[valid], position[valid], part_number[valid], description[valid])]
+    reasons = pd.Series("", index=lines.index)
+    reasons[too_short] = "ligne trop courte (pas de Part Number)"
+    reasons[no_pn] = "Part Number vide"
+    invalid = ~valid
+    rejects = [RejectedLine(*values) for values in zip(lines.index[invalid], lines[invalid], reasons[invalid])]
+    return rows, rejects
+
+
+def column_spans(line, layout):
+    """Plages (tag, début, fin) à colorer dans une ligne du texte collé : "pos", "pn", "desc".
+    Mêmes règles que le découpage, pour que la coloration corresponde à l'import."""
+    if not line.strip():
+        return []
+    spans = []
+    length = len(line)
+    if length > layout.pos_start and min(length, layout.pos_end) > layout.pos_start:
+        spans.append(("pos", layout.pos_start, min(length, layout.pos_end)))
+    if length > layout.pn_start and min(length, layout.pn_end) > layout.pn_start:
+        spans.append(("pn", layout.pn_start, min(length, layout.pn_end)))
+    if length > layout.desc_start:
+        desc_end = length
+        if layout.stop_char:
+            found = line.find(layout.stop_char, layout.desc_start)
+            if found != -1:
+                desc_end = found
+        if desc_end > layout.desc_start:
+            spans.append(("desc", layout.desc_start, desc_end))
+    return spans
+
+
+def blank_profile(lines):
+    """Pour chaque colonne de caractères, nombre de lignes où elle est vide (espace, tabulation ou fin de ligne).
+    Calcul vectorisé (numpy), par blocs de DETECT_CHUNK_LINES lignes : chaque bloc est encodé d'un coup
+    (UTF-32, un entier par caractère) et la colonne de chaque caractère est déduite des fins de ligne."""
+    blanks = np.zeros(DETECT_MAX_WIDTH, dtype=np.int64)
+    digits = np.zeros(DETECT_MAX_WIDTH, dtype=np.int64)
+    width = 0
+    for start in range(0, len(lines), DETECT_CHUNK_LINES):
+        chunk = lines[start:start + DETECT_CHUNK_LINES]
+        codes = np.frombuffer(("\n".join(chunk) + "\n").encode("utf-32-le"), dtype=np.uint32)
+        ends = np.flatnonzero(codes == 10)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        width = max(width, int((ends - starts).max()))
+        # Colonne de chaque caractère dans sa ligne (les fins de ligne sont hors du tableau)
+        columns = np.arange(len(codes)) - np.repeat(starts, ends - starts + 1)
+        inside = columns < DETECT_MAX_WIDTH
+        filled = inside & (codes != 10) & (codes != 32) & (codes != 9)
+        # Vide = pas de caractère visible (espace, tabulation, ou ligne plus courte)
+        blanks += len(chunk) - np.bincount(columns[filled], minlength=DETECT_MAX_WIDTH)
+        digits += np.bincount(columns[inside & (codes >= 48) & (codes <= 57)], minlength=DETECT_MAX_WIDTH)
+    width = min(width, DETECT_MAX_WIDTH)
+    return blanks[:width], digits[:width]
+
+
+def detect_layout(text, stop_char=""):
+    """Devine les index de colonnes (Position, Part Number, début de Description) d'un texte
+    à largeur fixe, d'après les colonnes de caractères vides dans presque toutes les lignes.
+    Retourne un ColumnLayout, ou None si moins de deux champs sont trouvés."""
+    lines = [line.rstrip() for line in text.split("\n")]
+    lines = [line for line in lines if line]
+    if not lines:
+        return None
+    blanks, digits = blank_profile(lines)
+    is_gutter = blanks >= GUTTER_RATIO * len(lines)
+
+    # Champs = suites de colonnes non vides entre deux séparateurs : (début, fin exclue)
+    fields = []
+    start = None
+    for col, gutter in enumerate(is_gutter):
+        if not gutter and start is None:
+            start = col
+        elif gutter and start is not None:
+            fields.append((start, col))
+            start = None
+    if start is not None:
+        fields.append((start, len(is_gutter)))
+    if len(fields) < 2:
+        return None
+
+    # Le premier champ est une Position s'il est court et surtout numérique
+    first_start, first_end = fields[0]
+    filled = len(lines) * (first_end - first_start) - blanks[first_start:first_end].sum()
+    is_position = (len(fields) >= 3 and first_end - first_start <= MAX_POSITION_WIDTH
+                   and digits[first_start:first_end].sum() >= 0.8 * filled)
+    if is_position:
+        (pos_start, pos_end), (pn_start, pn_end), (desc_start, _) = fields[:3]
+    else:
+        # Pas de colonne Position : plage vide avant le Part Number
+        (pn_start, pn_end), (desc_start, _) = fields[:2]
+        pos_start = pos_end = 0
+    return ColumnLayout(pos_start, pos_end, pn_start, pn_end, desc_start, stop_char)
+
+
+def new_node_ids(count):
+    """Génère count identifiants uuid4 à partir d'un seul tirage aléatoire."""
+    data = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=data[i:i + 16], version=4)) for i in range(0, 16 * count, 16)]
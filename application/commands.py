@@ -0,0 +1,296 @@
+"""
+Commandes annulables (annuler / rétablir) sur l'arbre.
+Chaque commande garde seulement ce qu'il faut pour s'inverser (anciennes valeurs,
+lignes du sous-arbre supprimé, ancien parent et rang) : annuler ou rétablir
+coûte la taille de la modification, jamais celle de l'arbre, et ne relit pas le classeur.
+
+Les commandes reçoivent le noyau de l'application (TreeCore, sans Tkinter) et utilisent :
+core.model, core.storage et les mises à jour ciblées de la vue (core.view) :
+view_insert_subtree(), view_insert_children(), view_remove(), view_update(), view_move(),
+view_move_many().
+Les commandes sur plusieurs sous-arbres (sélection multiple) modifient le modèle en un lot
+et n'écrivent qu'une fois dans le stockage.
+"""
+from perf_log import timed
+
+# Nombre de commandes conservées dans l'historique
+UNDO_LIMIT = 100
+
+
+class AddNodesCommand:
+    """Ajout de noeuds à la fin des enfants d'un parent (ajout simple ou import en masse).
+    items : liste de (node_id, position, part_number, description)."""
+
+    def __init__(self, parent_id, items, label="Ajout"):
+        self.parent_id = parent_id
+        self.items = list(items)
+        self.label = label
+
+    def node_ids(self):
+        return [item[0] for item in self.items]
+
+    def do(self, core):
+        with timed("model"):
+            core.model.add_children(self.parent_id, self.items)
+        with timed("view"):
+            core.view.view_insert_children(self.parent_id, self.node_ids())
+        # Une seule écriture (transaction / ajout au journal) pour tout le lot
+        with timed("storage"):
+            core.storage.add_nodes(core.model, self.node_ids())
+
+    def undo(self, core):
+        node_ids = self.node_ids()
+        core.model.remove_subtrees(node_ids)
+        core.view.view_remove(node_ids)
+        core.storage.delete_subtrees(node_ids)
+
+    def focus(self, undone):
+        return self.parent_id if undone else self.items[0][0]
+
+
+class EditNodeCommand:
+    """Modification des champs d'un noeud ; l'inverse est l'ensemble des anciennes valeurs."""
+
+    def __init__(self, node_id, label="Modification", **fields):
+        self.node_id = node_id
+        self.fields = fields
+        self.old_fields = None
+        self.label = label
+
+    def _apply(self, core, fields):
+        core.model.update_node(self.node_id, **fields)
+        core.view.view_update(self.node_id)
+        core.storage.update_node(core.model, self.node_id, **fields)
+
+    def do(self, core):
+        node = core.model.nodes[self.node_id]
+        self.old_fields = {key: node[key] for key in self.fields}
+        self._apply(core, self.fields)
+
+    def undo(self, core):
+        self._apply(core, self.old_fields)
+
+    def focus(self, undone):
+        return self.node_id
+
+
+class DeleteSubtreeCommand:
+    """Suppression d'un sous-arbre ; l'inverse est la liste de ses lignes, son parent et son rang."""
+
+    def __init__(self, node_id, label="Suppression"):
+        self.node_id = node_id
+        self.parent_id = None
+        self.index = None
+        self.removed = None
+        self.label = label
+
+    def do(self, core):
+        self.parent_id = core.model.parent(self.node_id)
+        self.index = core.model.index_of(self.node_id)
+        self.removed = core.model.remove_subtree(self.node_id)
+        core.view.view_remove([self.node_id])
+        core.storage.delete_subtree(self.node_id)
+
+    def undo(self, core):
+        # Ordre préfixe : chaque parent est recréé avant ses enfants, ajoutés à la fin de ses enfants
+        for node_id, data in self.removed:
+            if node_id == self.node_id:
+                parent_id, index = self.parent_id, self.index
+            else:
+                parent_id, index = data["parent_id"], None
+            core.model.add_node(node_id, parent_id, data["position"], data["part_number"], data["description"], index=index)
+        core.view.view_insert_subtree(self.node_id)
+        core.storage.add_nodes(core.model, [node_id for node_id, _ in self.removed])
+
+    def focus(self, undone):
+        return self.node_id if undone else self.parent_id
+
+
+class MoveSubtreeCommand:
+    """Déplacement d'un sous-arbre ; l'inverse est l'ancien parent et l'ancien rang."""
+
+    def __init__(self, node_id, new_parent_id, index=None, label="Déplacement"):
+        self.node_id = node_id
+        self.new_parent_id = new_parent_id
+        self.index = index
+        self.old_parent_id = None
+        self.old_index = None
+        self.label = label
+
+    def _move(self, core, parent_id, index):
+        core.model.move_subtree(self.node_id, parent_id, index)
+        core.view.view_move(self.node_id)
+        core.storage.move_node(core.model, self.node_id, index)
+
+    def do(self, core):
+        self.old_parent_id = core.model.parent(self.node_id)
+        self.old_index = core.model.index_of(self.node_id)
+        self._move(core, self.new_parent_id, self.index)
+
+    def undo(self, core):
+        self._move(core, self.old_parent_id, self.old_index)
+
+    def focus(self, undone):
+        return self.node_id
+
+
+class MoveSubtreesCommand:
+    """Déplacement de plusieurs sous-arbres à la fin des enfants d'un même parent (couper / coller,
+    glisser-déposer) ; l'inverse est la liste (noeud, ancien parent, ancien rang)."""
+
+    def __init__(self, node_ids, new_parent_id, label="Déplacement"):
+        self.node_ids = list(node_ids)
+        self.new_parent_id = new_parent_id
+        self.previous = None
+        self.label = label
+
+    def _place(self, core, placements):
+        previous = core.model.place_subtrees(placements)
+        core.view.view_move_many([node_id for node_id, _, _ in placements])
+        # Une seule écriture pour tout le lot
+        core.storage.move_nodes(core.model, [(node_id, rank) for node_id, _, rank in placements])
+        return previous
+
+    def do(self, core):
+        self.previous = self._place(core, [(node_id, self.new_parent_id, None) for node_id in self.node_ids])
+
+    def undo(self, core):
+        self._place(core, self.previous)
+
+    def focus(self, undone):
+        return self.node_ids
+
+
+class CopySubtreesCommand:
+    """Copie de plusieurs sous-arbres (nouveaux IDs) à la fin des enfants d'un parent.
+    Les lignes copiées sont calculées une fois : rétablir recrée les mêmes IDs."""
+
+    def __init__(self, node_ids, new_parent_id, label="Copie"):
+        self.node_ids = list(node_ids)
+        self.new_parent_id = new_parent_id
+        self.rows = None
+        self.copy_ids = None
+        self.label = label
+
+    def _copy_rows(self, core):
+        """(nouvel id, nouveau parent, position, part_number, description) en ordre préfixe."""
+        rows = []
+        reserved = set()
+        for node_id in self.node_ids:
+            id_map = {}
+            for current_id, _ in core.model.iter_subtree(node_id):
+                data = core.model.nodes[current_id]
+                parent_id = self.new_parent_id if current_id == node_id else id_map[data["parent_id"]]
+                id_map[current_id] = core.new_node_id(parent_id, data["position"], data["part_number"], reserved)
+                reserved.add(id_map[current_id])
+                rows.append((id_map[current_id], parent_id, data["position"], data["part_number"], data["description"]))
+        return rows
+
+    def do(self, core):
+        if self.rows is None:
+            self.rows = self._copy_rows(core)
+            self.copy_ids = [row[0] for row in self.rows if row[1] == self.new_parent_id]
+        for node_id, parent_id, position, part_number, description in self.rows:
+            core.model.add_node(node_id, parent_id, position, part_number, description)
+        for node_id in self.copy_ids:
+            core.view.view_insert_subtree(node_id)
+        core.storage.add_nodes(core.model, [row[0] for row in self.rows])
+
+    def undo(self, core):
+        core.model.remove_subtrees(self.copy_ids)
+        core.view.view_remove(self.copy_ids)
+        core.storage.delete_subtrees(self.copy_ids)
+
+    def focus(self, undone):
+        return self.new_parent_id if undone else self.copy_ids
+
+
+class DeleteSubtreesCommand:
+    """Suppression de plusieurs sous-arbres ; l'inverse est la liste de leurs lignes,
+    avec le parent et le rang de chaque racine."""
+
+    def __init__(self, node_ids, label="Suppression"):
+        self.node_ids = list(node_ids)
+        self.parents = None
+        self.ranks = None
+        self.removed = None
+        self.label = label
+
+    def do(self, core):
+        self.ranks = core.model.ranks(self.node_ids)
+        # Par rang croissant : à l'annulation, chaque racine retrouve son rang parmi les frères déjà replacés
+        self.node_ids.sort(key=self.ranks.get)
+        self.parents = {node_id: core.model.parent(node_id) for node_id in self.node_ids}
+        self.removed = core.model.remove_subtrees(self.node_ids)
+        core.view.view_remove(self.node_ids)
+        core.storage.delete_subtrees(self.node_ids)
+
+    def undo(self, core):
+        # Lignes regroupées par racine, chaque racine avant ses descendants (ordre préfixe)
+        rows = {}
+        current = None
+        for node_id, data in self.removed:
+            if node_id in self.parents:
+                current = rows.setdefault(node_id, [])
+            current.append((node_id, data))
+        added = []
+        for root_id in self.node_ids:
+            for node_id, data in rows[root_id]:
+                if node_id == root_id:
+                    parent_id, index = self.parents[root_id], self.ranks[root_id]
+                else:
+                    parent_id, index = data["parent_id"], None
+                core.model.add_node(node_id, parent_id, data["position"], data["part_number"], data["description"], index=index)
+                added.append(node_id)
+        for root_id in self.node_ids:
+            core.view.view_insert_subtree(root_id)
+        core.storage.add_nodes(core.model, added)
+
+    def focus(self, undone):
+        if undone:
+            return self.node_ids
+        return next((parent_id for parent_id in self.parents.values() if parent_id), None)
+
+
+class CommandHistory:
+    """Piles annuler / rétablir. Une nouvelle commande vide la pile rétablir."""
+
+    def __init__(self, limit=UNDO_LIMIT):
+        self.limit = limit
+        self.clear()
+
+    def clear(self):
+        self.done = []
+        self.undone = []
+
+    def execute(self, command, core):
+        command.do(core)
+        self.done.append(command)
+        if len(self.done) > self.limit:
+            del self.done[0]
+        self.undone.clear()
+        return command
+
+    def can_undo(self):
+        return bool(self.done)
+
+    def can_redo(self):
+        return bool(self.undone)
+
+    def undo(self, core):
+        """Annule la dernière commande. Retourne la commande, ou None si rien à annuler."""
+        if not self.done:
+            return None
+        command = self.done.pop()
+        command.undo(core)
+        self.undone.append(command)
+        return command
+
+    def redo(self, core):
+        """Rétablit la dernière commande annulée. Retourne la commande, ou None."""
+        if not self.undone:
+            return None
+        command = self.undone.pop()
+        command.do(core)
+        self.done.append(command)
+        return command
@@ -0,0 +1,125 @@
+"""
+Croisement de la nomenclature avec les fichiers de maintenance (generate_bom).
+
+Les clés sont normalisées une seule fois par source (comme les cas d'emploi : sans casse,
+sans espaces, sans le ".0" d'un nombre relu d'Excel), puis chaque source est réduite à une
+table indexée par clé, une ligne par part number. Le croisement avec l'arbre n'est qu'une
+suite de merges pandas (jointures par hachage), sans boucle par noeud.
+
+- Consommation (export CL_EXPORT_ETAT_CONSOMATION, une ligne par sortie de stock) :
+  une sortie est rattachée à son Article et aux part numbers cités dans son libellé
+  ("O-RING ... REF 315206-0805") ; par clé : quantité, valeur, prix unitaire moyen
+  (valeur / quantité) et nombre de sorties.
+- PMP et liste de contrôle (feuilles libres) : les part numbers cités dans une ligne
+  renvoient à cette ligne (fichier, feuille, numéro de ligne Excel).
+"""
+import numpy as np
+import pandas as pd
+
+from where_used import normalize_part_number
+
+# Part number cité dans un texte : 4 à 7 chiffres, tiret, 4 chiffres (315105-0153, 2555655-0000)
+PART_CODE_PATTERN = r"(?<![\w-])(\d{4,7}-\d{4})(?![\w-])"
+
+# Colonnes de l'export de consommation
+ARTICLE = "Article"
+ARTICLE_LABEL = "Libelle Article"
+QUANTITY = "Qté"
+UNIT_PRICE = "PU"
+VALUE = "Valeur"
+
+# Colonnes ajoutées au BOM
+PRICE_COLUMN = "PU moyen"
+QUANTITY_COLUMN = "Qté consommée"
+VALUE_COLUMN = "Valeur consommée"
+ISSUES_COLUMN = "Sorties"
+REFERENCES_COLUMN = "Références maintenance"
+CONSUMPTION_COLUMNS = [PRICE_COLUMN, QUANTITY_COLUMN, VALUE_COLUMN, ISSUES_COLUMN]
+BOM_COLUMNS = CONSUMPTION_COLUMNS + [REFERENCES_COLUMN]
+
+# Références gardées par part number (les suivantes sont comptées)
+MAX_REFERENCES = 5
+
+
+def normalize_part_numbers(values):
+    """normalize_part_number (cas d'emploi) sur une colonne pandas entière ("" pour une cellule vide).
+    Chaque valeur distincte n'est normalisée qu'une fois (les exports répètent les mêmes articles)."""
+    codes, uniques = pd.factorize(values)
+    keys = np.array([normalize_part_number(value) for value in uniques] + [""], dtype=object)
+    return pd.Series(keys[codes], index=values.index)
+
+
+def extract_part_codes(texts):
+    """Part numbers cités dans une colonne de textes : DataFrame (row = étiquette de la ligne, key)."""
+    texts = texts.dropna().astype(str)
+    # findall + explode : bien plus rapide que extractall sur des centaines de milliers de libellés
+    codes = texts.str.findall(PART_CODE_PATTERN).explode().dropna()
+    return pd.DataFrame({"row": codes.index, "key": normalize_part_numbers(codes).to_numpy()})
+
+
+def consumption_by_key(consumption):
+    """Table indexée par clé : PU moyen, quantité et valeur consommées, nombre de sorties.
+    consumption : une ou plusieurs périodes de l'export concaténées (None : table vide)."""
+    if consumption is None:
+        return pd.DataFrame(columns=CONSUMPTION_COLUMNS)
+    missing = [column for column in (ARTICLE, QUANTITY, VALUE) if column not in consumption.columns]
+    if missing:
+        raise ValueError(f"Colonne(s) absente(s) de l'export de consommation : {', '.join(missing)}")
+    lines = consumption.reset_index(drop=True)
+    quantity = pd.to_numeric(lines[QUANTITY], errors="coerce").fillna(0.0).to_numpy()
+    value = pd.to_numeric(lines[VALUE], errors="coerce")
+    if UNIT_PRICE in lines.columns:
+        # Valeur absente : quantité x prix unitaire
+        value = value.fillna(pd.to_numeric(lines[UNIT_PRICE], errors="coerce") * quantity)
+    value = value.fillna(0.0).to_numpy()
+
+    # Lien sortie -> clé : l'Article, et les part numbers du libellé
+    links = [pd.DataFrame({"row": lines.index, "key": normalize_part_numbers(lines[ARTICLE]).to_numpy()})]
+    if ARTICLE_LABEL in lines.columns:
+        links.append(extract_part_codes(lines[ARTICLE_LABEL]))
+    links = pd.concat(links, ignore_index=True)
+    # Une sortie citée deux fois pour la même clé n'est comptée qu'une fois
+    links = links[links["key"] != ""].drop_duplicates()
+    rows = links["row"].to_numpy()
+    links = links.assign(quantity=quantity[rows], value=value[rows])
+
+    table = links.groupby("key").agg(quantity=("quantity", "sum"), value=("value", "sum"), issues=("row", "size"))
+    price = table["value"] / table["quantity"].where(table["quantity"] != 0)
+    return pd.DataFrame({PRICE_COLUMN: price, QUANTITY_COLUMN: table["quantity"], VALUE_COLUMN: table["value"],
+                         ISSUES_COLUMN: table["issues"]})
+
+
+def _join_references(references):
+    unique = list(dict.fromkeys(references))
+    text = "; ".join(unique[:MAX_REFERENCES])
+    if len(unique) > MAX_REFERENCES:
+        text += f" (+{len(unique) - MAX_REFERENCES})"
+    return text
+
+
+def references_by_key(sheets):
+    """Table indexée par clé : références de maintenance (les lignes qui citent le part number).
+    sheets : liste de (libellé "fichier / feuille", DataFrame lu avec la première ligne en en-tête)."""
+    found = []
+    for label, df in sheets:
+        if df.empty:
+            continue
+        # Toutes les cellules non vides de la feuille, en une seule colonne (ligne, colonne) -> texte
+        cells = df.astype(object).stack()
+        codes = extract_part_codes(pd.Series(cells.to_numpy(), index=cells.index.get_level_values(0)))
+        if not codes.empty:
+            # Ligne Excel : index + 2 (en-tête en ligne 1)
+            found.append(codes.assign(reference=[f"{label} l.{row + 2}" for row in codes["row"].tolist()]))
+    if not found:
+        return pd.DataFrame({REFERENCES_COLUMN: pd.Series(dtype=object)})
+    found = pd.concat(found, ignore_index=True)
+    return found.groupby("key")["reference"].agg(_join_references).to_frame(REFERENCES_COLUMN)
+
+
+def enrich_bom(tree_df, consumption_table, references_table, part_number_column="PartNumber"):
+    """BOM enrichi : l'arbre (ordre et colonnes conservés) + BOM_COLUMNS, par jointure sur le part number normalisé.
+    Les noeuds sans correspondance gardent des cellules vides."""
+    bom = tree_df.assign(_key=normalize_part_numbers(tree_df[part_number_column]).to_numpy())
+    bom = bom.merge(consumption_table, how="left", left_on="_key", right_index=True)
+    bom = bom.merge(references_table, how="left", left_on="_key", right_index=True)
+    return bom.drop(columns="_key").reset_index(drop=True)
@@ -0,0 +1,181 @@
+"""
+Écriture du classeur Excel mis en forme (groupement, chemin en commentaire, couleurs par niveau).
+Le module ne dépend pas de Tkinter : il travaille sur un instantané immuable
+des lignes, ce qui permet de l'exécuter dans un thread de sauvegarde.
+"""
+from collections import namedtuple
+import pandas as pd
+
+from perf_log import timed
+
+# Une ligne de l'instantané exporté (ordre visuel de l'arbre)
+ExportRow = namedtuple("ExportRow", ["position", "part_number", "description", "level", "node_id", "parent_id", "chemin"])
+
+# En-têtes du classeur : ID et ParentID (colonnes masquées) permettent de recharger l'arbre
+HEADERS = ["Position", "PartNumber", "Description", "Niveau", "ID", "ParentID"]
+
+# Au-delà de ce nombre de lignes, le chemin est écrit dans une colonne Chemin au lieu d'un
+# commentaire par ligne : openpyxl garde tous les commentaires en mémoire jusqu'à la fin
+PATH_COMMENT_MAX_ROWS = 5000
+PATH_HEADER = "Chemin"
+
+# Couleurs alternées pour les niveaux
+LEVEL_COLORS = [
+    "FFFFFF",  # Niveau 0 - Blanc
+    "E3F2FD",  # Niveau 1 - Bleu très clair
+    "BBDEFB",  # Niveau 2 - Bleu clair
+    "90CAF9",  # Niveau 3 - Bleu
+    "64B5F6",  # Niveau 4 - Bleu moyen
+    "42A5F5",  # Niveau 5+ - Bleu plus foncé
+]
+
+# Largeur des colonnes
+COLUMN_WIDTHS = {
+    'A': 12,   # Position
+    'B': 20,   # PartNumber
+    'C': 45,   # Description (plus large car c'est là qu'on clique)
+    'D': 10,   # Niveau
+}
+PATH_COLUMN_WIDTH = 80
+
+
+
+def write_styled_workbook(rows, path):
+    """Écrit l'instantané (suite d'ExportRow) dans le classeur Excel mis en forme.
+    Retourne le nombre de lignes écrites. Les erreurs d'écriture sont propagées.
+
+    Le classeur est écrit en flux (mode write-only d'openpyxl) : chaque ligne est
+    émise en une seule passe (valeurs, style, niveau de plan) sans garder les
+    cellules en mémoire. Les commentaires de chemin, écrits dans une partie séparée
+    du fichier, sont conservés par openpyxl jusqu'à la fin : au-delà de
+    PATH_COMMENT_MAX_ROWS lignes, le chemin va dans la colonne Chemin (G) et la
+    mémoire ne dépend plus du nombre de lignes.
+    Un style nommé par niveau est partagé par toutes les cellules au lieu de
+    créer un remplissage par ligne.
+    Durées des étapes (styles, lignes, écriture du fichier) : journal de perf_log.
+    """
+    with timed("write_workbook", rows=len(rows)):
+        return _write_styled_workbook(rows, path)
+
+
+def _write_styled_workbook(rows, path):
+    if not rows:
+        # Si vide, on crée juste les headers
+        pd.DataFrame(columns=HEADERS).to_excel(path, index=False)
+        return 0
+
+    try:
+        import openpyxl
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+        from openpyxl.comments import Comment
+    except ImportError:
+        # Fallback si openpyxl n'est pas disponible avec les styles
+        df = pd.DataFrame([(r.position, r.part_number, r.description, r.level, r.node_id, r.parent_id) for r in rows], columns=HEADERS)
+        df.to_excel(path, index=False)
+        return len(rows)
+
+    path_comments = len(rows) <= PATH_COMMENT_MAX_ROWS
+    headers = HEADERS if path_comments else HEADERS + [PATH_HEADER]
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Arborescence Pièces")
+
+    with timed("styles"):
+        # === STYLES PARTAGÉS ===
+        thin_border = Border(
+            left=Side(style='thin', color='CCCCCC'),
+            right=Side(style='thin', color='CCCCCC'),
+            top=Side(style='thin', color='CCCCCC'),
+            bottom=Side(style='thin', color='CCCCCC')
+        )
+        level_styles = []
+        for level, color in enumerate(LEVEL_COLORS):
+            style = NamedStyle(name=f"Niveau {level}")
+            style.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+            style.border = thin_border
+            style.alignment = Alignment(vertical="center")
+            wb.add_named_style(style)
+            level_styles.append(style.name)
+
+        header_style = NamedStyle(name="En-tête arborescence")
+        header_style.fill = PatternFill(start_color="0052A3", end_color="0052A3", fill_type="solid")
+        header_style.font = Font(bold=True, color="FFFFFF", size=11)
+        header_style.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+        wb.add_named_style(header_style)
+
+        # === MISE EN PAGE (à définir avant d'écrire les lignes en mode flux) ===
+        for col, width in COLUMN_WIDTHS.items():
+            ws.column_dimensions[col].width = width
+        ws.column_dimensions['E'].hidden = True   # ID
+        ws.column_dimensions['F'].hidden = True   # ParentID
+        if not path_comments:
+            ws.column_dimensions['G'].width = PATH_COLUMN_WIDTH
+
+        # Figer les lignes 1-3 (zone chemin + en-têtes)
+        ws.freeze_panes = 'A4'
+
+        # Activer les filtres automatiques sur les en-têtes (ligne 3)
+        ws.auto_filter.ref = f"A3:D{3 + len(rows)}"
+
+        # IMPORTANT: Pour que les '+' soient sur la ligne du parent (en haut du groupe)
+        ws.sheet_properties.outlinePr.summaryBelow = False
+
+        # === ZONE D'AFFICHAGE DU CHEMIN EN HAUT ===
+        # Ligne 1 : Titre de la zone chemin
+        ws.merged_cells.add('A1:D1')
+        if path_comments:
+            title_text = "📍 CHEMIN : Cliquez sur une ligne puis regardez le commentaire (triangle rouge) →"
+        else:
+            title_text = "📍 CHEMIN : voir la colonne Chemin, à droite →"
+        title = WriteOnlyCell(ws, value=title_text)
+        title.font = Font(bold=True, size=11, color="0052A3")
+        title.fill = PatternFill(start_color="FFF9C4", end_color="FFF9C4", fill_type="solid")
+        title.alignment = Alignment(horizontal="left", vertical="center")
+        ws.row_dimensions[1].height = 25
+        ws.append([title])
+
+        # Ligne 2 : Vide (séparation)
+        ws.row_dimensions[2].height = 5
+        ws.append([])
+
+        # Ligne 3 : en-têtes
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.style = header_style.name
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+    with timed("rows", rows=len(rows)):
+        # Données à partir de la ligne 4 : une seule passe par ligne
+        for r_idx, row in enumerate(rows):
+            excel_row = r_idx + 4
+            style_name = level_styles[min(row.level, len(level_styles) - 1)]
+            if row.level > 0:
+                # Niveau de plan (grouping) ; retiré juste après l'écriture de la ligne
+                ws.row_dimensions[excel_row].outlineLevel = row.level
+
+            values = (row.position, row.part_number, row.description, row.level, row.node_id, row.parent_id)
+            if not path_comments:
+                values += (row.chemin,)
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = style_name
+                cells.append(cell)
+
+            if path_comments:
+                # Ajouter un COMMENTAIRE avec le chemin sur la colonne Description
+                comment = Comment(f"📍 CHEMIN:\n{row.chemin}", "Système")
+                comment.width = 400
+                comment.height = 80
+                cells[2].comment = comment
+
+            ws.append(cells)
+            if row.level > 0:
+                del ws.row_dimensions[excel_row]
+
+    with timed("wb.save"):
+        wb.save(path)
+    return len(rows)
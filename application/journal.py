@@ -0,0 +1,197 @@
+"""
+Journal des modifications (append-only) pour la sauvegarde incrémentale.
+Chaque modification est ajoutée immédiatement au journal sous forme d'une
+ligne JSON ; le classeur Excel complet (mis en forme) n'est réécrit qu'à la
+compaction, à la demande ou quand le journal atteint un seuil.
+Au démarrage, le journal est rejoué sur le dernier instantané Excel.
+"""
+import json
+import os
+
+# Nombre d'opérations journalisées avant une réécriture complète du classeur
+COMPACTION_THRESHOLD = 200
+
+
+class ChangeJournal:
+    """Journal append-only des opérations sur l'arbre (une ligne JSON par opération).
+
+    Opérations :
+    - {"op": "add", "id", "parent_id", "position", "part_number", "description"[, "index"]}
+    - {"op": "update", "id", "fields": {...}}
+    - {"op": "delete", "id"}
+    - {"op": "move", "id", "parent_id", "index"}
+    """
+
+    def __init__(self, path, threshold=COMPACTION_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.pending = self._count_entries()
+        # Numéro absolu de la première opération encore présente dans le fichier
+        self.base = 0
+
+    def _count_entries(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+
+    def __len__(self):
+        return self.pending
+
+    def needs_compaction(self):
+        return self.pending >= self.threshold
+
+    # ====== Écriture ======
+
+    def record_many(self, entries):
+        """Ajoute plusieurs opérations en une seule écriture (vidée sur disque)."""
+        if not entries:
+            return
+        lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending += len(entries)
+
+    def record(self, op, **payload):
+        payload["op"] = op
+        self.record_many([payload])
+
+    def record_add(self, model, node_id):
+        self.record_many(add_entries(model, [node_id]))
+
+    def record_update(self, node_id, **fields):
+        self.record("update", id=node_id, fields=fields)
+
+    def record_delete(self, node_id):
+        self.record("delete", id=node_id)
+
+    def record_move(self, node_id, parent_id, index=None):
+        self.record("move", id=node_id, parent_id=parent_id, index=index)
+
+    def checkpoint(self):
+        """Marque la position courante du journal (opérations couvertes par un instantané pris maintenant).
+        À passer à discard() une fois l'instantané écrit sur disque."""
+        return self.base + self.pending
+
+    def discard(self, mark):
+        """Retire les opérations antérieures à mark (déjà incluses dans le classeur écrit).
+        Les opérations journalisées pendant l'écriture sont conservées."""
+        count = mark - self.base
+        if count <= 0:
+            return
+        if count >= self.pending:
+            self.clear()
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        remaining = lines[count:]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(remaining)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.base = mark
+        self.pending = len(remaining)
+
+    def clear(self):
+        """Vide le journal (après une compaction réussie)."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.base += self.pending
+        self.pending = 0
+
+    # ====== Relecture ======
+
+    def replay(self, model):
+        """Rejoue le journal sur le modèle. Retourne le nombre d'opérations appliquées.
+
+        La relecture est idempotente : une opération déjà présente dans
+        l'instantané (compaction interrompue) est simplement ignorée. Une
+        dernière ligne tronquée (arrêt brutal pendant l'écriture) est ignorée.
+        """
+        if not os.path.exists(self.path):
+            return 0
+        applied = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print("Attention: ligne de journal illisible ignorée.")
+                    continue
+                if apply_entry(model, entry):
+                    applied += 1
+        return applied
+
+
+def add_entry(model, node_id, index=None):
+    """Opération "add" décrivant le noeud tel qu'il est dans le modèle.
+    index : rang parmi les frères, seulement si le noeud n'a pas été ajouté à la fin."""
+    node = model.nodes[node_id]
+    entry = {"op": "add", "id": node_id, "parent_id": node["parent_id"], "position": node["position"],
+             "part_number": node["part_number"], "description": node["description"]}
+    if index is not None:
+        entry["index"] = index
+    return entry
+
+
+def add_entries(model, node_ids):
+    """Opérations "add" d'un lot de noeuds (parents avant enfants).
+    Le rang n'est noté que pour les noeuds qui ne forment pas la fin de la liste de leurs frères ;
+    ces frères sont alors rejoués par rang croissant, pour que chacun retrouve son rang final."""
+    new_ids = set(node_ids)
+    appended = set()
+    by_parent = {}
+    for node_id in node_ids:
+        by_parent.setdefault(model.parent(node_id), []).append(node_id)
+    for parent_id, ids in by_parent.items():
+        siblings = model.get_children(parent_id)
+        tail = siblings[len(siblings) - len(ids):]
+        if tail == ids:
+            appended.update(ids)
+    ranks = {}
+    for parent_id, ids in by_parent.items():
+        if ids[0] not in appended:
+            for rank, child_id in enumerate(model.get_children(parent_id)):
+                if child_id in new_ids:
+                    ranks[child_id] = rank
+    if ranks:
+        # Tri stable par profondeur puis rang : les parents restent avant leurs enfants
+        node_ids = sorted(node_ids, key=lambda node_id: (len(model.ancestors(node_id)), ranks.get(node_id, 0)))
+    return [add_entry(model, node_id, ranks.get(node_id)) for node_id in node_ids]
+
+
+def apply_entry(model, entry):
+    """Applique une opération du journal au modèle. Retourne False si elle est sans effet."""
+    op = entry.get("op")
+    node_id = entry.get("id")
+    if op == "add":
+        parent_id = entry.get("parent_id", "")
+        if node_id in model or (parent_id and parent_id not in model):
+            return False
+        model.add_node(node_id, parent_id, entry.get("position", ""), entry.get("part_number", ""), entry.get("description", ""),
+                       index=entry.get("index"))
+    elif op == "update":
+        if node_id not in model:
+            return False
+        model.update_node(node_id, **entry.get("fields", {}))
+    elif op == "delete":
+        if node_id not in model:
+            return False
+        model.remove_subtree(node_id)
+    elif op == "move":
+        parent_id = entry.get("parent_id", "")
+        if node_id not in model or (parent_id and parent_id not in model):
+            return False
+        try:
+            model.move_subtree(node_id, parent_id, entry.get("index"))
+        except ValueError:
+            return False
+    else:
+        return False
+    return True
@@ -0,0 +1,36 @@
+"""
+Identifiants des noeuds.
+
+Par défaut (schéma "random"), un nouveau noeud reçoit un uuid4. Le schéma "content"
+dérive l'ID du contenu : uuid5 de l'ID du parent, de la position et du part number,
+plus un rang d'occurrence qui distingue deux frères identiques. Migrer deux fois le
+même fichier redonne alors les mêmes IDs : seules les lignes modifiées changent, et
+tree_sync n'applique que la différence à un arbre existant.
+"""
+import uuid
+
+RANDOM = "random"
+CONTENT = "content"
+ID_SCHEMES = (RANDOM, CONTENT)
+
+# Espace de noms des IDs dérivés du contenu (ne pas changer : les IDs existants en dépendent)
+NODE_NAMESPACE = uuid.UUID("0b6f3c55-2e1d-4a8e-b7a4-6c2f9d41e8b3")
+
+# Séparateur des champs de la clé (absent des textes saisis)
+_KEY_SEPARATOR = "\x1f"
+
+
+def content_id(parent_id, position, part_number, occurrence=0):
+    """ID dérivé du contenu ; occurrence : rang parmi les frères de même position et part number."""
+    key = _KEY_SEPARATOR.join((parent_id, position, part_number, str(occurrence)))
+    return str(uuid.uuid5(NODE_NAMESPACE, key))
+
+
+def free_content_id(parent_id, position, part_number, taken):
+    """Premier ID dérivé du contenu (occurrence 0, 1, ...) pour lequel taken(id) est faux."""
+    occurrence = 0
+    while True:
+        node_id = content_id(parent_id, position, part_number, occurrence)
+        if not taken(node_id):
+            return node_id
+        occurrence += 1
@@ -0,0 +1,188 @@
+"""
+Instrumentation légère des chemins coûteux (chargement, sauvegarde, import en masse, BOM).
+
+Chaque opération est découpée en étapes avec timed() : durée, nombre de lignes et
+variation de mémoire de chaque étape. Une opération de premier niveau (aucune
+opération en cours dans le thread) écrit à la fin une ligne JSON dans un journal
+tournant (perf_log.jsonl, 1 Mo x 5 fichiers) :
+
+    {"time": "...", "operation": "save_data", "seconds": 2.31, "rows": 20000,
+     "memory_delta_mb": 12.4, "stages": [{"name": "snapshot", ...}, ...]}
+
+Variables d'environnement (ou options --profile / --trace-memory des scripts) :
+    PFE_PERF_LOG      chemin du journal (vide : journal désactivé)
+    PFE_PROFILE=1     capture cProfile de chaque opération (fichiers .prof à côté du journal)
+    PFE_TRACE_MEMORY=1  mémoire mesurée par tracemalloc (plus précis, mais ralentit)
+
+La mémoire est celle du processus (psutil, si installé), ou celle suivie par tracemalloc
+s'il est actif ; sinon elle n'est pas mesurée.
+"""
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Journal par défaut : à côté des scripts de l'application
+DEFAULT_LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_log.jsonl")
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUP_COUNT = 5
+
+settings = {
+    "log_file": os.environ.get("PFE_PERF_LOG", DEFAULT_LOG_FILE),
+    "profile": os.environ.get("PFE_PROFILE", "") not in ("", "0"),
+}
+
+_logger = None
+_local = threading.local()
+# Un seul profileur actif à la fois (cProfile ne se partage pas entre threads)
+_profile_lock = threading.Lock()
+
+
+def configure(log_file=None, profile=None, trace_memory=None):
+    """Change le journal, active la capture cProfile ou le suivi tracemalloc."""
+    global _logger
+    if log_file is not None and log_file != settings["log_file"]:
+        settings["log_file"] = log_file
+        _logger = None
+    if profile is not None:
+        settings["profile"] = profile
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def add_arguments(parser):
+    """Ajoute --profile et --trace-memory à un argparse (voir apply_arguments)."""
+    parser.add_argument("--profile", action="store_true", help="Capture cProfile de chaque opération (.prof)")
+    parser.add_argument("--trace-memory", action="store_true", help="Mémoire mesurée par tracemalloc")
+
+
+def apply_arguments(args):
+    configure(profile=args.profile or None, trace_memory=args.trace_memory)
+
+
+if os.environ.get("PFE_TRACE_MEMORY", "") not in ("", "0"):
+    configure(trace_memory=True)
+
+
+def _get_logger():
+    """Logger du journal tournant, créé au premier enregistrement."""
+    global _logger
+    if _logger is None:
+        _logger = logging.getLogger("pfe.perf")
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+            handler.close()
+        handler = logging.handlers.RotatingFileHandler(settings["log_file"], maxBytes=LOG_MAX_BYTES,
+                                                       backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(handler)
+    return _logger
+
+
+def _memory():
+    """Mémoire courante en octets (processus, ou tracemalloc), None si non mesurable."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return None
+
+
+class Stage:
+    """Une étape mesurée ; rows peut être renseigné pendant l'étape."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.seconds = None
+        self.memory_delta_mb = None
+        self.stages = []
+        self.profile_file = None
+
+    def as_dict(self):
+        data = {"name": self.name, "seconds": round(self.seconds, 4)}
+        if self.rows is not None:
+            data["rows"] = self.rows
+        if self.memory_delta_mb is not None:
+            data["memory_delta_mb"] = self.memory_delta_mb
+        if self.stages:
+            data["stages"] = [stage.as_dict() for stage in self.stages]
+        return data
+
+
+@contextmanager
+def timed(name, rows=None):
+    """Mesure le bloc. Dans une opération en cours, c'est une étape ; sinon une opération,
+    écrite dans le journal à la fin (même en cas d'exception)."""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stage = Stage(name, rows)
+    top_level = not stack
+    profiler = None
+    if top_level and settings["profile"] and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+    stack.append(stage)
+    memory_before = _memory()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield stage
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        stage.seconds = time.perf_counter() - start
+        if memory_before is not None:
+            memory_after = _memory()
+            if memory_after is not None:
+                stage.memory_delta_mb = round((memory_after - memory_before) / 1e6, 2) + 0.0  # pas de -0.0
+        stack.pop()
+        if not top_level:
+            stack[-1].stages.append(stage)
+        else:
+            if profiler is not None:
+                stage.profile_file = _dump_profile(profiler, name)
+                _profile_lock.release()
+            _write(stage)
+
+
+def _dump_profile(profiler, name):
+    """Écrit la capture cProfile (lisible avec pstats ou snakeviz). Retourne son chemin."""
+    directory = os.path.join(os.path.dirname(os.path.abspath(settings["log_file"] or DEFAULT_LOG_FILE)), "profiles")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}_{time.strftime('%Y%m%d-%H%M%S')}_{threading.get_ident()}.prof")
+        profiler.dump_stats(path)
+        return path
+    except OSError as e:
+        print(f"Attention: capture cProfile non écrite ({e})")
+        return None
+
+
+def _write(stage):
+    if not settings["log_file"]:
+        return
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "operation": stage.name, "thread": threading.current_thread().name}
+    data = stage.as_dict()
+    del data["name"]
+    record.update(data)
+    if stage.profile_file:
+        record["profile"] = stage.profile_file
+    try:
+        _get_logger().info(json.dumps(record, ensure_ascii=False))
+    except OSError as e:
+        # Journal inaccessible (droits, disque) : l'opération mesurée ne doit pas échouer
+        print(f"Attention: journal de performance non écrit ({e})")
@@ -0,0 +1,176 @@
+"""
+Cumul de la consommation par sous-arbre : quantité et valeur consommées d'un ensemble.
+
+L'export de consommation donne le total de chaque article pour tout le site (table de
+cross_reference.consumption_by_key), pas celui d'une occurrence dans l'arbre : le cumul d'un
+noeud est la somme des consommations des part numbers distincts de son sous-arbre, chaque
+article n'étant compté qu'une fois même s'il apparaît sous plusieurs ensembles.
+Un seul parcours postfixe calcule l'ensemble des clés de chaque sous-arbre (union de celles
+des enfants), puis le cache est tenu à jour par le modèle : une modification ne marque que
+la chaîne des ancêtres concernés, recalculés (des plus profonds vers la racine) à la
+prochaine lecture.
+"""
+from cross_reference import QUANTITY_COLUMN, VALUE_COLUMN
+from tree_model import TreeModel
+from where_used import normalize_part_number
+
+# Colonnes ajoutées au BOM
+ROLLUP_QUANTITY_COLUMN = "Qté cumulée"
+ROLLUP_VALUE_COLUMN = "Valeur cumulée"
+ROLLUP_COLUMNS = [ROLLUP_QUANTITY_COLUMN, ROLLUP_VALUE_COLUMN]
+
+ZERO = (0.0, 0.0)
+
+
+def consumption_dict(table):
+    """Table de consumption_by_key -> {clé: (quantité, valeur)}."""
+    return dict(zip(table.index, zip(table[QUANTITY_COLUMN].astype(float).tolist(),
+                                     table[VALUE_COLUMN].astype(float).tolist())))
+
+
+class RollupIndex:
+    """Cumuls (quantité, valeur) par noeud, construits au premier usage puis tenus à jour."""
+
+    def __init__(self):
+        self.consumption = {}   # clé -> (quantité, valeur)
+        self.clear()
+
+    def clear(self):
+        self._key_of = {}       # node_id -> clé normalisée du part number
+        self._keys = {}         # node_id (noeud avec enfants) -> clés distinctes du sous-arbre
+        self._totals = {}       # node_id -> (quantité, valeur) du sous-arbre
+        self._dirty = set()     # noeuds dont le cumul est à recalculer
+        self._changed = set()   # noeuds recalculés depuis le dernier take_changed() (mise à jour de l'affichage)
+        self.built = False
+
+    def _subtree_keys(self, model, node_id):
+        """Clés distinctes du sous-arbre, depuis celles des enfants (les feuilles n'ont que la leur)."""
+        key = self._key_of.get(node_id)
+        children = model.get_children(node_id)
+        if not children:
+            self._keys.pop(node_id, None)
+            return {key} if key else set()
+        keys = set()
+        for child_id in children:
+            child_keys = self._keys.get(child_id)
+            if child_keys is not None:
+                keys.update(child_keys)
+            elif self._key_of.get(child_id):
+                keys.add(self._key_of[child_id])
+        if key:
+            keys.add(key)
+        self._keys[node_id] = keys
+        return keys
+
+    def _sum(self, keys):
+        """(quantité, valeur) des clés, chacune comptée une fois."""
+        quantity = value = 0.0
+        if len(keys) > len(self.consumption):
+            keys = [key for key in self.consumption if key in keys]
+        for key in keys:
+            key_quantity, key_value = self.consumption.get(key, ZERO)
+            quantity += key_quantity
+            value += key_value
+        return quantity, value
+
+    def build(self, model):
+        """Calcule les cumuls de tout l'arbre en un parcours postfixe (ordre préfixe inversé :
+        chaque noeud est vu après tous ses descendants)."""
+        self.clear()
+        order = [node_id for node_id, _ in model.walk()]
+        for node_id in order:
+            self._key_of[node_id] = normalize_part_number(model.nodes[node_id]["part_number"])
+        for node_id in reversed(order):
+            self._totals[node_id] = self._sum(self._subtree_keys(model, node_id))
+        self.built = True
+
+    def set_consumption(self, model, table):
+        """Remplace les données de consommation ; seuls les noeuds dont le part number a changé
+        de consommation (et leurs ancêtres) sont recalculés."""
+        new = consumption_dict(table)
+        old = self.consumption
+        self.consumption = new
+        if not self.built:
+            return
+        changed = {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+        if changed:
+            for node_id, key in self._key_of.items():
+                if key in changed:
+                    self._mark(model, node_id)
+
+    def _mark(self, model, node_id):
+        """Marque le noeud et tous ses ancêtres (coût : profondeur)."""
+        self._dirty.update(model.ancestors(node_id))
+
+    def refresh(self, model):
+        """Recalcule les cumuls marqués, des plus profonds vers la racine : chaque noeud
+        ne réunit que les clés de ses enfants directs. Retourne les IDs recalculés."""
+        if not self._dirty:
+            return []
+        dirty = sorted(self._dirty, key=lambda node_id: len(model.ancestors(node_id)), reverse=True)
+        self._dirty.clear()
+        for node_id in dirty:
+            self._totals[node_id] = self._sum(self._subtree_keys(model, node_id))
+        self._changed.update(dirty)
+        return dirty
+
+    def take_changed(self, model):
+        """Noeuds dont le cumul a été recalculé depuis le dernier appel (encore dans l'arbre)."""
+        self.refresh(model)
+        changed = [node_id for node_id in self._changed if node_id in model]
+        self._changed.clear()
+        return changed
+
+    def totals(self, model, node_id):
+        """(quantité, valeur) cumulées du sous-arbre du noeud (None si le noeud n'est pas dans l'arbre)."""
+        if not self.built:
+            self.build(model)
+        elif self._dirty:
+            self.refresh(model)
+        return self._totals.get(node_id)
+
+    # ====== Abonnement au modèle ======
+
+    def node_added(self, model, node_id):
+        if self.built:
+            self._key_of[node_id] = normalize_part_number(model.nodes[node_id]["part_number"])
+            self._mark(model, node_id)
+
+    def node_updated(self, model, node_id, old_values):
+        if self.built and old_values["part_number"] != model.nodes[node_id]["part_number"]:
+            self._key_of[node_id] = normalize_part_number(model.nodes[node_id]["part_number"])
+            self._mark(model, node_id)
+
+    def subtree_removed(self, model, removed):
+        if not self.built:
+            return
+        removed_ids = {node_id for node_id, _ in removed}
+        for node_id in removed_ids:
+            self._key_of.pop(node_id, None)
+            self._keys.pop(node_id, None)
+            self._totals.pop(node_id, None)
+            self._dirty.discard(node_id)
+            self._changed.discard(node_id)
+        # Les parents des racines supprimées (toujours dans le modèle) perdent leur cumul
+        for node_id, data in removed:
+            if data["parent_id"] not in removed_ids and data["parent_id"] in model:
+                self._mark(model, data["parent_id"])
+
+    def subtree_moved(self, model, node_id, old_parent_id):
+        if not self.built:
+            return
+        if old_parent_id in model:
+            self._mark(model, old_parent_id)
+        self._mark(model, model.parent(node_id))
+
+
+def rollup_frame(tree_df, consumption_table):
+    """Colonnes ROLLUP_COLUMNS pour chaque ligne d'un arbre (colonnes ID, ParentID, PartNumber),
+    dans l'ordre des lignes. Les lignes hors de l'arbre (cycles) restent vides."""
+    model, _ = TreeModel.from_dataframe(tree_df)
+    index = RollupIndex()
+    index.set_consumption(model, consumption_table)
+    index.build(model)
+    totals = [index.totals(model, node_id) for node_id in tree_df["ID"].astype(str).tolist()]
+    return {ROLLUP_QUANTITY_COLUMN: [None if total is None else total[0] for total in totals],
+            ROLLUP_VALUE_COLUMN: [None if total is None else total[1] for total in totals]}
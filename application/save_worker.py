@@ -0,0 +1,59 @@
+"""
+Thread de sauvegarde en arrière-plan.
+L'interface prépare un instantané immuable de l'arbre et le confie au thread,
+qui écrit le classeur sans bloquer la boucle Tk. Les demandes rapprochées
+sont fusionnées : seul le dernier instantané en attente est écrit.
+Les événements (début, fin, erreur) sont publiés dans une file que
+l'interface lit périodiquement pour mettre à jour sa barre d'état.
+"""
+import queue
+import threading
+
+
+class SaveWorker:
+    """Exécute write_func(snapshot, path) dans un thread dédié, une sauvegarde à la fois."""
+
+    def __init__(self, write_func):
+        self.write_func = write_func
+        # Événements pour l'interface : ("start", n), ("done", n, token), ("error", message, token)
+        self.events = queue.Queue()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending = None      # (snapshot, path, token) en attente, remplacé par les demandes suivantes
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name="SaveWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot, path, token=None):
+        """Programme l'écriture de snapshot. Une demande encore en attente est remplacée.
+        token est renvoyé tel quel avec l'événement de fin (ex: position dans le journal)."""
+        with self._lock:
+            self._pending = (snapshot, path, token)
+            self._wakeup.notify_all()
+
+    def is_idle(self):
+        with self._lock:
+            return self._pending is None and not self._busy
+
+    def wait_idle(self, timeout=None):
+        """Attend que toutes les sauvegardes demandées soient écrites (ex: à la fermeture)."""
+        with self._lock:
+            return self._wakeup.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(lambda: self._pending is not None)
+                snapshot, path, token = self._pending
+                self._pending = None
+                self._busy = True
+            self.events.put(("start", len(snapshot)))
+            try:
+                count = self.write_func(snapshot, path)
+                self.events.put(("done", count, token))
+            except Exception as e:
+                self.events.put(("error", str(e), token))
+            finally:
+                with self._lock:
+                    self._busy = False
+                    self._wakeup.notify_all()
@@ -0,0 +1,167 @@
+"""
+Index de recherche en mémoire sur PartNumber et Description.
+- Requêtes de 3 caractères ou plus : recherche de sous-chaîne par trigrammes
+  (on part de la liste de trigramme la plus courte, puis on vérifie le texte).
+- Requêtes plus courtes : recherche par préfixe du part number.
+L'index est mis à jour à chaque ajout, modification ou suppression de noeud
+(abonné au modèle) ; les entrées périmées sont filtrées à la vérification et
+l'index est reconstruit quand elles deviennent trop nombreuses.
+"""
+from array import array
+
+# Taille des n-grammes de l'index de sous-chaînes
+NGRAM = 3
+
+# Nombre maximal de résultats retournés par une recherche
+MAX_RESULTS = 200
+
+
+def normalize(text):
+    """Texte comparé par la recherche : sans casse ni espaces superflus."""
+    return " ".join(str(text).casefold().split())
+
+
+def ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class SearchIndex:
+    """Index trigrammes (sous-chaînes) + préfixes courts du part number."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._slots = {}        # node_id -> numéro de document
+        self._docs = []         # numéro -> (node_id, pn normalisé, description normalisée) ou None
+        self._grams = {}        # trigramme -> array d'entiers (numéros de documents, peut contenir des doublons périmés)
+        self._short = {}        # préfixe de 1 ou 2 caractères du part number -> array de numéros
+        self._stale = 0         # entrées périmées (noeuds supprimés ou textes modifiés)
+        self.built = False
+
+    def build(self, model):
+        """Indexe tous les noeuds du modèle (appelé au premier usage)."""
+        self.clear()
+        for node_id, node in model.nodes.items():
+            self._add(node_id, node["part_number"], node["description"])
+        self.built = True
+
+    def __len__(self):
+        return len(self._slots)
+
+    # ====== Mise à jour ======
+
+    def _post(self, table, key, slot):
+        postings = table.get(key)
+        if postings is None:
+            postings = table[key] = array("i")
+        postings.append(slot)
+
+    def _keys(self, pn, desc):
+        grams = ngrams(pn) | ngrams(desc)
+        short = {pn[:1], pn[:2]} - {""}
+        return grams, short
+
+    def _add(self, node_id, part_number, description):
+        pn, desc = normalize(part_number), normalize(description)
+        slot = len(self._docs)
+        self._docs.append((node_id, pn, desc))
+        self._slots[node_id] = slot
+        grams, short = self._keys(pn, desc)
+        for gram in grams:
+            self._post(self._grams, gram, slot)
+        for prefix in short:
+            self._post(self._short, prefix, slot)
+
+    def _update(self, node_id, part_number, description):
+        slot = self._slots[node_id]
+        _, old_pn, old_desc = self._docs[slot]
+        pn, desc = normalize(part_number), normalize(description)
+        if (pn, desc) == (old_pn, old_desc):
+            return
+        self._docs[slot] = (node_id, pn, desc)
+        old_grams, old_short = self._keys(old_pn, old_desc)
+        grams, short = self._keys(pn, desc)
+        # Seules les nouvelles clés sont ajoutées ; les anciennes deviennent périmées
+        for gram in grams - old_grams:
+            self._post(self._grams, gram, slot)
+        for prefix in short - old_short:
+            self._post(self._short, prefix, slot)
+        self._stale += len(old_grams - grams) + len(old_short - short)
+
+    def _remove(self, node_id):
+        slot = self._slots.pop(node_id, None)
+        if slot is None:
+            return
+        _, pn, desc = self._docs[slot]
+        self._docs[slot] = None
+        grams, short = self._keys(pn, desc)
+        self._stale += len(grams) + len(short)
+
+    def _maybe_rebuild(self, model):
+        # Reconstruire quand les entrées périmées dépassent les entrées utiles (une vingtaine de clés par noeud)
+        if self._stale > 20 * max(len(self._slots), 1000):
+            self.build(model)
+
+    # ====== Abonnement au modèle ======
+
+    def node_added(self, model, node_id):
+        if self.built:
+            node = model.nodes[node_id]
+            self._add(node_id, node["part_number"], node["description"])
+
+    def node_updated(self, model, node_id, old_values):
+        if self.built:
+            node = model.nodes[node_id]
+            self._update(node_id, node["part_number"], node["description"])
+            self._maybe_rebuild(model)
+
+    def subtree_removed(self, model, removed):
+        if self.built:
+            for node_id, _ in removed:
+                self._remove(node_id)
+            self._maybe_rebuild(model)
+
+    # ====== Recherche ======
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Retourne les IDs des noeuds correspondants, les meilleurs d'abord :
+        part number exact, puis préfixe du part number, puis sous-chaîne du part number,
+        puis sous-chaîne de la description."""
+        q = normalize(query)
+        if not q:
+            return []
+        if len(q) < NGRAM:
+            candidates = self._short.get(q, ())
+        else:
+            # La liste de trigramme la plus courte borne le nombre de vérifications
+            postings = []
+            for gram in ngrams(q):
+                found = self._grams.get(gram)
+                if found is None:
+                    return []
+                postings.append(found)
+            candidates = min(postings, key=len)
+
+        ranked = ([], [], [], [])
+        seen = set()
+        for slot in candidates:
+            doc = self._docs[slot]
+            if doc is None or slot in seen:
+                continue
+            seen.add(slot)
+            node_id, pn, desc = doc
+            if pn == q:
+                ranked[0].append(node_id)
+            elif pn.startswith(q):
+                ranked[1].append(node_id)
+            elif len(q) >= NGRAM and q in pn:
+                ranked[2].append(node_id)
+            elif len(q) >= NGRAM and q in desc:
+                ranked[3].append(node_id)
+        results = []
+        for group in ranked:
+            results.extend(group)
+            if len(results) >= limit:
+                break
+        return results[:limit]
@@ -0,0 +1,104 @@
+"""
+Rapport des sous-ensembles répétés de la nomenclature.
+
+Un même sous-ensemble (même Part Number, même description, mêmes enfants aux mêmes
+positions) recopié sous plusieurs parents est repéré en regroupant les sous-arbres
+identiques (hachage consing, de bas en haut, en un seul parcours postfixe) : chaque
+composant n'est décrit qu'une fois, avec le nombre de ses références et le nombre de
+lignes que ses copies occupent dans l'arbre.
+
+Le rapport ne change ni l'arbre, ni le stockage, ni l'export : chaque occurrence reste
+un noeud (une ligne) avec son propre ID. Il sert à mesurer ce que coûtent les copies
+et à retrouver une occurrence de chaque sous-ensemble répété (tree_cli.py shared).
+"""
+from tree_model import ROOT_ID, build_tree_index
+
+
+class ComponentGraph:
+    """Sous-arbres uniques (composants) et leurs références.
+
+    - components[c] = (part_number, description, edges) où edges est un tuple de (position, composant enfant)
+    - roots : tuple de (position, composant) au premier niveau
+    - uses[c] : nombre de références au composant (parents et racine)
+    - sizes[c] : nombre de lignes du sous-arbre (composant inclus)
+    - first_node[c] : ID d'une occurrence du composant (la première en ordre postfixe)
+    """
+
+    def __init__(self):
+        self.components = []
+        self.roots = ()
+        self.uses = []
+        self.sizes = []
+        self.first_node = []
+
+    @classmethod
+    def from_model(cls, model):
+        return cls.from_index(model.nodes, model.children)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Construit le graphe depuis un classeur d'arbre (ID, ParentID, ...) sans créer de TreeModel."""
+        nodes, children, _ = build_tree_index(df)
+        return cls.from_index(nodes, children)
+
+    @classmethod
+    def from_index(cls, nodes, children):
+        """Regroupe les sous-arbres identiques en un seul parcours postfixe (coût : taille de l'arbre)."""
+        graph = cls()
+        interned = {}
+        component_of = {}
+        # Parcours postfixe itératif : un noeud est traité quand tous ses enfants l'ont été
+        stack = [(root_id, False) for root_id in reversed(children.get(ROOT_ID, ()))]
+        while stack:
+            node_id, expanded = stack.pop()
+            child_ids = children.get(node_id, ())
+            if not expanded and child_ids:
+                stack.append((node_id, True))
+                stack.extend((child_id, False) for child_id in reversed(child_ids))
+                continue
+            node = nodes[node_id]
+            edges = tuple((nodes[child_id]["position"], component_of.pop(child_id)) for child_id in child_ids)
+            key = (node["part_number"], node["description"], edges)
+            component = interned.get(key)
+            if component is None:
+                component = interned[key] = len(graph.components)
+                graph.components.append(key)
+                graph.uses.append(0)
+                graph.sizes.append(1 + sum(graph.sizes[child] for _, child in edges))
+                graph.first_node.append(node_id)
+            component_of[node_id] = component
+        graph.roots = tuple((nodes[root_id]["position"], component_of.pop(root_id)) for root_id in children.get(ROOT_ID, ()))
+        for _, component in graph.roots:
+            graph.uses[component] += 1
+        for _, _, edges in graph.components:
+            for _, child in edges:
+                graph.uses[child] += 1
+        return graph
+
+    # ====== Lecture ======
+
+    def __len__(self):
+        """Nombre de composants uniques."""
+        return len(self.components)
+
+    def occurrence_count(self):
+        """Nombre de lignes de l'arbre."""
+        return sum(self.sizes[component] for _, component in self.roots)
+
+    def shared(self):
+        """Composants référencés plusieurs fois (avec enfants), des plus coûteux aux moins coûteux :
+        liste de (composant, références, lignes occupées par les copies au-delà de la première)."""
+        result = [(component, self.uses[component], (self.uses[component] - 1) * self.sizes[component])
+                  for component in range(len(self.components))
+                  if self.uses[component] > 1 and self.components[component][2]]
+        result.sort(key=lambda item: item[2], reverse=True)
+        return result
+
+    def stats(self):
+        shared = self.shared()
+        return {"occurrences": self.occurrence_count(), "components": len(self.components),
+                "shared_assemblies": len(shared), "edges": len(self.roots) + sum(len(edges) for _, _, edges in self.components)}
+
+    def display_name(self, component):
+        part_number, description, _ = self.components[component]
+        return description if description else part_number
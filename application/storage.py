@@ -0,0 +1,281 @@
+"""
+Couche de stockage de l'arbre, interchangeable :
+- ExcelStorage : classeur Excel (instantané) + journal des modifications (fonctionnement historique)
+- SQLiteStorage : base SQLite locale, transactionnelle, indexée sur ParentID ;
+  chaque modification est une mise à jour ligne par ligne et le classeur Excel
+  mis en forme devient un export à la demande.
+
+Les deux classes exposent la même interface :
+load(), add_nodes(), update_node(), update_nodes(), delete_subtree(), delete_subtrees(), move_node(), move_nodes(),
+needs_compaction(), pending_changes(), checkpoint(), compacted(), close().
+
+Utilisation en ligne de commande (import unique d'un classeur existant) :
+    python storage.py "tree_data_internal copy.xlsx" tree_data.db
+"""
+import os
+import sqlite3
+import sys
+import pandas as pd
+
+from tree_model import TreeModel, NODE_FIELDS, report_summary
+from journal import ChangeJournal, add_entries
+from perf_log import timed
+from workbook_reader import TreeWorkbookReader
+
+
+def read_tree_workbook(path):
+    """Lit un classeur d'arbre (format interne ou classeur mis en forme avec zone de titre).
+    Retourne un DataFrame avec au moins la colonne ID (vide si le fichier est vide)."""
+    # Le classeur mis en forme commence par une zone de titre :
+    # la ligne d'en-tête est celle qui contient "ID"
+    with TreeWorkbookReader(path, ["ID"]) as reader:
+        if reader.header_row is None:
+            if reader.empty:
+                return pd.DataFrame(columns=["ID", "ParentID", "Position", "PartNumber", "Description"])
+            raise ValueError(f"Colonne 'ID' introuvable dans {path}.")
+        df = reader.read()
+    return df.dropna(subset=["ID"]).reset_index(drop=True)
+
+
+def load_excel_model(excel_path, journal):
+    """Charge l'instantané Excel (s'il existe) puis rejoue le journal. Retourne (model, report)."""
+    if os.path.exists(excel_path):
+        with timed("read_workbook") as stage:
+            df = read_tree_workbook(excel_path)
+            stage.rows = len(df)
+        with timed("build_model", rows=len(df)):
+            model, report = TreeModel.from_dataframe(df)
+    else:
+        model, report = TreeModel(), None
+    with timed("journal_replay") as stage:
+        replayed = journal.replay(model)
+        stage.rows = replayed
+    if replayed:
+        print(f"{replayed} modification(s) rejouée(s) depuis le journal.")
+    return model, report
+
+
+class ExcelStorage:
+    """Classeur Excel (instantané complet, réécrit à la compaction) + journal append-only."""
+
+    def __init__(self, excel_path, journal_path=None):
+        self.excel_path = excel_path
+        self.journal = ChangeJournal(journal_path or excel_path + ".journal")
+
+    def load(self):
+        return load_excel_model(self.excel_path, self.journal)
+
+    # ====== Modifications (journalisées) ======
+
+    def add_nodes(self, model, node_ids):
+        self.journal.record_many(add_entries(model, node_ids))
+
+    def update_node(self, model, node_id, **fields):
+        self.journal.record_update(node_id, **fields)
+
+    def update_nodes(self, model, node_ids):
+        """Champs (position, part_number, description) de plusieurs noeuds ; une seule écriture."""
+        self.journal.record_many([{"op": "update", "id": node_id, "fields": {key: model.nodes[node_id][key] for key in NODE_FIELDS}}
+                                  for node_id in node_ids])
+
+    def delete_subtree(self, node_id):
+        self.journal.record_delete(node_id)
+
+    def delete_subtrees(self, node_ids):
+        self.journal.record_many([{"op": "delete", "id": node_id} for node_id in node_ids])
+
+    def move_node(self, model, node_id, index=None):
+        self.journal.record_move(node_id, model.parent(node_id), index)
+
+    def move_nodes(self, model, moves):
+        """moves : (node_id, rang ou None) dans l'ordre d'application ; une seule écriture."""
+        self.journal.record_many([{"op": "move", "id": node_id, "parent_id": model.parent(node_id), "index": index}
+                                  for node_id, index in moves])
+
+    # ====== Compaction (réécriture du classeur) ======
+
+    def needs_compaction(self):
+        return self.journal.needs_compaction()
+
+    def pending_changes(self):
+        return len(self.journal)
+
+    def checkpoint(self):
+        return self.journal.checkpoint()
+
+    def compacted(self, mark):
+        """Le classeur contenant l'état au point mark a été écrit."""
+        self.journal.discard(mark)
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    """Base SQLite : une ligne par noeud, index sur parent_id, ordre des frères dans sort_order."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS nodes ("
+                " id TEXT PRIMARY KEY,"
+                " parent_id TEXT NOT NULL DEFAULT '',"
+                " sort_order INTEGER NOT NULL DEFAULT 0,"
+                " position TEXT NOT NULL DEFAULT '',"
+                " part_number TEXT NOT NULL DEFAULT '',"
+                " description TEXT NOT NULL DEFAULT '')"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_parent ON nodes(parent_id, sort_order)")
+
+    def load(self):
+        with timed("read_sql") as stage:
+            df = pd.read_sql_query(
+                "SELECT id AS ID, parent_id AS ParentID, position AS Position, part_number AS PartNumber,"
+                " description AS Description FROM nodes ORDER BY parent_id, sort_order",
+                self.conn,
+            )
+            stage.rows = len(df)
+        with timed("build_model", rows=len(df)):
+            return TreeModel.from_dataframe(df)
+
+    # ====== Modifications (une transaction par opération) ======
+
+    def add_nodes(self, model, node_ids):
+        """Insère (ou remplace) les lignes des noeuds ; une seule transaction pour tout le lot."""
+        new_ids = set(node_ids)
+        by_parent = {}
+        for node_id in node_ids:
+            by_parent.setdefault(model.parent(node_id), []).append(node_id)
+        rows = []
+        renumber = []
+        for parent_id, ids in by_parent.items():
+            siblings = model.get_children(parent_id)
+            # Les nouveaux noeuds sont en fin de liste : seules leurs lignes sont écrites,
+            # numérotées après le plus grand sort_order existant (une suppression laisse des trous).
+            # Sinon (insertion au milieu), l'ordre de tous les frères est réécrit.
+            tail = siblings[len(siblings) - len(ids):]
+            if not all(child_id in new_ids for child_id in tail):
+                renumber.append(parent_id)
+                continue
+            last_order = self.conn.execute("SELECT MAX(sort_order) FROM nodes WHERE parent_id = ?", (parent_id,)).fetchone()[0]
+            if last_order is None:
+                last_order = -1
+            for offset, child_id in enumerate(tail, start=1):
+                node = model.nodes[child_id]
+                rows.append((child_id, parent_id, last_order + offset, node["position"], node["part_number"], node["description"]))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO nodes (id, parent_id, sort_order, position, part_number, description)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows)
+            for parent_id in renumber:
+                self._write_order(model, parent_id, new_ids)
+
+    def _write_order(self, model, parent_id, new_ids=()):
+        """Réécrit l'ordre des frères (les nouveaux noeuds sont insérés avec toutes leurs colonnes)."""
+        for order, child_id in enumerate(model.get_children(parent_id)):
+            if child_id in new_ids:
+                node = model.nodes[child_id]
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO nodes (id, parent_id, sort_order, position, part_number, description)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (child_id, parent_id, order, node["position"], node["part_number"], node["description"]))
+            else:
+                self.conn.execute("UPDATE nodes SET sort_order = ? WHERE id = ?", (order, child_id))
+
+    def update_node(self, model, node_id, **fields):
+        node = model.nodes[node_id]
+        with self.conn:
+            self.conn.execute("UPDATE nodes SET position = ?, part_number = ?, description = ? WHERE id = ?",
+                              (node["position"], node["part_number"], node["description"], node_id))
+
+    def update_nodes(self, model, node_ids):
+        """Champs de plusieurs noeuds dans une seule transaction."""
+        with self.conn:
+            self.conn.executemany("UPDATE nodes SET position = ?, part_number = ?, description = ? WHERE id = ?",
+                                  [(model.nodes[node_id]["position"], model.nodes[node_id]["part_number"],
+                                    model.nodes[node_id]["description"], node_id) for node_id in node_ids])
+
+    def delete_subtree(self, node_id):
+        """Supprime le noeud et ses descendants (parcours récursif appuyé sur l'index parent_id)."""
+        self.delete_subtrees([node_id])
+
+    def delete_subtrees(self, node_ids):
+        """Supprime plusieurs sous-arbres dans une seule transaction.
+        La requête commence par DELETE : sqlite3 n'ouvre la transaction implicite que pour
+        les requêtes qu'il reconnaît comme des écritures (pas pour un WITH en tête)."""
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM nodes WHERE id IN ("
+                " WITH RECURSIVE subtree(id) AS ("
+                " SELECT ? UNION ALL SELECT nodes.id FROM nodes JOIN subtree ON nodes.parent_id = subtree.id)"
+                " SELECT id FROM subtree)", [(node_id,) for node_id in node_ids])
+
+    def move_node(self, model, node_id, index=None):
+        with self.conn:
+            self.conn.execute("UPDATE nodes SET parent_id = ? WHERE id = ?", (model.parent(node_id), node_id))
+            self._write_order(model, model.parent(node_id))
+
+    def move_nodes(self, model, moves):
+        """Déplacement d'un lot : les lignes déplacées sont réécrites (parent et ordre) comme un ajout,
+        dans une seule transaction ; l'ordre des frères n'est renuméroté que si le lot n'est pas en fin de liste."""
+        self.add_nodes(model, [node_id for node_id, _ in moves])
+
+    # ====== Pas de compaction : chaque modification est déjà écrite ======
+
+    def needs_compaction(self):
+        return False
+
+    def pending_changes(self):
+        return 0
+
+    def checkpoint(self):
+        return None
+
+    def compacted(self, mark):
+        pass
+
+    def close(self):
+        self.conn.close()
+
+
+def open_storage(backend, excel_path, db_path):
+    """Ouvre le stockage choisi ("sqlite" ou "excel").
+    Au premier lancement en SQLite, le classeur Excel existant est importé une fois."""
+    if backend == "excel":
+        return ExcelStorage(excel_path)
+    if backend != "sqlite":
+        raise ValueError(f"Stockage inconnu: {backend}")
+    if not os.path.exists(db_path) and os.path.exists(excel_path):
+        count = import_workbook(excel_path, db_path)
+        print(f"{count} éléments importés de {excel_path} vers {db_path}.")
+    return SQLiteStorage(db_path)
+
+
+def import_workbook(excel_path, db_path, journal_path=None):
+    """Import unique : charge un classeur existant (et son journal) dans la base SQLite.
+    Retourne le nombre de noeuds importés."""
+    journal = ChangeJournal(journal_path or excel_path + ".journal")
+    model, report = load_excel_model(excel_path, journal)
+    storage = SQLiteStorage(db_path)
+    try:
+        with storage.conn:
+            storage.conn.execute("DELETE FROM nodes")
+        storage.add_nodes(model, [node_id for node_id, _ in model.walk()])
+    finally:
+        storage.close()
+    summary = report_summary(report)
+    if summary:
+        print(f"Attention: {summary}")
+    return len(model)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python storage.py <classeur.xlsx> <base.db>")
+        sys.exit(1)
+    count = import_workbook(sys.argv[1], sys.argv[2])
+    print(f"✅ {count} éléments importés dans {sys.argv[2]}")
@@ -1,12 +1,72 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import pandas as pd
-import uuid
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from tree_core import TreeCore
+from storage import open_storage
+from excel_export import write_styled_workbook
+from save_worker import SaveWorker
+from search_index import SearchIndex, MAX_RESULTS
+from bulk_import import ColumnLayout, ImportRow, parse_fixed_width, column_spans, detect_layout
+from perf_log import timed
+from where_used import WhereUsedIndex
+from cross_reference import consumption_by_key
+from rollup import RollupIndex, ROLLUP_QUANTITY_COLUMN, ROLLUP_VALUE_COLUMN
 
-# Nom du fichier Excel pour la sauvegarde
+# Nom du fichier Excel pour la sauvegarde (stockage "excel") ou l'export mis en forme (stockage "sqlite")
 EXCEL_FILE = "tree_data_internal copy.xlsx"
 
+# Stockage : "sqlite" (base locale, chaque modification écrite ligne par ligne, Excel en export à la demande)
+# ou "excel" (classeur + journal des modifications rejoué au démarrage)
+STORAGE_BACKEND = os.environ.get("TREE_STORAGE", "sqlite")
+
+# IDs des nouveaux noeuds : "random" (uuid4) ou "content" (dérivés du parent, de la position
+# et du part number : mêmes IDs que migrate_data avec id_scheme="content")
+ID_SCHEME = os.environ.get("TREE_IDS", "random")
+
+# Base SQLite (créée au premier lancement en important EXCEL_FILE)
+DB_FILE = "tree_data.db"
+
+# Au-delà de ce nombre de noeuds, l'arbre visuel est rempli à la demande (mode paresseux) :
+# seuls les enfants des noeuds dépliés sont insérés dans le Treeview
+LAZY_LOAD_THRESHOLD = 5000
+
+# Préfixe de l'enfant fictif qui rend dépliable un noeud dont les enfants ne sont pas encore insérés
+PLACEHOLDER_PREFIX = "__lazy__:"
+
+# Délai (ms) pendant lequel les modifications rapprochées sont regroupées en une seule sauvegarde
+SAVE_DELAY_MS = 500
+
+# Délai (ms) après la dernière frappe avant de lancer la recherche
+SEARCH_DELAY_MS = 150
+
+# Délai (ms) après la dernière sélection avant d'afficher le fil d'Ariane (flèche maintenue)
+SELECT_DELAY_MS = 40
+
+# Distance (pixels) à partir de laquelle un clic maintenu devient un glisser-déposer
+DRAG_THRESHOLD = 6
+# Modificateurs de event.state (Maj, Ctrl) : clic de sélection multiple, pas de glisser
+SHIFT_MASK = 0x0001
+CONTROL_MASK = 0x0004
+
+# Nombre de lignes affichées dans l'aperçu de l'import en masse
+IMPORT_PREVIEW_ROWS = 50
+
+# Délai (ms) après la dernière frappe avant de recolorer les colonnes de l'import en masse
+HIGHLIGHT_DELAY_MS = 120
+
+# Tags de coloration de l'import en masse ("colored" marque une ligne déjà colorée)
+HIGHLIGHT_TAGS = ("pos", "pn", "desc", "colored")
+
+# Au-delà de ce nombre de lignes collées, la détection des colonnes tourne dans un thread
+DETECT_THREAD_LINES = 5000
+
+
 class TreeApp:
     def __init__(self, root):
         self.root = root
@@ -24,7 +84,48 @@ class TreeApp:
         tk.Button(button_frame, text="Importer Masse", command=self.import_bulk_children).pack(side=tk.LEFT, padx=5) # Nouveau bouton
         tk.Button(button_frame, text="Modifier", command=self.edit_node).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Supprimer", command=self.delete_node).pack(side=tk.LEFT, padx=5)
-        tk.Button(button_frame, text="Sauvegarder", command=self.save_data).pack(side=tk.RIGHT, padx=5)
+        tk.Button(button_frame, text="Couper", command=self.cut_selection).pack(side=tk.LEFT, padx=(15, 5))
+        tk.Button(button_frame, text="Copier", command=self.copy_selection).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Coller", command=self.paste_selection).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Cas d'emploi", command=self.show_where_used).pack(side=tk.LEFT, padx=(15, 5))
+        tk.Button(button_frame, text="Consommation", command=self.load_consumption).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="↶ Annuler", command=self.undo).pack(side=tk.LEFT, padx=(15, 5))
+        tk.Button(button_frame, text="↷ Rétablir", command=self.redo).pack(side=tk.LEFT, padx=5)
+        save_label = "Exporter Excel" if STORAGE_BACKEND == "sqlite" else "Sauvegarder"
+        tk.Button(button_frame, text=save_label, command=self.save_data).pack(side=tk.RIGHT, padx=5)
+
+        # ====== Cadre de recherche (PartNumber et Description) ======
+        search_frame = tk.Frame(self.root)
+        search_frame.pack(fill=tk.X, padx=10, pady=(0, 2))
+
+        tk.Label(search_frame, text="🔍 Rechercher:", font=("Segoe UI", 9, "bold")).pack(side=tk.LEFT, padx=(5, 2))
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(search_frame, textvariable=self.search_var, width=40)
+        self.search_entry.pack(side=tk.LEFT, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", self.jump_to_first_result)
+        self.search_entry.bind("<Escape>", self.clear_search)
+        self.search_count_label = tk.Label(search_frame, text="", fg="gray", font=("Segoe UI", 9, "italic"))
+        self.search_count_label.pack(side=tk.LEFT, padx=5)
+
+        # Liste des résultats (affichée seulement quand il y en a)
+        self.search_results_frame = tk.Frame(self.root)
+        self.search_listbox = tk.Listbox(self.search_results_frame, height=6, font=("Segoe UI", 9))
+        self.search_listbox.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        results_scrollbar = ttk.Scrollbar(self.search_results_frame, orient="vertical", command=self.search_listbox.yview)
+        results_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.search_listbox.configure(yscrollcommand=results_scrollbar.set)
+        self.search_listbox.bind("<Double-Button-1>", self.on_search_result)
+        self.search_listbox.bind("<Return>", self.on_search_result)
+        self.search_results = []
+        self._search_after_id = None
+
+        # Index de recherche : construit à la première recherche, puis tenu à jour par le modèle
+        self.search_index = SearchIndex()
+        # Cas d'emploi (Part Number -> noeuds), construit au premier usage puis tenu à jour
+        self.where_used = WhereUsedIndex()
+        # Quantité et valeur consommées cumulées par sous-arbre (après chargement d'un export de consommation)
+        self.rollup = RollupIndex()
 
         # ====== Cadre du Fil d'Ariane (Breadcrumb) ======
         breadcrumb_outer_frame = tk.Frame(self.root, bg="#f0f0f0", relief=tk.GROOVE, borderwidth=1)
@@ -35,24 +136,40 @@ class TreeApp:
         # Cadre interne pour les liens cliquables du breadcrumb
         self.breadcrumb_frame = tk.Frame(breadcrumb_outer_frame, bg="#f0f0f0")
         self.breadcrumb_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=3)
+        self.breadcrumb_outer_frame = breadcrumb_outer_frame
         
         # Label par défaut quand rien n'est sélectionné
         self.breadcrumb_placeholder = tk.Label(self.breadcrumb_frame, text="Sélectionnez un élément pour voir son chemin", fg="gray", bg="#f0f0f0", font=("Segoe UI", 9, "italic"))
         self.breadcrumb_placeholder.pack(side=tk.LEFT)
+        # Liens du chemin, réutilisés d'une sélection à l'autre (voir breadcrumb_slot)
+        self.breadcrumb_slots = []
+        self.breadcrumb_path = ()
+        self._select_after_id = None
+
+        # ====== Barre d'état (progression et erreurs de sauvegarde) ======
+        self.status_var = tk.StringVar(value="Prêt")
+        self.status_label = tk.Label(self.root, textvariable=self.status_var, anchor=tk.W, relief=tk.SUNKEN,
+                                     borderwidth=1, fg="#333333", font=("Segoe UI", 9))
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
 
         # Arbre (Treeview)
-        # Colonnes: Part Number (sera dans la colonne #0 pour l'arborescence), Position, Description
-        self.tree = ttk.Treeview(self.root, columns=("Position", "Description"))
+        # Colonnes: Part Number (sera dans la colonne #0 pour l'arborescence), Position, Description,
+        # puis les cumuls de consommation du sous-arbre (vides tant qu'aucun export n'est chargé)
+        self.tree = ttk.Treeview(self.root, columns=("Position", "Description", ROLLUP_QUANTITY_COLUMN, ROLLUP_VALUE_COLUMN))
         
         # Configuration de la colonne #0 (l'arbre lui-même) -> Part Number
         self.tree.heading("#0", text="Part Number (Arbre)", anchor=tk.W)
         self.tree.heading("Position", text="Position", anchor=tk.W)
         self.tree.heading("Description", text="Description", anchor=tk.W)
+        self.tree.heading(ROLLUP_QUANTITY_COLUMN, text=ROLLUP_QUANTITY_COLUMN, anchor=tk.E)
+        self.tree.heading(ROLLUP_VALUE_COLUMN, text=ROLLUP_VALUE_COLUMN, anchor=tk.E)
         
         # Configuration des colonnes
         self.tree.column("#0", stretch=tk.YES, width=300) 
         self.tree.column("Position", stretch=tk.NO, width=80) # Position est souvent court
         self.tree.column("Description", stretch=tk.YES, width=420)
+        self.tree.column(ROLLUP_QUANTITY_COLUMN, stretch=tk.NO, width=90, anchor=tk.E)
+        self.tree.column(ROLLUP_VALUE_COLUMN, stretch=tk.NO, width=110, anchor=tk.E)
 
         self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
@@ -62,195 +179,257 @@ class TreeApp:
         self.tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.place(relx=1.0, rely=0.0, relheight=1.0, anchor="ne") 
 
-        # Dictionnaire pour stocker les données en mémoire (id -> {parent_id, position, part_number, description})
-        self.data_store = {}
+        # Noyau sans interface : modèle en mémoire, stockage et historique annuler / rétablir.
+        # Le stockage reçoit chaque modification immédiatement (ligne SQLite ou journal),
+        # le classeur complet n'est réécrit qu'à la demande ou à la compaction du journal.
+        # Cette fenêtre n'est qu'une vue : elle reçoit les mises à jour ciblées (view_*)
+        # Classeur sauvegardé (stockage "excel") ou exporté (stockage "sqlite")
+        self.excel_file = EXCEL_FILE
+        self.core = TreeCore(open_storage(STORAGE_BACKEND, self.excel_file, DB_FILE), view=self, id_scheme=ID_SCHEME)
+
+        # Thread d'écriture du classeur : l'interface reste utilisable pendant la sauvegarde
+        self.save_worker = SaveWorker(write_styled_workbook)
+        self._save_after_id = None
+        self.root.after(200, self.poll_save_events)
+
+        # Annuler / rétablir (Ctrl+Z, Ctrl+Y ou Ctrl+Maj+Z)
+        self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
+        self.root.bind("<Control-Z>", self.redo)
+
+        # Terminer les écritures (et compacter le journal) à la fermeture
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Liaison de l'événement de sélection pour mettre à jour le breadcrumb
         self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
 
+        # Sélection multiple (Ctrl/Maj + clic) : couper / copier / coller, supprimer, glisser-déposer.
+        # Raccourcis liés à l'arbre seulement, pour laisser Ctrl+C / Ctrl+V aux champs de saisie
+        self.clipboard = None   # ("cut" ou "copy", [IDs])
+        self.tree.bind("<Control-x>", self.cut_selection)
+        self.tree.bind("<Control-c>", self.copy_selection)
+        self.tree.bind("<Control-v>", self.paste_selection)
+        self.tree.bind("<Delete>", self.delete_node)
+        self._drag = None
+        self.tree.bind("<ButtonPress-1>", self.on_drag_start)
+        self.tree.bind("<B1-Motion>", self.on_drag_motion)
+        self.tree.bind("<ButtonRelease-1>", self.on_drag_drop)
+
+        # Mode paresseux : insertion des enfants au dépliage, libération au repliage
+        self.lazy_mode = False
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
+        self.tree.bind("<<TreeviewClose>>", self.on_tree_close)
+
         # Chargement initial des données
         self.load_data()
 
+    @property
+    def model(self):
+        """Modèle en mémoire du noyau : noeuds (id -> données) et index parent -> enfants ordonné."""
+        return self.core.model
+
+    @property
+    def storage(self):
+        return self.core.storage
+
     def load_data(self):
-        """Charge les données depuis le fichier Excel s'il existe."""
-        if os.path.exists(EXCEL_FILE):
+        """Charge l'arbre depuis le stockage (base SQLite, ou instantané Excel + journal)."""
+        with timed("load_data") as stage:
             try:
-                df = pd.read_excel(EXCEL_FILE)
-                # Assurons-nous que le fichier n'est pas vide et a les bonnes colonnes (ou compatibles)
-                if not df.empty:
-                    # Nettoyer l'arbre actuel
-                    for item in self.tree.get_children():
-                        self.tree.delete(item)
-                    self.data_store = {}
-
-                    # Convertir le DataFrame en dictionnaire pour un accès rapide
-                    nodes = {}
-                    for index, row in df.iterrows():
-                        node_id = str(row["ID"])
-                        parent_id = str(row["ParentID"]) if "ParentID" in df.columns and pd.notna(row["ParentID"]) else ""
-                        part_number = str(row["PartNumber"]) if "PartNumber" in df.columns else ""
-                        description = str(row["Description"]) if "Description" in df.columns and pd.notna(row["Description"]) else ""
-                        position = str(row["Position"]) if "Position" in df.columns and pd.notna(row["Position"]) else ""
-
-                        nodes[node_id] = {"parent_id": parent_id, "part_number": part_number, "description": description, "position": position}
-
-                    # Reconstruire l'arbre
-                    to_add = list(nodes.keys())
-                    added = set()
-
-                    # On ajoute d'abord les racines (parent_id vide ou non trouvé dans nodes)
-                    for node_id in to_add[:]:
-                        parent_id = nodes[node_id]["parent_id"]
-                        if not parent_id or parent_id not in nodes:
-                            self.insert_node_in_tree("", node_id, nodes[node_id]["position"], nodes[node_id]["part_number"], nodes[node_id]["description"])
-                            self.data_store[node_id] = nodes[node_id]
-                            added.add(node_id)
-                            to_add.remove(node_id)
-                    
-                    # Ensuite on ajoute les enfants itérativement
-                    last_count = len(to_add) + 1
-                    while to_add:
-                        current_count = len(to_add)
-                        if current_count == last_count:
-                            print("Attention: Des orphelins ont été détectés et ignorés.")
-                            break 
-                        last_count = current_count
-
-                        for node_id in to_add[:]:
-                            parent_id = nodes[node_id]["parent_id"]
-                            if parent_id in added:
-                                self.insert_node_in_tree(parent_id, node_id, nodes[node_id]["position"], nodes[node_id]["part_number"], nodes[node_id]["description"])
-                                self.data_store[node_id] = nodes[node_id]
-                                added.add(node_id)
-                                to_add.remove(node_id)
-
+                self.core.load()
             except Exception as e:
-                messagebox.showerror("Erreur de chargement", f"Impossible de charger le fichier Excel:\n{e}")
+                messagebox.showerror("Erreur de chargement", f"Impossible de charger les données:\n{e}")
+                return
+
+            # Le modèle a été remplacé : les index seront reconstruits au prochain usage
+            self.search_index.clear()
+            self.model.add_listener(self.search_index)
+            self.where_used.clear()
+            self.model.add_listener(self.where_used)
+            self.rollup.clear()
+            self.model.add_listener(self.rollup)
+
+            with timed("populate_tree"):
+                self.populate_tree()
+            stage.rows = len(self.model)
+
+    def populate_tree(self):
+        """Remplit l'arbre visuel depuis le modèle.
+        Petit arbre : tous les noeuds, par un parcours en profondeur unique.
+        Grand arbre (mode paresseux) : seulement les racines, le reste au dépliage."""
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        self.lazy_mode = len(self.model) > LAZY_LOAD_THRESHOLD
+        if self.lazy_mode:
+            for node_id in self.model.get_children(""):
+                self.insert_item("", node_id)
+            return
+        for node_id, level in self.model.walk():
+            node = self.model.nodes[node_id]
+            self.tree.insert(node["parent_id"], 'end', iid=node_id, text=node["part_number"],
+                             values=self.item_values(node_id),
+                             open=bool(self.model.get_children(node_id)))
+
+    def item_values(self, node_id):
+        """Colonnes d'un élément du Treeview : position, description et cumuls du sous-arbre."""
+        node = self.model.nodes[node_id]
+        if not self.rollup.consumption:
+            return (node["position"], node["description"], "", "")
+        quantity, value = self.rollup.totals(self.model, node_id)
+        return (node["position"], node["description"], f"{quantity:g}" if quantity else "", f"{value:.2f}" if value else "")
+
+    # ====== Remplissage paresseux du Treeview ======
+
+    def insert_item(self, parent_id, node_id, index='end'):
+        """Insère un noeud du modèle dans le Treeview, replié, avec un enfant fictif s'il a des enfants."""
+        node = self.model.nodes[node_id]
+        self.tree.insert(parent_id, index, iid=node_id, text=node["part_number"], values=self.item_values(node_id))
+        if self.model.get_children(node_id):
+            self.tree.insert(node_id, 'end', iid=PLACEHOLDER_PREFIX + node_id, text="...")
+
+    def is_unloaded(self, node_id):
+        """Vrai si les enfants du noeud ne sont pas encore insérés dans le Treeview."""
+        return bool(node_id) and self.tree.exists(PLACEHOLDER_PREFIX + node_id)
+
+    def load_children(self, node_id):
+        """Remplace l'enfant fictif par les vrais enfants (un seul niveau)."""
+        if not self.is_unloaded(node_id):
+            return
+        self.tree.delete(PLACEHOLDER_PREFIX + node_id)
+        for child_id in self.model.get_children(node_id):
+            self.insert_item(node_id, child_id)
+
+    def on_tree_open(self, event=None):
+        node_id = self.tree.focus()
+        if node_id in self.model:
+            self.load_children(node_id)
+
+    def on_tree_close(self, event=None):
+        """En mode paresseux, un sous-arbre replié est retiré du widget (seul l'enfant fictif reste)."""
+        node_id = self.tree.focus()
+        if not self.lazy_mode or node_id not in self.model or self.is_unloaded(node_id):
+            return
+        children = self.tree.get_children(node_id)
+        if children:
+            self.tree.delete(*children)
+            self.tree.insert(node_id, 'end', iid=PLACEHOLDER_PREFIX + node_id, text="...")
+
+    def reveal_node(self, node_id):
+        """Insère et déplie au besoin les ancêtres du noeud pour qu'il existe dans le Treeview."""
+        for ancestor_id in self.model.ancestors(node_id)[:-1]:
+            self.load_children(ancestor_id)
+            self.tree.item(ancestor_id, open=True)
 
     # ====== Méthodes pour le Fil d'Ariane (Breadcrumb) ======
     
     def on_tree_select(self, event=None):
-        """Appelé quand un élément est sélectionné dans l'arbre."""
+        """Appelé quand un élément est sélectionné dans l'arbre.
+        Les sélections rapprochées (flèche maintenue) sont regroupées : seule la dernière est affichée."""
+        if self._select_after_id is not None:
+            self.root.after_cancel(self._select_after_id)
+        self._select_after_id = self.root.after(SELECT_DELAY_MS, self.render_selection)
+
+    def render_selection(self):
+        self._select_after_id = None
         selected_items = self.tree.selection()
-        if selected_items:
+        if selected_items and selected_items[0] in self.model:
             self.update_breadcrumb(selected_items[0])
         else:
             self.clear_breadcrumb()
     
     def get_ancestors(self, node_id):
-        """Retourne la liste des ancêtres du noeud (du plus ancien au plus récent), incluant le noeud lui-même."""
-        path = []
-        current_id = node_id
-        
-        while current_id:
-            if current_id in self.data_store:
-                path.insert(0, current_id)
-                current_id = self.data_store[current_id].get("parent_id", "")
+        """Retourne les ancêtres du noeud (du plus ancien au plus récent), incluant le noeud lui-même.
+        La chaîne est lue dans le cache du modèle, partagé avec l'export Excel."""
+        return self.model.ancestors(node_id)
+
+    def breadcrumb_slot(self, index):
+        """Lien (et séparateur qui le suit) n° index du fil d'Ariane, créé une seule fois puis réutilisé.
+        Les liaisons lisent self.breadcrumb_path : elles ne sont jamais recréées."""
+        while len(self.breadcrumb_slots) <= index:
+            i = len(self.breadcrumb_slots)
+            if i == 0:
+                # Élément actuel : en gras, non cliquable
+                label = tk.Label(self.breadcrumb_frame, bg="#e3f2fd", fg="#1565c0", font=("Segoe UI", 9, "bold"),
+                                 padx=6, pady=2, relief=tk.SOLID, borderwidth=1)
             else:
-                # Noeud racine ou non trouvé dans data_store
-                if self.tree.exists(current_id):
-                    path.insert(0, current_id)
-                break
-        
-        return path
+                # Ancêtre : cliquable avec effet hover
+                label = tk.Label(self.breadcrumb_frame, bg="#f0f0f0", fg="#1976d2", font=("Segoe UI", 9, "underline"),
+                                 padx=4, pady=2, cursor="hand2")
+                # Lier le clic pour naviguer vers cet ancêtre (lu dans breadcrumb_path au moment du clic)
+                label.bind("<Button-1>", lambda e, i=i: self.on_breadcrumb_click(i))
+                # Effet hover
+                label.bind("<Enter>", lambda e, lbl=label: lbl.config(bg="#e0e0e0", fg="#0d47a1"))
+                label.bind("<Leave>", lambda e, lbl=label: lbl.config(bg="#f0f0f0", fg="#1976d2"))
+            separator = tk.Label(self.breadcrumb_frame, text="  -  ", bg="#f0f0f0", fg="#888888", font=("Segoe UI", 9))
+            # État affiché : (texte, séparateur visible) ; None = lien masqué
+            self.breadcrumb_slots.append([label, separator, None])
+        return self.breadcrumb_slots[index]
+
+    def on_breadcrumb_click(self, index):
+        if index < len(self.breadcrumb_path):
+            self.navigate_to_node(self.breadcrumb_path[index])
     
     def update_breadcrumb(self, node_id):
         """Met à jour l'affichage du fil d'Ariane pour le noeud sélectionné.
         Affiche le chemin de l'élément actuel vers la racine (ex: Pièce → Section → Module → TETRATOP 4)
+        Les liens existants sont réutilisés : seuls les textes qui changent sont modifiés.
         """
-        # Nettoyer le cadre breadcrumb
-        for widget in self.breadcrumb_frame.winfo_children():
-            widget.destroy()
-        
         # Obtenir le chemin complet (de la racine vers l'élément)
         path = self.get_ancestors(node_id)
         
         if not path:
-            self.breadcrumb_placeholder = tk.Label(
-                self.breadcrumb_frame, 
-                text="Sélectionnez un élément pour voir son chemin", 
-                fg="gray", bg="#f0f0f0", font=("Segoe UI", 9, "italic")
-            )
-            self.breadcrumb_placeholder.pack(side=tk.LEFT)
+            self.clear_breadcrumb()
             return
         
         # INVERSER le chemin : de l'élément actuel vers la racine
-        path = list(reversed(path))
+        self.breadcrumb_path = path[::-1]
+        self.breadcrumb_placeholder.pack_forget()
         
-        # Créer les liens pour chaque élément du chemin
-        for i, ancestor_id in enumerate(path):
-            data = self.data_store.get(ancestor_id, {})
+        previous = None
+        for i, ancestor_id in enumerate(self.breadcrumb_path):
             # Utiliser la DESCRIPTION au lieu du Part Number pour l'affichage
-            description = data.get("description", "")
-            part_number = data.get("part_number", self.tree.item(ancestor_id, "text"))
-            # Si pas de description, utiliser le part number comme fallback
-            display_text = description if description else part_number
-            
-            # Style différent pour le premier élément (élément sélectionné)
-            is_current = (i == 0)
-            
-            if is_current:
-                # Élément actuel : en gras, non cliquable
-                label = tk.Label(
-                    self.breadcrumb_frame, 
-                    text=display_text,
-                    bg="#e3f2fd",  # Bleu clair
-                    fg="#1565c0",  # Bleu foncé
-                    font=("Segoe UI", 9, "bold"),
-                    padx=6, pady=2,
-                    relief=tk.SOLID,
-                    borderwidth=1
-                )
-            else:
-                # Ancêtre : cliquable avec effet hover
-                label = tk.Label(
-                    self.breadcrumb_frame, 
-                    text=display_text,
-                    bg="#f0f0f0",
-                    fg="#1976d2",  # Bleu lien
-                    font=("Segoe UI", 9, "underline"),
-                    padx=4, pady=2,
-                    cursor="hand2"
-                )
-                # Lier le clic pour naviguer vers cet ancêtre
-                label.bind("<Button-1>", lambda e, aid=ancestor_id: self.navigate_to_node(aid))
-                # Effet hover
-                label.bind("<Enter>", lambda e, lbl=label: lbl.config(bg="#e0e0e0", fg="#0d47a1"))
-                label.bind("<Leave>", lambda e, lbl=label: lbl.config(bg="#f0f0f0", fg="#1976d2"))
-            
-            label.pack(side=tk.LEFT, padx=1)
-            
-            # Ajouter le séparateur " - " sauf pour le dernier élément (la racine)
-            if i < len(path) - 1:
-                separator = tk.Label(
-                    self.breadcrumb_frame, 
-                    text="  -  ",
-                    bg="#f0f0f0",
-                    fg="#888888",
-                    font=("Segoe UI", 9)
-                )
-                separator.pack(side=tk.LEFT)
+            # (le part number sert de fallback si pas de description)
+            state = (self.model.display_name(ancestor_id), i < len(self.breadcrumb_path) - 1)
+            slot = self.breadcrumb_slot(i)
+            label, separator, shown = slot
+            if shown != state:
+                if shown is None:
+                    if previous is None:
+                        label.pack(side=tk.LEFT, padx=1)
+                    else:
+                        label.pack(side=tk.LEFT, padx=1, after=previous)
+                if shown is None or shown[0] != state[0]:
+                    label.config(text=state[0])
+                # Séparateur " - " sauf après le dernier élément (la racine)
+                if state[1]:
+                    separator.pack(side=tk.LEFT, after=label)
+                else:
+                    separator.pack_forget()
+                slot[2] = state
+            previous = separator if state[1] else label
+        self.hide_breadcrumb_slots(len(self.breadcrumb_path))
+
+    def hide_breadcrumb_slots(self, start):
+        """Masque (sans les détruire) les liens à partir du n° start."""
+        for slot in self.breadcrumb_slots[start:]:
+            if slot[2] is None:
+                break
+            slot[0].pack_forget()
+            slot[1].pack_forget()
+            slot[2] = None
     
     def clear_breadcrumb(self):
         """Efface le fil d'Ariane et affiche le placeholder."""
-        for widget in self.breadcrumb_frame.winfo_children():
-            widget.destroy()
-        
-        self.breadcrumb_placeholder = tk.Label(
-            self.breadcrumb_frame, 
-            text="Sélectionnez un élément pour voir son chemin", 
-            fg="gray", bg="#f0f0f0", font=("Segoe UI", 9, "italic")
-        )
+        self.breadcrumb_path = ()
+        self.hide_breadcrumb_slots(0)
         self.breadcrumb_placeholder.pack(side=tk.LEFT)
     
     def navigate_to_node(self, node_id):
         """Navigue vers un noeud spécifique : le sélectionne et le rend visible."""
-        if self.tree.exists(node_id):
+        if node_id in self.model:
             # Ouvrir tous les parents pour rendre le noeud visible
-            parent_id = self.tree.parent(node_id)
-            while parent_id:
-                self.tree.item(parent_id, open=True)
-                parent_id = self.tree.parent(parent_id)
+            # (en mode paresseux, ils sont insérés au passage)
+            self.reveal_node(node_id)
             
             # Sélectionner le noeud
             self.tree.selection_set(node_id)
@@ -259,226 +438,294 @@ class TreeApp:
             # Donner le focus à l'arbre
             self.tree.focus(node_id)
 
+    # ====== Recherche ======
+
+    def schedule_search(self, event=None):
+        """Relance la recherche après une courte pause de frappe (une seule recherche par rafale)."""
+        if event is not None and event.keysym in ("Return", "Escape", "Down"):
+            if event.keysym == "Down" and self.search_results:
+                self.search_listbox.focus_set()
+                self.search_listbox.selection_clear(0, tk.END)
+                self.search_listbox.selection_set(0)
+                self.search_listbox.activate(0)
+            return
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self._search_after_id = None
+        query = self.search_var.get().strip()
+        if not query:
+            self.show_search_results([])
+            self.search_count_label.config(text="")
+            return
+        if not self.search_index.built:
+            self.search_index.build(self.model)
+        results = self.search_index.search(query)
+        self.show_search_results(results)
+        if not results:
+            self.search_count_label.config(text="Aucun résultat")
+        elif len(results) >= MAX_RESULTS:
+            self.search_count_label.config(text=f"{len(results)}+ résultats")
+        else:
+            self.search_count_label.config(text=f"{len(results)} résultat(s)")
+
+    def show_search_results(self, results):
+        """Remplit la liste des résultats (PartNumber - Description - chemin du parent)."""
+        self.search_results = results
+        self.search_listbox.delete(0, tk.END)
+        if not results:
+            self.search_results_frame.pack_forget()
+            return
+        for node_id in results:
+            node = self.model.nodes[node_id]
+            label = f"{node['part_number']}  —  {node['description']}"
+            parent_id = node["parent_id"]
+            if parent_id:
+                label += f"   (dans : {self.model.path_string(parent_id)})"
+            self.search_listbox.insert(tk.END, label)
+        if not self.search_results_frame.winfo_ismapped():
+            self.search_results_frame.pack(fill=tk.X, padx=10, pady=(0, 2), before=self.breadcrumb_outer_frame)
+
+    def on_search_result(self, event=None):
+        selection = self.search_listbox.curselection()
+        if selection and selection[0] < len(self.search_results):
+            self.navigate_to_node(self.search_results[selection[0]])
+
+    def jump_to_first_result(self, event=None):
+        """Entrée dans le champ : recherche immédiate puis saut au meilleur résultat."""
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self.run_search()
+        if self.search_results:
+            self.navigate_to_node(self.search_results[0])
+
+    def clear_search(self, event=None):
+        self.search_var.set("")
+        self.show_search_results([])
+        self.search_count_label.config(text="")
+
     def get_path_string(self, node_id):
-        """Retourne le chemin lisible d'un noeud (descriptions séparées par ' - ')."""
-        path = self.get_ancestors(node_id)
-        path_names = []
-        for ancestor_id in path:
-            data = self.data_store.get(ancestor_id, {})
-            description = data.get("description", "")
-            part_number = data.get("part_number", "")
-            # Utiliser la description, sinon le part number
-            name = description if description else part_number
-            if name:
-                path_names.append(name)
-        # Inverser pour avoir : Élément - Parent - ... - Racine
-        path_names.reverse()
-        return " - ".join(path_names)
+        """Retourne le chemin lisible d'un noeud (descriptions séparées par ' - '), lu dans le cache du modèle."""
+        return self.model.path_string(node_id)
 
     def save_data(self):
-        """Sauvegarde les données dans Excel avec groupement, chemin lisible et mise en forme."""
-        export_data = []
-        
-        # Parcours récursif pour obtenir l'ordre visuel et les niveaux
-        def traverse(parent_id, level):
-            children = self.tree.get_children(parent_id)
-            for child_id in children:
-                node_data = self.data_store[child_id]
-                # Générer le chemin lisible (stocké pour les commentaires Excel)
-                chemin = self.get_path_string(child_id)
-                export_data.append({
-                    "Position": node_data.get("position", ""),
-                    "PartNumber": node_data["part_number"],
-                    "Description": node_data["description"],
-                    "Niveau": level,
-                    "_Level": level,
-                    "_ID": child_id,
-                    "_ParentID": node_data["parent_id"],
-                    "_Chemin": chemin  # Utilisé pour les commentaires, pas affiché en colonne
-                })
-                traverse(child_id, level + 1)
-
-        traverse("", 0)
-
-        if not export_data:
-            # Si vide, on crée juste les headers
-            df = pd.DataFrame(columns=["Position", "PartNumber", "Description", "Niveau"])
-            df.to_excel(EXCEL_FILE, index=False)
-            messagebox.showinfo("Sauvegarde", "Fichier Excel sauvegardé (vide).")
-            return
+        """Sauvegarde les données dans Excel avec groupement, chemin lisible et mise en forme.
+        L'écriture se fait dans le thread de sauvegarde. Avec le stockage "excel", c'est la
+        compaction du journal : les opérations incluses dans l'instantané en sont retirées
+        une fois le fichier écrit. Avec SQLite, c'est un simple export."""
+        if self._save_after_id is not None:
+            self.root.after_cancel(self._save_after_id)
+            self._save_after_id = None
+        # Le journal de perf_log reçoit deux opérations : save_data (instantané, thread Tk)
+        # puis write_workbook (écriture, thread de sauvegarde)
+        with timed("save_data") as stage:
+            snapshot = self.core.snapshot()
+            self.save_worker.submit(snapshot, self.excel_file, token=self.storage.checkpoint())
+            stage.rows = len(snapshot)
+        self.set_status("Sauvegarde programmée...")
 
-        # Colonnes dans l'ordre souhaité (sans colonne Chemin - sera en commentaire)
-        df = pd.DataFrame(export_data, columns=["Position", "PartNumber", "Description", "Niveau", "_Level", "_ID", "_ParentID", "_Chemin"])
-        
-        try:
-            # On sauvegarde sans les colonnes internes
-            df_to_save = df.drop(columns=["_Level", "_ID", "_ParentID", "_Chemin"])
-            
-            # Post-traitement avec OpenPyXL pour le groupement et la mise en forme
+    def schedule_save(self):
+        """Programme une sauvegarde différée : les modifications rapprochées n'en déclenchent qu'une."""
+        if self._save_after_id is None:
+            self._save_after_id = self.root.after(SAVE_DELAY_MS, self.save_data)
+
+    def poll_save_events(self):
+        """Relaie les événements du thread de sauvegarde dans la barre d'état (sans fenêtre modale)."""
+        self.handle_save_events()
+        self.root.after(200, self.poll_save_events)
+
+    def handle_save_events(self):
+        while True:
             try:
-                import openpyxl
-                from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-                from openpyxl.utils.dataframe import dataframe_to_rows
-                from openpyxl.comments import Comment
-                
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                ws.title = "Arborescence Pièces"
-                
-                # === ZONE D'AFFICHAGE DU CHEMIN EN HAUT ===
-                # Ligne 1 : Titre de la zone chemin
-                ws.merge_cells('A1:D1')
-                ws['A1'] = "📍 CHEMIN : Cliquez sur une ligne puis regardez le commentaire (triangle rouge) →"
-                ws['A1'].font = Font(bold=True, size=11, color="0052A3")
-                ws['A1'].fill = PatternFill(start_color="FFF9C4", end_color="FFF9C4", fill_type="solid")
-                ws['A1'].alignment = Alignment(horizontal="left", vertical="center")
-                ws.row_dimensions[1].height = 25
-                
-                # Ligne 2 : Vide (séparation)
-                ws.row_dimensions[2].height = 5
-                
-                # Écrire les en-têtes à la ligne 3
-                headers = ["Position", "PartNumber", "Description", "Niveau"]
-                for c_idx, header in enumerate(headers, 1):
-                    ws.cell(row=3, column=c_idx, value=header)
-                
-                # Écrire les données à partir de la ligne 4
-                for r_idx, row_data in enumerate(export_data):
-                    excel_row = r_idx + 4  # Données commencent à la ligne 4
-                    ws.cell(row=excel_row, column=1, value=row_data["Position"])
-                    ws.cell(row=excel_row, column=2, value=row_data["PartNumber"])
-                    ws.cell(row=excel_row, column=3, value=row_data["Description"])
-                    ws.cell(row=excel_row, column=4, value=row_data["Niveau"])
-                    
-                    # Ajouter un COMMENTAIRE avec le chemin sur la colonne Description
-                    chemin = row_data["_Chemin"]
-                    comment = Comment(f"📍 CHEMIN:\n{chemin}", "Système")
-                    comment.width = 400
-                    comment.height = 80
-                    ws.cell(row=excel_row, column=3).comment = comment
-                
-                # Style pour l'en-tête (ligne 3)
-                header_fill = PatternFill(start_color="0052A3", end_color="0052A3", fill_type="solid")
-                header_font = Font(bold=True, color="FFFFFF", size=11)
-                header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-                
-                for cell in ws[3]:
-                    if cell.value:
-                        cell.fill = header_fill
-                        cell.font = header_font
-                        cell.alignment = header_alignment
-                
-                # Style pour les données
-                thin_border = Border(
-                    left=Side(style='thin', color='CCCCCC'),
-                    right=Side(style='thin', color='CCCCCC'),
-                    top=Side(style='thin', color='CCCCCC'),
-                    bottom=Side(style='thin', color='CCCCCC')
-                )
-                
-                # Couleurs alternées pour les niveaux
-                level_colors = [
-                    "FFFFFF",  # Niveau 0 - Blanc
-                    "E3F2FD",  # Niveau 1 - Bleu très clair
-                    "BBDEFB",  # Niveau 2 - Bleu clair
-                    "90CAF9",  # Niveau 3 - Bleu
-                    "64B5F6",  # Niveau 4 - Bleu moyen
-                    "42A5F5",  # Niveau 5+ - Bleu plus foncé
-                ]
-                
-                for i, row_data in enumerate(export_data):
-                    row_idx = i + 4  # Données commencent à la ligne 4
-                    level = row_data["_Level"]
-                    color_idx = min(level, len(level_colors) - 1)
-                    fill = PatternFill(start_color=level_colors[color_idx], end_color=level_colors[color_idx], fill_type="solid")
-                    
-                    for cell in ws[row_idx]:
-                        cell.border = thin_border
-                        cell.fill = fill
-                        cell.alignment = Alignment(vertical="center")
-                
-                # Ajuster la largeur des colonnes
-                column_widths = {
-                    'A': 12,   # Position
-                    'B': 20,   # PartNumber
-                    'C': 45,   # Description (plus large car c'est là qu'on clique)
-                    'D': 10,   # Niveau
-                }
-                for col, width in column_widths.items():
-                    ws.column_dimensions[col].width = width
-                
-                # Figer les lignes 1-3 (zone chemin + en-têtes)
-                ws.freeze_panes = 'A4'
-                
-                # Activer les filtres automatiques sur les en-têtes (ligne 3)
-                ws.auto_filter.ref = f"A3:D{3 + len(export_data)}"
-                
-                # IMPORTANT: Pour que les '+' soient sur la ligne du parent (en haut du groupe)
-                ws.sheet_properties.outlinePr.summaryBelow = False
-                
-                # Appliquer les niveaux de plan (grouping) - données commencent ligne 4
-                for i, row_data in enumerate(export_data):
-                    level = row_data["_Level"]
-                    if level > 0:
-                        ws.row_dimensions[i + 4].outlineLevel = level
-                
-                wb.save(EXCEL_FILE)
-                messagebox.showinfo("Sauvegarde", f"Fichier Excel sauvegardé avec succès!\n\n• {len(export_data)} éléments\n• Survolez la colonne Description pour voir le chemin\n• Triangle rouge = commentaire avec chemin\n• Groupement par niveau activé")
-                
-            except ImportError:
-                # Fallback si openpyxl n'est pas disponible avec les styles
-                df_to_save.to_excel(EXCEL_FILE, index=False)
-                messagebox.showinfo("Sauvegarde", f"Fichier Excel sauvegardé (simple).\n{len(export_data)} éléments.")
-                
-        except Exception as e:
-            messagebox.showerror("Erreur de sauvegarde", f"Impossible de sauvegarder le fichier Excel:\n{e}\nVérifiez que le fichier n'est pas ouvert ailleurs.")
-
-    def insert_node_in_tree(self, parent_id, node_id, position, part_number, description):
-        """Helper pour insérer dans l'arbre visuel."""
-        # text=part_number pour l'afficher dans la colonne #0 (l'arbre)
-        # values=(position, description)
-        self.tree.insert(parent_id, 'end', iid=node_id, text=part_number, values=(position, description))
-        
-        # On ouvre le parent pour montrer le nouvel enfant
+                event = self.save_worker.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "start":
+                self.set_status(f"Sauvegarde en cours ({event[1]} éléments)...")
+            elif event[0] == "done":
+                self.storage.compacted(event[2])
+                self.set_status(f"Fichier Excel sauvegardé à {time.strftime('%H:%M:%S')} ({event[1]} éléments).")
+            elif event[0] == "error":
+                self.set_status(f"Erreur de sauvegarde : {event[1]} - Vérifiez que le fichier n'est pas ouvert ailleurs.", error=True)
+
+    def set_status(self, text, error=False):
+        self.status_var.set(text)
+        self.status_label.config(fg="#c62828" if error else "#333333")
+
+    def autosave(self):
+        """Appelé après chaque modification déjà enregistrée : réécrit le classeur
+        complet seulement quand le journal atteint le seuil de compaction."""
+        if self.storage.needs_compaction() and self.save_worker.is_idle():
+            self.schedule_save()
+
+    def on_close(self):
+        """Compacte le journal avant de quitter pour laisser un classeur Excel à jour."""
+        if self.storage.pending_changes():
+            self.save_data()
+        self.set_status("Sauvegarde finale en cours...")
+        self.save_worker.wait_idle()
+        # En cas d'erreur, le journal est conservé et sera rejoué au prochain démarrage
+        self.handle_save_events()
+        self.storage.close()
+        self.root.destroy()
+
+    # ====== Mises à jour ciblées de l'arbre visuel (commandes, annuler / rétablir) ======
+
+    def view_insert_children(self, parent_id, node_ids):
+        """Insère un lot de nouveaux enfants (déjà dans le modèle) puis ouvre le parent une seule fois."""
+        if parent_id and not self.tree.exists(parent_id):
+            # Parent pas encore inséré (mode paresseux) : les noeuds le seront au dépliage
+            return
+        if self.is_unloaded(parent_id):
+            # Les enfants du parent (dont les nouveaux) sont insérés depuis le modèle
+            self.load_children(parent_id)
+        else:
+            for node_id in node_ids:
+                node = self.model.nodes[node_id]
+                # text=part_number pour l'afficher dans la colonne #0 (l'arbre)
+                self.tree.insert(parent_id, 'end', iid=node_id, text=node["part_number"],
+                                 values=self.item_values(node_id))
+        # On ouvre le parent pour montrer les nouveaux enfants
         if parent_id:
             self.tree.item(parent_id, open=True)
 
+    def view_insert_subtree(self, node_id):
+        """Insère un sous-arbre du modèle à son rang parmi ses frères (ex: suppression annulée)."""
+        parent_id = self.model.parent(node_id)
+        if (parent_id and not self.tree.exists(parent_id)) or self.is_unloaded(parent_id):
+            return
+        index = self.model.index_of(node_id)
+        if self.lazy_mode:
+            self.insert_item(parent_id, node_id, index)
+        else:
+            for current_id, _ in self.model.iter_subtree(node_id):
+                node = self.model.nodes[current_id]
+                self.tree.insert(node["parent_id"], index if current_id == node_id else 'end', iid=current_id,
+                                 text=node["part_number"], values=self.item_values(current_id),
+                                 open=bool(self.model.get_children(current_id)))
+        if parent_id:
+            self.tree.item(parent_id, open=True)
+
+    def view_remove(self, node_ids):
+        """Retire des noeuds (et leurs enfants visuels) du Treeview."""
+        shown = [node_id for node_id in node_ids if self.tree.exists(node_id)]
+        if shown:
+            self.tree.delete(*shown)
+
+    def view_update(self, node_id):
+        if self.tree.exists(node_id):
+            node = self.model.nodes[node_id]
+            self.tree.item(node_id, text=node["part_number"], values=self.item_values(node_id))
+
+    def view_move(self, node_id):
+        """Place l'élément d'un noeud déplacé sous son nouveau parent, au rang du modèle."""
+        parent_id = self.model.parent(node_id)
+        parent_loaded = not parent_id or (self.tree.exists(parent_id) and not self.is_unloaded(parent_id))
+        if self.tree.exists(node_id) and parent_loaded:
+            # Détacher d'abord : le rang est alors compté sans l'élément, comme dans le modèle
+            self.tree.detach(node_id)
+            self.tree.move(node_id, parent_id, self.model.index_of(node_id))
+            if parent_id:
+                self.tree.item(parent_id, open=True)
+        else:
+            self.view_remove([node_id])
+            self.view_insert_subtree(node_id)
+
+    def view_move_many(self, node_ids):
+        """Place les éléments d'un lot de noeuds déplacés (ordre du lot : rangs croissants par parent)."""
+        # Tout détacher d'abord : chaque rang du modèle est alors juste au moment de son insertion
+        placed = set()
+        for node_id in node_ids:
+            parent_id = self.model.parent(node_id)
+            parent_loaded = not parent_id or (self.tree.exists(parent_id) and not self.is_unloaded(parent_id))
+            if self.tree.exists(node_id) and parent_loaded:
+                self.tree.detach(node_id)
+                placed.add(node_id)
+            else:
+                self.view_remove([node_id])
+        ranks = self.model.ranks(node_ids)
+        for node_id in node_ids:
+            if node_id in placed:
+                parent_id = self.model.parent(node_id)
+                self.tree.move(node_id, parent_id, ranks[node_id])
+                if parent_id:
+                    self.tree.item(parent_id, open=True)
+            else:
+                self.view_insert_subtree(node_id)
+
+    # ====== Annuler / Rétablir ======
+
+    def undo(self, event=None):
+        command = self.core.undo()
+        if command is None:
+            self.set_status("Rien à annuler")
+        else:
+            self.set_status(f"Annulé : {command.label}")
+
+    def redo(self, event=None):
+        command = self.core.redo()
+        if command is None:
+            self.set_status("Rien à rétablir")
+        else:
+            self.set_status(f"Rétabli : {command.label}")
+
+    def view_command_done(self, command, undone):
+        """Après une commande (ou son annulation) : sélectionne le noeud concerné et programme la sauvegarde."""
+        focus = command.focus(undone)
+        # Lot (sélection multiple) : le premier noeud est affiché, tous ceux encore présents sont resélectionnés
+        node_ids = [node_id for node_id in (focus if isinstance(focus, list) else [focus]) if node_id and node_id in self.model]
+        if node_ids:
+            self.navigate_to_node(node_ids[0])
+            if len(node_ids) > 1:
+                for node_id in node_ids[1:]:
+                    self.reveal_node(node_id)
+                self.tree.selection_set(node_ids)
+        else:
+            self.tree.selection_set(())
+            self.clear_breadcrumb()
+        self.refresh_rollup_columns()
+        self.autosave()
+
     def add_root(self):
         self.prompt_and_add_node("")
 
     def add_sibling(self):
         """Ajoute un noeud au même niveau que la sélection actuelle."""
-        selected_item = self.tree.selection()
-        if not selected_item:
+        # Sans les enfants fictifs du mode paresseux ("..."), qui ne sont pas dans le modèle
+        selected_nodes = self.selected_nodes()
+        if not selected_nodes:
             messagebox.showwarning("Sélection requise", "Veuillez sélectionner un noeud pour lui ajouter un frère.")
             return
         
-        node_id = selected_item[0]
+        node_id = selected_nodes[0]
         # Trouver le parent du noeud sélectionné
-        parent_id = self.tree.parent(node_id)
+        parent_id = self.model.parent(node_id)
         
         self.prompt_and_add_node(parent_id)
 
     def add_child(self):
-        selected_item = self.tree.selection()
-        if not selected_item:
+        selected_nodes = self.selected_nodes()
+        if not selected_nodes:
             messagebox.showwarning("Sélection requise", "Veuillez sélectionner un noeud parent.")
             return
-        parent_id = selected_item[0]
+        parent_id = selected_nodes[0]
         self.prompt_and_add_node(parent_id)
 
     def import_bulk_children(self):
         """Ouvre une fenêtre pour importer plusieurs enfants d'un coup via copier-coller."""
-        selected_item = self.tree.selection()
-        if not selected_item:
+        # Sans les enfants fictifs du mode paresseux
+        selected_nodes = self.selected_nodes()
+        if not selected_nodes:
             messagebox.showwarning("Sélection requise", "Veuillez sélectionner un noeud parent pour les items importés.")
             return
-        parent_id = selected_item[0]
+        parent_id = selected_nodes[0]
         
         # Fenêtre de dialogue
         dialog = tk.Toplevel(self.root)
         dialog.title("Importer en masse via texte")
-        dialog.geometry("700x500")
+        dialog.geometry("750x700")
 
         tk.Label(dialog, text="Collez vos données ci-dessous :").pack(anchor=tk.W, padx=10, pady=(10, 0))
         text_area = tk.Text(dialog, height=15)
@@ -524,130 +771,222 @@ class TreeApp:
         entry_desc_end_char.insert(0, ".") 
         entry_desc_end_char.grid(row=2, column=3, padx=5)
 
+        # Détection automatique des colonnes (pré-remplit les index ci-dessus)
+        detect_frame = tk.Frame(frame)
+        detect_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        detect_label = tk.Label(detect_frame, text="", fg="gray", font=("Segoe UI", 9, "italic"))
+
         # Configuration des tags pour les couleurs
         text_area.tag_configure("pos", background="#ffeb3b") # Jaune
         text_area.tag_configure("pn", background="#80deea")  # Cyan
         text_area.tag_configure("desc", background="#c8e6c9") # Vert clair
 
-        def update_highlights(event=None):
-            text_area.tag_remove("pos", "1.0", tk.END)
-            text_area.tag_remove("pn", "1.0", tk.END)
-            text_area.tag_remove("desc", "1.0", tk.END)
-            
+        def read_layout():
+            return ColumnLayout(int(entry_pos_start.get()), int(entry_pos_end.get()),
+                                int(entry_pn_start.get()), int(entry_pn_end.get()),
+                                int(entry_desc_start.get()), entry_desc_end_char.get())
+
+        # ====== Coloration des colonnes ======
+        # Seules les lignes visibles sont colorées, après une courte pause de frappe.
+        # Le tag "colored" marque les lignes déjà traitées : les tags suivent le texte,
+        # donc seules les lignes modifiées ou nouvellement affichées sont recalculées.
+        highlight_job = [None]
+
+        def reset_line(line_idx):
+            for tag in HIGHLIGHT_TAGS:
+                text_area.tag_remove(tag, f"{line_idx}.0", f"{line_idx}.0 lineend +1c")
+
+        def reset_highlights(event=None):
+            """Les index ont changé (ou collage) : toutes les lignes sont à recolorer."""
+            for tag in HIGHLIGHT_TAGS:
+                text_area.tag_remove(tag, "1.0", tk.END)
+            schedule_highlights()
+
+        def on_text_key(event=None):
+            # Touches sans effet sur le texte (flèches, pages, modificateurs...) : rien à recolorer
+            if not text_area.edit_modified():
+                return
+            text_area.edit_modified(False)
+            # La ligne modifiée (et ses voisines, en cas de coupure ou fusion de lignes) est à recolorer
+            line_idx = int(text_area.index(tk.INSERT).split(".")[0])
+            for current in range(max(1, line_idx - 1), line_idx + 2):
+                reset_line(current)
+            schedule_highlights()
+
+        def schedule_highlights(*args):
+            if highlight_job[0] is not None:
+                dialog.after_cancel(highlight_job[0])
+            highlight_job[0] = dialog.after(HIGHLIGHT_DELAY_MS, update_highlights)
+
+        def update_highlights():
+            highlight_job[0] = None
             try:
-                pos_start = int(entry_pos_start.get())
-                pos_end = int(entry_pos_end.get())
-                pn_start = int(entry_pn_start.get())
-                pn_end = int(entry_pn_end.get())
-                desc_start = int(entry_desc_start.get())
-                stop_char = entry_desc_end_char.get()
+                layout = read_layout()
             except ValueError:
-                return 
+                return
 
-            content = text_area.get("1.0", tk.END)
-            lines = content.split('\n')
-            
-            for i, line in enumerate(lines):
-                line_idx = i + 1
-                if not line.strip(): continue
-                
-                # Position tagging
-                if len(line) > pos_start:
-                    p_end = min(len(line), pos_end)
-                    if p_end > pos_start:
-                        text_area.tag_add("pos", f"{line_idx}.{pos_start}", f"{line_idx}.{p_end}")
-                
-                # PN tagging
-                if len(line) > pn_start:
-                    p_end = min(len(line), pn_end)
-                    if p_end > pn_start:
-                        text_area.tag_add("pn", f"{line_idx}.{pn_start}", f"{line_idx}.{p_end}")
-                
-                # Desc tagging
-                if len(line) > desc_start:
-                    raw_desc = line[desc_start:]
-                    d_end = len(line)
-                    
-                    if stop_char:
-                        found_idx = raw_desc.find(stop_char)
-                        if found_idx != -1:
-                            d_end = desc_start + found_idx
-                    
-                    if d_end > desc_start:
-                        text_area.tag_add("desc", f"{line_idx}.{desc_start}", f"{line_idx}.{d_end}")
-
-        # Bindings pour mise à jour temps réel
-        text_area.bind('<KeyRelease>', update_highlights)
-        entry_pos_start.bind('<KeyRelease>', update_highlights)
-        entry_pos_end.bind('<KeyRelease>', update_highlights)
-        entry_pn_start.bind('<KeyRelease>', update_highlights)
-        entry_pn_end.bind('<KeyRelease>', update_highlights)
-        entry_desc_start.bind('<KeyRelease>', update_highlights)
-        entry_desc_end_char.bind('<KeyRelease>', update_highlights)
+            first = int(text_area.index("@0,0").split(".")[0])
+            last = int(text_area.index(f"@0,{text_area.winfo_height()}").split(".")[0])
+            for line_idx in range(first, last + 1):
+                if "colored" in text_area.tag_names(f"{line_idx}.0"):
+                    continue
+                reset_line(line_idx)
+                line = text_area.get(f"{line_idx}.0", f"{line_idx}.0 lineend")
+                for tag, start, end in column_spans(line, layout):
+                    text_area.tag_add(tag, f"{line_idx}.{start}", f"{line_idx}.{end}")
+                text_area.tag_add("colored", f"{line_idx}.0", f"{line_idx}.0 lineend +1c")
+
+        # Bindings : frappe dans le texte (ligne courante), collage (tout), défilement (lignes visibles)
+        text_area.bind('<KeyRelease>', on_text_key)
+        for sequence in ('<<Paste>>', '<<Cut>>', '<<Undo>>', '<<Redo>>'):
+            text_area.bind(sequence, lambda event: dialog.after_idle(reset_highlights), add="+")
+        text_area.configure(yscrollcommand=schedule_highlights)
+        text_area.bind('<Configure>', schedule_highlights)
+        for entry in (entry_pos_start, entry_pos_end, entry_pn_start, entry_pn_end, entry_desc_start, entry_desc_end_char):
+            entry.bind('<KeyRelease>', reset_highlights)
+
+        # ====== Détection des colonnes ======
+        # Résultats des threads de détection : (génération, disposition, automatique). Seul le résultat
+        # de la dernière analyse lancée (detect_pending) est appliqué ; une seule boucle de lecture.
+        detect_results = queue.Queue()
+        detect_generation = [0]
+        detect_pending = [None]
+        detect_polling = [False]
+        index_entries = (entry_pos_start, entry_pos_end, entry_pn_start, entry_pn_end, entry_desc_start)
+        # Valeurs des index remplies par le dialogue (défauts, puis dernière détection) :
+        # après un collage, la détection ne remplace pas des index saisis à la main
+        auto_values = [[entry.get() for entry in index_entries]]
+
+        def fields_untouched():
+            return [entry.get() for entry in index_entries] == auto_values[0]
+
+        def apply_layout(layout, automatic=False):
+            if layout is None:
+                detect_label.config(text="Colonnes non détectées : renseignez les index à la main.")
+                return
+            if automatic and not fields_untouched():
+                detect_label.config(text="Index saisis conservés : bouton « Détecter les colonnes » pour les remplacer.")
+                return
+            for entry, value in zip(index_entries, (layout.pos_start, layout.pos_end, layout.pn_start,
+                                                    layout.pn_end, layout.desc_start)):
+                entry.delete(0, tk.END)
+                entry.insert(0, str(value))
+            auto_values[0] = [entry.get() for entry in index_entries]
+            detect_label.config(text=f"Colonnes détectées : Position {layout.pos_start}-{layout.pos_end}, "
+                                     f"Part Number {layout.pn_start}-{layout.pn_end}, Description à partir de {layout.desc_start}")
+            reset_highlights()
+
+        def poll_detection():
+            if not dialog.winfo_exists():
+                return
+            result = None
+            while True:
+                try:
+                    generation, layout, automatic = detect_results.get_nowait()
+                except queue.Empty:
+                    break
+                # Analyse d'un texte plus ancien : ignorée
+                if generation == detect_pending[0]:
+                    result = (layout, automatic)
+            if result is not None:
+                detect_pending[0] = None
+                apply_layout(*result)
+            if detect_pending[0] is None:
+                detect_polling[0] = False
+                return
+            dialog.after(50, poll_detection)
+
+        def detect_columns(event=None, automatic=False):
+            """Analyse le texte collé ; les gros volumes sont traités hors du thread de l'interface.
+            automatic (après un collage) : seulement si les index n'ont pas été modifiés à la main."""
+            if automatic and not fields_untouched():
+                return
+            text = text_area.get("1.0", "end-1c")
+            stop_char = entry_desc_end_char.get()
+            detect_generation[0] += 1
+            if text.count("\n") < DETECT_THREAD_LINES:
+                detect_pending[0] = None
+                apply_layout(detect_layout(text, stop_char), automatic)
+                return
+            generation = detect_generation[0]
+            detect_pending[0] = generation
+            detect_label.config(text="Analyse des colonnes en cours...")
+            threading.Thread(target=lambda: detect_results.put((generation, detect_layout(text, stop_char), automatic)),
+                             daemon=True).start()
+            if not detect_polling[0]:
+                detect_polling[0] = True
+                dialog.after(50, poll_detection)
+
+        tk.Button(detect_frame, text="Détecter les colonnes", command=detect_columns).pack(side=tk.LEFT)
+        detect_label.pack(side=tk.LEFT, padx=5)
+        # Pré-remplissage après un collage (index encore non modifiés à la main)
+        text_area.bind('<<Paste>>', lambda event: dialog.after_idle(lambda: detect_columns(automatic=True)), add="+")
 
         # Appel initial pour colorer si des valeurs par défaut sont présentes
         dialog.after(100, update_highlights) # Petite pause pour s'assurer que la fenêtre est rendue
 
-        def do_import():
+        # ====== Aperçu avant import ======
+        preview_frame = tk.LabelFrame(dialog, text=f"Aperçu (les {IMPORT_PREVIEW_ROWS} premières lignes)")
+        preview_frame.pack(fill=tk.BOTH, padx=10, pady=(0, 5))
+        preview = ttk.Treeview(preview_frame, columns=("Ligne", "Position", "PartNumber", "Description"), show="headings", height=6)
+        for column, width in (("Ligne", 50), ("Position", 70), ("PartNumber", 140), ("Description", 380)):
+            preview.heading(column, text=column, anchor=tk.W)
+            preview.column(column, width=width, stretch=(column == "Description"))
+        preview.tag_configure("rejet", foreground="#c62828")
+        preview.pack(fill=tk.BOTH, expand=True, padx=5, pady=(5, 0))
+        preview_summary = tk.Label(preview_frame, text="", anchor=tk.W, font=("Segoe UI", 9, "italic"))
+        preview_summary.pack(fill=tk.X, padx=5, pady=(0, 5))
+
+        def parse_text():
+            """Découpe tout le texte collé en une passe. Retourne (rows, rejects)."""
+            return parse_fixed_width(text_area.get("1.0", "end-1c"), read_layout())
+
+        def show_preview():
             try:
-                raw_text = text_area.get("1.0", tk.END).strip()
-                if not raw_text: return
-                
-                pos_start = int(entry_pos_start.get())
-                pos_end = int(entry_pos_end.get())
-                pn_start = int(entry_pn_start.get())
-                pn_end = int(entry_pn_end.get())
-                desc_start = int(entry_desc_start.get())
-                stop_char = entry_desc_end_char.get()
-                
-                lines = raw_text.split('\n')
-                count = 0
-                for line in lines:
-                    line = line.rstrip() 
-                    if not line: continue
-                    try:
-                        # 1. Extraction Position
-                        position = ""
-                        if len(line) > pos_start:
-                            current_pos_end = min(len(line), pos_end)
-                            position = line[pos_start:current_pos_end].strip()
-
-                        # 2. Extraction Part Number - Condition critique
-                        if len(line) <= pn_start: continue 
-                        
-                        current_pn_end = min(len(line), pn_end)
-                        part_number = line[pn_start:current_pn_end].strip()
-                        
-                        # 3. Extraction Description
-                        description = ""
-                        if len(line) > desc_start:
-                            raw_desc = line[desc_start:]
-                            if stop_char and stop_char in raw_desc:
-                                description = raw_desc.split(stop_char, 1)[0].strip()
-                            else:
-                                description = raw_desc.strip()
-                        
-                        if part_number: 
-                            new_id = str(uuid.uuid4())
-                            # Update parameters including position
-                            self.insert_node_in_tree(parent_id, new_id, position, part_number, description)
-                            self.data_store[new_id] = {
-                                "parent_id": parent_id,
-                                "position": position,
-                                "part_number": part_number,
-                                "description": description
-                            }
-                            count += 1
-                    except IndexError:
-                        continue 
-                
-                self.save_data() 
-                messagebox.showinfo("Succès", f"{count} éléments importés.")
-                dialog.destroy()
+                rows, rejects = parse_text()
             except ValueError:
-                messagebox.showerror("Erreur", "Veuillez entrer des nombres entiers valides pour les index.")
+                messagebox.showerror("Erreur", "Veuillez entrer des nombres entiers valides pour les index.", parent=dialog)
+                return
+            preview.delete(*preview.get_children())
+            # Lignes valides et rejetées, dans l'ordre du texte
+            shown = sorted(rows[:IMPORT_PREVIEW_ROWS] + rejects[:IMPORT_PREVIEW_ROWS], key=lambda item: item.line_no)
+            for item in shown[:IMPORT_PREVIEW_ROWS]:
+                if isinstance(item, ImportRow):
+                    preview.insert("", "end", values=(item.line_no, item.position, item.part_number, item.description))
+                else:
+                    preview.insert("", "end", values=(item.line_no, "", "", f"⚠ {item.reason} : {item.text.strip()}"), tags=("rejet",))
+            preview_summary.config(text=f"{len(rows)} ligne(s) à importer, {len(rejects)} ligne(s) rejetée(s)")
+
+        def do_import():
+            with timed("bulk_import") as stage:
+                try:
+                    with timed("parse"):
+                        rows, rejects = parse_text()
+                except ValueError:
+                    messagebox.showerror("Erreur", "Veuillez entrer des nombres entiers valides pour les index.", parent=dialog)
+                    return
+                if not rows:
+                    messagebox.showwarning("Import", "Aucune ligne valide à importer.", parent=dialog)
+                    return
+                # Le parent a pu être supprimé (ou annulé) pendant que la fenêtre était ouverte
+                if parent_id not in self.model:
+                    messagebox.showerror("Import", "Le noeud parent n'existe plus : sélectionnez un autre parent.", parent=dialog)
+                    return
+
+                # Application en un seul lot (annulable) : modèle, arbre visuel (parent ouvert une fois), puis stockage
+                self.core.add_rows(parent_id, rows)
+                stage.rows = len(rows)
 
-        tk.Button(dialog, text="Lancer l'Importation", command=do_import, bg="#dddddd", height=2).pack(pady=10)
+            message = f"{len(rows)} éléments importés."
+            if rejects:
+                message += f"\n{len(rejects)} ligne(s) ignorée(s) (ex: ligne {rejects[0].line_no} : {rejects[0].reason})."
+            messagebox.showinfo("Succès", message)
+            dialog.destroy()
+
+        button_bar = tk.Frame(dialog)
+        button_bar.pack(pady=10)
+        tk.Button(button_bar, text="Aperçu", command=show_preview, height=2).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_bar, text="Lancer l'Importation", command=do_import, bg="#dddddd", height=2).pack(side=tk.LEFT, padx=5)
 
     def prompt_and_add_node(self, parent_id):
         # Dialogue pour Position
@@ -662,20 +1001,8 @@ class TreeApp:
         description = simpledialog.askstring("Nouveau Noeud", "Entrez la Description:")
         if description is None: description = ""
 
-        # Création
-        new_id = str(uuid.uuid4())
-        self.insert_node_in_tree(parent_id, new_id, position, part_number, description)
-        
-        # Mise à jour des données
-        self.data_store[new_id] = {
-            "parent_id": parent_id,
-            "position": position,
-            "part_number": part_number,
-            "description": description
-        }
-
-        # Sauvegarde temps réel
-        self.save_data()
+        # Création (modèle, arbre visuel et sauvegarde temps réel)
+        self.core.add_node(parent_id, position, part_number, description)
 
     def edit_node(self):
         selected_item = self.tree.selection()
@@ -685,7 +1012,7 @@ class TreeApp:
         node_id = selected_item[0]
         
         # Récupérer les données
-        current_data = self.data_store.get(node_id)
+        current_data = self.model.get(node_id)
         if not current_data: return 
 
         new_pos = simpledialog.askstring("Modifier", "Modifier Position:", initialvalue=current_data.get("position", ""))
@@ -697,44 +1024,215 @@ class TreeApp:
         new_desc = simpledialog.askstring("Modifier", "Modifier Description:", initialvalue=current_data["description"])
         if new_desc is None: return
 
-        # Mise à jour arbre
-        self.tree.item(node_id, text=new_pn, values=(new_pos, new_desc))
-
-        # Mise à jour données
-        self.data_store[node_id]["position"] = new_pos
-        self.data_store[node_id]["part_number"] = new_pn
-        self.data_store[node_id]["description"] = new_desc
+        # Mise à jour données, arbre et sauvegarde
+        self.core.edit_node(node_id, position=new_pos, part_number=new_pn, description=new_desc)
 
-        # Sauvegarde
-        self.save_data()
-
-    def delete_node(self):
-        selected_item = self.tree.selection()
-        if not selected_item:
+    def delete_node(self, event=None):
+        node_ids = self.selected_nodes()
+        if not node_ids:
             messagebox.showwarning("Sélection requise", "Veuillez sélectionner un noeud à supprimer.")
             return
-        node_id = selected_item[0]
         
-        if messagebox.askyesno("Confirmation", "Voulez-vous vraiment supprimer ce noeud et TOUS ses enfants?"):
-            self.delete_node_recursive(node_id)
-            self.save_data()
+        if len(node_ids) == 1:
+            question = "Voulez-vous vraiment supprimer ce noeud et TOUS ses enfants?\n(Ctrl+Z pour annuler)"
+        else:
+            question = f"Voulez-vous vraiment supprimer ces {len(node_ids)} noeuds et TOUS leurs enfants?\n(Ctrl+Z pour annuler)"
+        if messagebox.askyesno("Confirmation", question):
+            # Un seul lot (une écriture, une annulation) ; coût proportionnel à la taille des sous-arbres
+            self.core.delete_subtrees(node_ids)
 
-    def delete_node_recursive(self, node_id):
-        # Supprimer visuellement (supprime aussi les enfants dans Treeview)
-        # Mais on doit aussi nettoyer self.data_store récursivement
-        
-        # Trouver les enfants dans data_store
-        children = [k for k, v in self.data_store.items() if v["parent_id"] == node_id]
-        for child in children:
-            self.delete_node_recursive(child)
-            
-        # Supprimer soi-même
-        if node_id in self.data_store:
-            del self.data_store[node_id]
-        
-        # Si le noeud existe encore dans l'arbre (c'est la racine de la suppression), on le supprime
-        if self.tree.exists(node_id):
-            self.tree.delete(node_id)
+    # ====== Sélection multiple : couper / copier / coller, glisser-déposer ======
+
+    def selected_nodes(self):
+        """Noeuds sélectionnés (sans les enfants fictifs du mode paresseux), dans l'ordre de sélection."""
+        return [item for item in self.tree.selection() if item in self.model]
+
+    def cut_selection(self, event=None):
+        self.set_clipboard("cut")
+
+    def copy_selection(self, event=None):
+        self.set_clipboard("copy")
+
+    def set_clipboard(self, mode):
+        node_ids = self.model.top_level(self.selected_nodes())
+        if not node_ids:
+            messagebox.showwarning("Sélection requise", "Veuillez sélectionner au moins un noeud.")
+            return
+        self.clipboard = (mode, node_ids)
+        action = "coupé(s)" if mode == "cut" else "copié(s)"
+        self.set_status(f"{len(node_ids)} élément(s) {action} : sélectionnez le parent puis Coller (Ctrl+V)")
+
+    def paste_selection(self, event=None):
+        """Colle sous le noeud sélectionné (à la racine si rien n'est sélectionné) :
+        déplacement après Couper, copie avec de nouveaux IDs après Copier."""
+        if self.clipboard is None:
+            self.set_status("Rien à coller")
+            return
+        mode, node_ids = self.clipboard
+        node_ids = [node_id for node_id in node_ids if node_id in self.model]
+        selected = self.selected_nodes()
+        parent_id = selected[0] if selected else ""
+        if mode == "cut":
+            if self.move_nodes(node_ids, parent_id):
+                self.clipboard = None
+        else:
+            copy_ids = self.core.copy_subtrees(node_ids, parent_id)
+            self.set_status(f"{len(copy_ids)} élément(s) copié(s)")
+
+    def move_nodes(self, node_ids, parent_id):
+        """Déplace un lot de sous-arbres sous parent_id (une commande, une écriture). Retourne True si fait."""
+        try:
+            moved = self.core.move_subtrees(node_ids, parent_id)
+        except ValueError as e:
+            messagebox.showerror("Déplacement impossible", str(e))
+            return False
+        self.set_status(f"{len(moved)} élément(s) déplacé(s)")
+        return True
+
+    def on_drag_start(self, event):
+        """Début d'un glisser-déposer possible. Un clic simple sur une sélection multiple la conserve
+        (pour pouvoir la glisser) ; elle est réduite à l'élément cliqué au relâchement s'il n'y a pas eu de glisser."""
+        self._drag = None
+        if event.state & (SHIFT_MASK | CONTROL_MASK):
+            # Ctrl/Maj + clic : modification de la sélection, pas de glisser
+            return
+        item = self.tree.identify_row(event.y)
+        if item not in self.model or self.tree.identify_region(event.x, event.y) not in ("tree", "cell"):
+            return
+        if "indicator" in self.tree.identify_element(event.x, event.y):
+            return
+        selection = self.selected_nodes()
+        keep = item in selection and len(selection) > 1
+        self._drag = {"item": item, "x": event.x, "y": event.y, "active": False, "keep": keep,
+                      "nodes": selection if item in selection else [item]}
+        if keep:
+            return "break"
+
+    def on_drag_motion(self, event):
+        if self._drag is None:
+            return
+        if not self._drag["active"]:
+            if abs(event.x - self._drag["x"]) + abs(event.y - self._drag["y"]) < DRAG_THRESHOLD:
+                return
+            self._drag["active"] = True
+            self.tree.configure(cursor="fleur")
+        target = self.tree.identify_row(event.y)
+        name = self.model.display_name(target) if target in self.model else "la racine"
+        self.set_status(f"Déposer {len(self._drag['nodes'])} élément(s) sous : {name}")
+        return "break"
+
+    def on_drag_drop(self, event):
+        drag, self._drag = self._drag, None
+        if drag is None:
+            return
+        if not drag["active"]:
+            if drag["keep"]:
+                # Clic simple sans glisser : comportement normal (sélection de l'élément seul)
+                self.tree.selection_set(drag["item"])
+                self.tree.focus(drag["item"])
+            return
+        self.tree.configure(cursor="")
+        target = self.tree.identify_row(event.y)
+        if target.startswith(PLACEHOLDER_PREFIX):
+            target = self.tree.parent(target)
+        # Déposé hors des lignes : à la racine
+        self.move_nodes(drag["nodes"], target if target in self.model else "")
+        return "break"
+
+    # ====== Cas d'emploi ======
+
+    def show_where_used(self):
+        """Liste toutes les occurrences d'un Part Number (celui du noeud sélectionné par défaut),
+        avec leur chemin complet ; double-clic pour l'afficher dans l'arbre."""
+        selected = self.selected_nodes()
+        initial = self.model.nodes[selected[0]]["part_number"] if selected else ""
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Cas d'emploi")
+        dialog.geometry("850x450")
+
+        query_frame = tk.Frame(dialog)
+        query_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        tk.Label(query_frame, text="Part Number :").pack(side=tk.LEFT)
+        entry = tk.Entry(query_frame, width=30)
+        entry.insert(0, initial)
+        entry.pack(side=tk.LEFT, padx=5)
+        count_label = tk.Label(query_frame, text="", fg="gray", font=("Segoe UI", 9, "italic"))
+        count_label.pack(side=tk.LEFT, padx=10)
+
+        results = ttk.Treeview(dialog, columns=("Position", "Chemin"), show="tree headings")
+        results.heading("#0", text="Part Number", anchor=tk.W)
+        results.heading("Position", text="Position", anchor=tk.W)
+        results.heading("Chemin", text="Chemin (Élément - Parent - ... - Racine)", anchor=tk.W)
+        results.column("#0", width=180, stretch=tk.NO)
+        results.column("Position", width=70, stretch=tk.NO)
+        results.column("Chemin", width=560)
+        results.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        def lookup(event=None):
+            if not self.where_used.built:
+                self.where_used.build(self.model)
+            results.delete(*results.get_children())
+            node_ids = self.where_used.lookup(entry.get())
+            for node_id in node_ids:
+                node = self.model.nodes[node_id]
+                results.insert("", 'end', iid=node_id, text=node["part_number"],
+                               values=(node["position"], self.model.path_string(node_id)))
+            count_label.config(text=f"{len(node_ids)} occurrence(s)")
+
+        def show_in_tree(event=None):
+            node_id = results.focus()
+            if node_id in self.model:
+                self.navigate_to_node(node_id)
+
+        entry.bind("<Return>", lookup)
+        tk.Button(query_frame, text="Rechercher", command=lookup).pack(side=tk.LEFT)
+        results.bind("<Double-Button-1>", show_in_tree)
+        results.bind("<Return>", show_in_tree)
+        if initial:
+            lookup()
+
+    # ====== Consommation cumulée par sous-arbre ======
+
+    def load_consumption(self):
+        """Charge un ou plusieurs exports de consommation (plusieurs périodes sont cumulées)
+        et affiche la quantité et la valeur consommées de chaque sous-arbre."""
+        paths = filedialog.askopenfilenames(title="Exports de consommation",
+                                            filetypes=[("Classeurs Excel", "*.xls *.xlsx"), ("Tous les fichiers", "*.*")])
+        if not paths:
+            return
+        with timed("load_consumption") as stage:
+            try:
+                consumption = pd.concat([pd.read_excel(path) for path in paths], ignore_index=True)
+                table = consumption_by_key(consumption)
+            except Exception as e:
+                messagebox.showerror("Consommation", f"Impossible de lire l'export de consommation:\n{e}")
+                return
+            stage.rows = len(consumption)
+            # Seuls les noeuds dont la consommation change (et leurs ancêtres) sont recalculés
+            self.rollup.set_consumption(self.model, table)
+            self.refresh_rollup_columns(all_items=True)
+        self.set_status(f"Consommation chargée : {len(consumption)} sortie(s), {len(table)} article(s) ({len(paths)} fichier(s))")
+
+    def refresh_rollup_columns(self, all_items=False):
+        """Met à jour les cumuls affichés : les sous-arbres recalculés depuis la dernière mise à jour
+        (ancêtres d'un noeud modifié), ou tous les éléments présents dans le Treeview."""
+        if not self.rollup.consumption:
+            return
+        if all_items:
+            self.rollup.take_changed(self.model)
+            node_ids = []
+            stack = list(self.tree.get_children(""))
+            while stack:
+                item = stack.pop()
+                if item in self.model:
+                    node_ids.append(item)
+                    stack.extend(self.tree.get_children(item))
+        else:
+            node_ids = self.rollup.take_changed(self.model)
+        for node_id in node_ids:
+            if self.tree.exists(node_id):
+                self.tree.item(node_id, values=self.item_values(node_id))
 
 if __name__ == "__main__":
     # Vérification des dépendances au lancement
@@ -0,0 +1,218 @@
+"""
+Ligne de commande du gestionnaire d'arbre (sans affichage, pour les traitements par lots).
+
+    python tree_cli.py load <arbre.xlsx|arbre.db>
+    python tree_cli.py stats <arbre.xlsx|arbre.db>
+    python tree_cli.py export <arbre.xlsx|arbre.db> <sortie.xlsx>
+    python tree_cli.py import-fixed-width <arbre.xlsx|arbre.db> <texte.txt> [--parent ID]
+                       [--layout 0,3,4,16,19] [--stop-char .] [--detect] [--ids content]
+    python tree_cli.py shared <arbre.xlsx|arbre.db> [--top 20]
+    python tree_cli.py where-used <arbre.xlsx|arbre.db> <part_number>
+    python tree_cli.py migrate [source.xlsx] [cible.xlsx] [--ids content]
+    python tree_cli.py sync <source.xlsx> <arbre.xlsx|arbre.db>
+
+Options communes (avant la commande) : --profile (capture cProfile des opérations,
+fichiers .prof à côté de perf_log.jsonl) et --trace-memory (mémoire mesurée par tracemalloc).
+
+Un fichier .db est ouvert avec le stockage SQLite ; un classeur avec le stockage
+Excel (journal rejoué, puis classeur réécrit après un import).
+Chaque commande affiche sa durée.
+
+--ids content : IDs des nouveaux noeuds dérivés du contenu (parent, position, part number) ;
+sync migre la source ainsi et n'applique à l'arbre existant que la différence.
+"""
+import argparse
+import os
+import sys
+import time
+
+from tree_core import TreeCore
+from storage import ExcelStorage, SQLiteStorage
+from bulk_import import ColumnLayout, DEFAULT_LAYOUT, detect_layout
+import perf_log
+from shared_components import ComponentGraph
+from where_used import WhereUsedIndex
+from node_ids import RANDOM, ID_SCHEMES
+
+# Dossier des scripts racine (migrate_data.py)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def open_source(path):
+    """Stockage correspondant au fichier : base SQLite (.db) ou classeur Excel + journal."""
+    if path.lower().endswith(".db"):
+        return SQLiteStorage(path)
+    return ExcelStorage(path)
+
+
+def load_core(path, id_scheme=RANDOM):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Le fichier {path} n'existe pas.")
+    core = TreeCore(open_source(path), id_scheme=id_scheme)
+    core.load()
+    return core
+
+
+def parse_layout(text, stop_char):
+    """"0,3,4,16,19" -> ColumnLayout (début/fin Position, début/fin Part Number, début Description)."""
+    values = [int(value) for value in text.split(",")]
+    if len(values) != 5:
+        raise ValueError("--layout attend 5 index : pos_debut,pos_fin,pn_debut,pn_fin,desc_debut")
+    return ColumnLayout(*values, stop_char)
+
+
+# ====== Commandes ======
+
+def cmd_load(args):
+    core = load_core(args.source)
+    print(f"{len(core.model)} éléments chargés depuis {args.source}")
+    core.storage.close()
+
+
+def cmd_stats(args):
+    core = load_core(args.source)
+    for key, value in core.stats().items():
+        print(f"{key:>14} : {value}")
+    core.storage.close()
+
+
+def cmd_export(args):
+    core = load_core(args.source)
+    count = core.write_excel(args.output)
+    print(f"✅ {count} éléments exportés dans {args.output}")
+    core.storage.close()
+
+
+def cmd_import_fixed_width(args):
+    core = load_core(args.source, args.ids)
+    with open(args.text_file, "r", encoding=args.encoding) as f:
+        text = f.read()
+    if args.detect:
+        layout = detect_layout(text, args.stop_char)
+        if layout is None:
+            raise ValueError("Colonnes non détectées : précisez --layout.")
+        print(f"Colonnes détectées : {','.join(str(value) for value in layout[:5])}")
+    elif args.layout:
+        layout = parse_layout(args.layout, args.stop_char)
+    else:
+        layout = DEFAULT_LAYOUT._replace(stop_char=args.stop_char)
+
+    new_ids, rejects = core.import_fixed_width(args.parent, text, layout)
+    for reject in rejects[:10]:
+        print(f"  ligne {reject.line_no} ignorée : {reject.reason}")
+    if len(rejects) > 10:
+        print(f"  ... {len(rejects) - 10} autre(s) ligne(s) ignorée(s)")
+    # Stockage Excel : le classeur est réécrit et le journal vidé
+    core.flush(args.source)
+    print(f"✅ {len(new_ids)} éléments importés, {len(rejects)} ligne(s) rejetée(s)")
+    core.storage.close()
+
+
+def cmd_shared(args):
+    """Rapport des sous-ensembles répétés : nombre de copies, lignes qu'elles occupent
+    et chemin d'une occurrence pour les retrouver dans l'arbre."""
+    core = load_core(args.source)
+    graph = ComponentGraph.from_model(core.model)
+    for key, value in graph.stats().items():
+        print(f"{key:>18} : {value}")
+    for component, uses, copies in graph.shared()[:args.top]:
+        part_number, description, _ = graph.components[component]
+        print(f"  {part_number:<20} {description[:40]:<40} x{uses}  ({copies} lignes en copies)")
+        print(f"      ex. {core.path_string(graph.first_node[component])}")
+    core.storage.close()
+
+
+def cmd_where_used(args):
+    core = load_core(args.source)
+    index = WhereUsedIndex()
+    index.build(core.model)
+    node_ids = index.lookup(args.part_number)
+    for node_id in node_ids:
+        print(f"{node_id}  {core.path_string(node_id)}")
+    print(f"{len(node_ids)} occurrence(s) de {args.part_number}")
+    core.storage.close()
+
+
+def cmd_migrate(args):
+    sys.path.insert(0, PROJECT_DIR)
+    import migrate_data
+    count = migrate_data.migrate(args.source or migrate_data.SOURCE_FILE, args.target or migrate_data.TARGET_FILE,
+                                 id_scheme=args.ids)
+    if count is None:
+        raise RuntimeError("La migration a échoué.")
+
+
+def cmd_sync(args):
+    sys.path.insert(0, PROJECT_DIR)
+    import migrate_data
+    if migrate_data.sync(args.source, args.target) is None:
+        raise RuntimeError("La synchronisation a échoué.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Gestionnaire d'arbre Part Number / Description (sans affichage)")
+    perf_log.add_arguments(parser)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sub = commands.add_parser("load", help="Charger l'arbre et afficher le rapport de chargement")
+    sub.add_argument("source")
+    sub.set_defaults(func=cmd_load)
+
+    sub = commands.add_parser("stats", help="Statistiques de l'arbre")
+    sub.add_argument("source")
+    sub.set_defaults(func=cmd_stats)
+
+    sub = commands.add_parser("export", help="Écrire le classeur Excel mis en forme")
+    sub.add_argument("source")
+    sub.add_argument("output")
+    sub.set_defaults(func=cmd_export)
+
+    sub = commands.add_parser("import-fixed-width", help="Importer un texte à colonnes fixes sous un noeud")
+    sub.add_argument("source")
+    sub.add_argument("text_file")
+    sub.add_argument("--parent", default="", help="ID du noeud parent (racine par défaut)")
+    sub.add_argument("--layout", help="Index pos_debut,pos_fin,pn_debut,pn_fin,desc_debut (défaut 0,3,4,16,19)")
+    sub.add_argument("--stop-char", default=DEFAULT_LAYOUT.stop_char, help="Caractère de fin de la description")
+    sub.add_argument("--detect", action="store_true", help="Détecter les colonnes automatiquement")
+    sub.add_argument("--encoding", default="utf-8")
+    sub.add_argument("--ids", choices=ID_SCHEMES, default=RANDOM, help="IDs des nouveaux noeuds (défaut random)")
+    sub.set_defaults(func=cmd_import_fixed_width)
+
+    sub = commands.add_parser("shared", help="Rapport des sous-ensembles répétés (copies sous plusieurs parents)")
+    sub.add_argument("source")
+    sub.add_argument("--top", type=int, default=20, help="Nombre de sous-ensembles répétés affichés")
+    sub.set_defaults(func=cmd_shared)
+
+    sub = commands.add_parser("where-used", help="Occurrences d'un Part Number et leur chemin")
+    sub.add_argument("source")
+    sub.add_argument("part_number")
+    sub.set_defaults(func=cmd_where_used)
+
+    sub = commands.add_parser("migrate", help="Migrer un classeur par niveaux vers le format interne (ID / ParentID)")
+    sub.add_argument("source", nargs="?")
+    sub.add_argument("target", nargs="?")
+    sub.add_argument("--ids", choices=ID_SCHEMES, default=RANDOM, help="IDs uuid4 (random) ou dérivés du contenu")
+    sub.set_defaults(func=cmd_migrate)
+
+    sub = commands.add_parser("sync", help="Migrer la source (IDs dérivés du contenu) et n'appliquer que la différence")
+    sub.add_argument("source")
+    sub.add_argument("target")
+    sub.set_defaults(func=cmd_sync)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    perf_log.apply_arguments(args)
+    start = time.perf_counter()
+    try:
+        args.func(args)
+    except Exception as e:
+        print(f"Erreur: {e}")
+        return 1
+    print(f"⏱ {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
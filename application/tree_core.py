@@ -0,0 +1,226 @@
+"""
+Noyau de l'application, sans interface graphique : chargement, modifications
+annulables, chemins, import de texte à largeur fixe et export Excel.
+TreeApp (Tkinter) n'en est qu'une vue ; tree_cli.py l'utilise en ligne de commande.
+"""
+import uuid
+
+from tree_model import TreeModel, report_summary
+from excel_export import ExportRow, write_styled_workbook
+from commands import (CommandHistory, AddNodesCommand, EditNodeCommand, DeleteSubtreeCommand, MoveSubtreeCommand,
+                      MoveSubtreesCommand, CopySubtreesCommand, DeleteSubtreesCommand)
+from bulk_import import parse_fixed_width, new_node_ids
+from node_ids import RANDOM, CONTENT, ID_SCHEMES, free_content_id
+from perf_log import timed
+
+
+class NullView:
+    """Vue sans affichage (ligne de commande, mesures) : les mises à jour ciblées sont ignorées."""
+
+    def view_insert_children(self, parent_id, node_ids):
+        pass
+
+    def view_insert_subtree(self, node_id):
+        pass
+
+    def view_remove(self, node_ids):
+        pass
+
+    def view_update(self, node_id):
+        pass
+
+    def view_move(self, node_id):
+        pass
+
+    def view_move_many(self, node_ids):
+        pass
+
+    def view_command_done(self, command, undone):
+        pass
+
+
+class TreeCore:
+    """Arbre chargé depuis un stockage, avec historique annuler / rétablir.
+
+    view reçoit les mises à jour ciblées pendant chaque commande, puis view_command_done()
+    (TreeApp, ou NullView). id_scheme : IDs des nouveaux noeuds, "random" (uuid4) ou
+    "content" (dérivés du parent, de la position et du part number, voir node_ids).
+    """
+
+    def __init__(self, storage, view=None, id_scheme=RANDOM):
+        if id_scheme not in ID_SCHEMES:
+            raise ValueError(f"Schéma d'ID inconnu: {id_scheme}")
+        self.storage = storage
+        self.view = view if view is not None else NullView()
+        self.id_scheme = id_scheme
+        self.model = TreeModel()
+        self.history = CommandHistory()
+        # Rapport du dernier chargement (orphelins, noeuds inaccessibles, doublons)
+        self.last_load_report = None
+
+    # ====== Chargement ======
+
+    def load(self):
+        """Charge l'arbre depuis le stockage (base SQLite, ou instantané Excel + journal).
+        Retourne le rapport de chargement. Les erreurs de lecture sont propagées."""
+        with timed("load") as stage:
+            self.model, report = self.storage.load()
+            stage.rows = len(self.model)
+        self.last_load_report = report
+        # Le modèle a été remplacé : l'historique ne s'applique plus
+        self.history.clear()
+        summary = report_summary(report)
+        if summary:
+            print(f"Attention: {summary}")
+        return report
+
+    # ====== Modifications (annulables) ======
+
+    def execute(self, command):
+        """Exécute une modification : modèle, vue et stockage."""
+        self.history.execute(command, self)
+        self.view.view_command_done(command, undone=False)
+        return command
+
+    def undo(self):
+        """Annule la dernière commande. Retourne la commande, ou None si rien à annuler."""
+        command = self.history.undo(self)
+        if command is not None:
+            self.view.view_command_done(command, undone=True)
+        return command
+
+    def redo(self):
+        """Rétablit la dernière commande annulée. Retourne la commande, ou None."""
+        command = self.history.redo(self)
+        if command is not None:
+            self.view.view_command_done(command, undone=False)
+        return command
+
+    def new_node_id(self, parent_id, position, part_number, reserved=()):
+        """ID d'un nouveau noeud selon id_scheme. Un ID dérivé du contenu n'est ni dans le modèle
+        ni dans reserved (IDs déjà attribués au lot en cours)."""
+        if self.id_scheme == CONTENT:
+            return free_content_id(parent_id, position, part_number,
+                                   lambda node_id: node_id in self.model or node_id in reserved)
+        return str(uuid.uuid4())
+
+    def new_child_ids(self, parent_id, rows):
+        """IDs d'un lot de nouveaux enfants de parent_id (lignes avec position et part_number)."""
+        if self.id_scheme != CONTENT:
+            return new_node_ids(len(rows))
+        new_ids = []
+        reserved = set()
+        for row in rows:
+            new_ids.append(self.new_node_id(parent_id, row.position, row.part_number, reserved))
+            reserved.add(new_ids[-1])
+        return new_ids
+
+    def add_node(self, parent_id, position, part_number, description):
+        """Ajoute un noeud à la fin des enfants de parent_id. Retourne son ID."""
+        new_id = self.new_node_id(parent_id, position, part_number)
+        self.execute(AddNodesCommand(parent_id, [(new_id, position, part_number, description)]))
+        return new_id
+
+    def add_rows(self, parent_id, rows, label="Import en masse"):
+        """Ajoute un lot de lignes (position, part_number, description, ...) en une seule commande
+        et une seule écriture. Retourne les nouveaux IDs."""
+        with timed("add_rows", rows=len(rows)):
+            new_ids = self.new_child_ids(parent_id, rows)
+            self.execute(AddNodesCommand(parent_id, [(new_id, row.position, row.part_number, row.description)
+                                                     for new_id, row in zip(new_ids, rows)], label))
+        return new_ids
+
+    def edit_node(self, node_id, **fields):
+        self.execute(EditNodeCommand(node_id, **fields))
+
+    def delete_subtree(self, node_id):
+        self.execute(DeleteSubtreeCommand(node_id))
+
+    def move_subtree(self, node_id, new_parent_id, index=None):
+        self.execute(MoveSubtreeCommand(node_id, new_parent_id, index))
+
+    # ====== Sélection multiple (un lot = une commande, une écriture) ======
+
+    def move_subtrees(self, node_ids, new_parent_id):
+        """Déplace plusieurs sous-arbres à la fin des enfants de new_parent_id.
+        Les noeuds dont un ancêtre est aussi sélectionné suivent celui-ci."""
+        node_ids = self.model.top_level(node_ids)
+        if new_parent_id and any(self.model.is_ancestor(node_id, new_parent_id) for node_id in node_ids):
+            raise ValueError("Impossible de déplacer un noeud dans son propre sous-arbre.")
+        if node_ids:
+            self.execute(MoveSubtreesCommand(node_ids, new_parent_id))
+        return node_ids
+
+    def copy_subtrees(self, node_ids, new_parent_id):
+        """Copie plusieurs sous-arbres (nouveaux IDs) sous new_parent_id. Retourne les IDs des copies."""
+        node_ids = self.model.top_level(node_ids)
+        if not node_ids:
+            return []
+        command = self.execute(CopySubtreesCommand(node_ids, new_parent_id))
+        return command.copy_ids
+
+    def delete_subtrees(self, node_ids):
+        """Supprime plusieurs sous-arbres. Retourne les racines supprimées."""
+        node_ids = self.model.top_level(node_ids)
+        if node_ids:
+            self.execute(DeleteSubtreesCommand(node_ids))
+        return node_ids
+
+    def import_fixed_width(self, parent_id, text, layout):
+        """Découpe le texte collé et ajoute les lignes valides sous parent_id.
+        Retourne (new_ids, rejects)."""
+        if parent_id and parent_id not in self.model:
+            raise ValueError(f"Noeud parent introuvable : {parent_id}")
+        with timed("import_fixed_width"):
+            with timed("parse") as stage:
+                rows, rejects = parse_fixed_width(text, layout)
+                stage.rows = len(rows)
+            new_ids = self.add_rows(parent_id, rows) if rows else []
+        return new_ids, rejects
+
+    # ====== Lecture ======
+
+    def path_string(self, node_id):
+        """Chemin lisible d'un noeud (Élément - Parent - ... - Racine)."""
+        return self.model.path_string(node_id)
+
+    def snapshot(self):
+        """Instantané immuable de l'arbre (ordre visuel, niveaux, chemins) pour l'export Excel."""
+        with timed("snapshot") as stage:
+            export_data = []
+            # Parcours en profondeur pour obtenir l'ordre visuel et les niveaux ;
+            # le chemin lisible (commentaires Excel) de chaque enfant prolonge celui de son parent
+            for node_id, level, chemin in self.model.iter_paths():
+                node_data = self.model.nodes[node_id]
+                export_data.append(ExportRow(node_data["position"], node_data["part_number"], node_data["description"],
+                                             level, node_id, node_data["parent_id"], chemin))
+            stage.rows = len(export_data)
+        return tuple(export_data)
+
+    def stats(self):
+        """Statistiques de l'arbre : noeuds, racines, feuilles, profondeur et plus grande fratrie."""
+        depth = 0
+        leaves = 0
+        for node_id, level in self.model.walk():
+            depth = max(depth, level + 1)
+            if not self.model.get_children(node_id):
+                leaves += 1
+        fan_out = max((len(ids) for parent_id, ids in self.model.children.items() if parent_id), default=0)
+        return {"nodes": len(self.model), "roots": len(self.model.get_children("")), "leaves": leaves,
+                "depth": depth, "max_children": fan_out}
+
+    # ====== Écriture du classeur ======
+
+    def write_excel(self, path):
+        """Écrit le classeur mis en forme (synchrone). Retourne le nombre de lignes écrites."""
+        with timed("write_excel"):
+            return write_styled_workbook(self.snapshot(), path)
+
+    def flush(self, excel_path):
+        """Stockage "excel" : réécrit le classeur et vide le journal s'il contient des modifications."""
+        if not self.storage.pending_changes():
+            return 0
+        mark = self.storage.checkpoint()
+        count = self.write_excel(excel_path)
+        self.storage.compacted(mark)
+        return count
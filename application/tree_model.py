@@ -0,0 +1,429 @@
+"""
+Modèle de données de l'arbre (sans interface graphique).
+Les noeuds sont stockés dans un dictionnaire et un index parent -> enfants
+conserve l'ordre des frères, pour que les opérations sur un sous-arbre
+(suppression, déplacement, copie, comptage) ne coûtent que la taille du sous-arbre.
+"""
+import uuid
+
+# Clé de la racine virtuelle dans l'index des enfants
+ROOT_ID = ""
+
+# Champs modifiables d'un noeud
+NODE_FIELDS = ("position", "part_number", "description")
+
+
+def build_tree_index(df):
+    """Construit en une seule passe l'index des noeuds et l'index parent -> enfants.
+
+    Retourne (nodes, children, report) :
+    - nodes : id -> {parent_id, part_number, description, position}
+    - children : parent_id -> liste ordonnée des ids enfants ("" = racine)
+    - report : {"roots", "orphans", "duplicates", "unreachable"} où
+      "orphans" sont les noeuds dont le parent n'existe pas dans le fichier
+      (ils sont rattachés à la racine), "duplicates" les IDs répétés (seule
+      la première occurrence est gardée) et "unreachable" les noeuds pris
+      dans un cycle, jamais atteints depuis une racine.
+    """
+    def column(name):
+        # Conversion vectorisée d'une colonne en texte ("" pour les cellules vides)
+        if name not in df.columns:
+            return [""] * len(df)
+        values = df[name]
+        return values.where(values.notna(), "").astype(str).tolist()
+
+    ids = df["ID"].astype(str).tolist()
+    parent_ids = column("ParentID")
+    part_numbers = column("PartNumber")
+    descriptions = column("Description")
+    positions = column("Position")
+
+    nodes = {}
+    duplicates = []
+    for node_id, parent_id, part_number, description, position in zip(ids, parent_ids, part_numbers, descriptions, positions):
+        if node_id in nodes:
+            duplicates.append(node_id)
+            continue
+        nodes[node_id] = {"parent_id": parent_id, "part_number": part_number, "description": description, "position": position}
+
+    children = {ROOT_ID: []}
+    orphans = []
+    for node_id, node in nodes.items():
+        parent_id = node["parent_id"]
+        if parent_id and parent_id in nodes and parent_id != node_id:
+            children.setdefault(parent_id, []).append(node_id)
+        else:
+            if parent_id:
+                # Parent absent du fichier : le noeud est affiché à la racine
+                orphans.append(node_id)
+                node["parent_id"] = ROOT_ID
+            children[ROOT_ID].append(node_id)
+
+    # Les noeuds jamais atteints depuis la racine forment des cycles
+    reached = set()
+    stack = list(children[ROOT_ID])
+    while stack:
+        node_id = stack.pop()
+        reached.add(node_id)
+        stack.extend(children.get(node_id, ()))
+    unreachable = [node_id for node_id in nodes if node_id not in reached]
+
+    report = {"roots": list(children[ROOT_ID]), "orphans": orphans, "duplicates": duplicates, "unreachable": unreachable}
+    return nodes, children, report
+
+
+def report_summary(report):
+    """Résumé lisible des anomalies d'un rapport de chargement, ou None s'il n'y en a pas."""
+    if not report or not (report["orphans"] or report["unreachable"] or report["duplicates"]):
+        return None
+    return (f"{len(report['orphans'])} orphelin(s) rattaché(s) à la racine, "
+            f"{len(report['unreachable'])} noeud(s) inaccessible(s) ignoré(s), "
+            f"{len(report['duplicates'])} ID(s) en double ignoré(s).")
+
+
+class TreeModel:
+    """Arbre indexé : noeuds (id -> données) et listes ordonnées d'enfants."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.children = {ROOT_ID: []}
+        # Caches des chaînes d'ancêtres et des chemins lisibles, par noeud.
+        # Invariant : si un noeud est en cache, tous ses ancêtres le sont aussi.
+        self._ancestor_cache = {}
+        self._path_cache = {}
+        # Index maintenus à jour à chaque modification (recherche, cas d'emploi, ...).
+        # Un abonné définit les méthodes qui l'intéressent parmi :
+        # node_added(model, node_id), node_updated(model, node_id, old_values),
+        # subtree_removed(model, removed), subtree_moved(model, node_id, old_parent_id)
+        self.listeners = []
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Crée un modèle depuis un DataFrame (colonnes ID, ParentID, ...). Retourne (model, report)."""
+        nodes, children, report = build_tree_index(df)
+        model = cls()
+        # Les noeuds inaccessibles (cycles) ne font pas partie de l'arbre
+        for node_id in report["unreachable"]:
+            parent_id = nodes[node_id]["parent_id"]
+            children.pop(node_id, None)
+            if parent_id in children and node_id in children[parent_id]:
+                children[parent_id].remove(node_id)
+            del nodes[node_id]
+        model.nodes = nodes
+        model.children = children
+        return model, report
+
+    # ====== Lecture ======
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    def parent(self, node_id):
+        return self.nodes[node_id]["parent_id"]
+
+    def get_children(self, parent_id=ROOT_ID):
+        return self.children.get(parent_id, [])
+
+    def index_of(self, node_id):
+        """Rang du noeud parmi ses frères."""
+        return self.children[self.nodes[node_id]["parent_id"]].index(node_id)
+
+    def ancestors(self, node_id):
+        """Tuple des ancêtres (de la racine vers le noeud), incluant le noeud lui-même (mis en cache)."""
+        chain = self._ancestor_cache.get(node_id)
+        if chain is not None:
+            return chain
+        # Remonter jusqu'au premier ancêtre déjà en cache, puis redescendre en complétant le cache
+        missing = []
+        current_id = node_id
+        while current_id in self.nodes and current_id not in self._ancestor_cache:
+            missing.append(current_id)
+            current_id = self.nodes[current_id]["parent_id"]
+        chain = self._ancestor_cache.get(current_id, ())
+        for missing_id in reversed(missing):
+            chain = chain + (missing_id,)
+            self._ancestor_cache[missing_id] = chain
+        return chain
+
+    def display_name(self, node_id):
+        """Nom affiché d'un noeud : la description, sinon le part number."""
+        node = self.nodes[node_id]
+        return node["description"] if node["description"] else node["part_number"]
+
+    def _extend_path(self, node_id, parent_path):
+        name = self.display_name(node_id)
+        if not name:
+            return parent_path
+        if not parent_path:
+            return name
+        return f"{name} - {parent_path}"
+
+    def path_string(self, node_id):
+        """Chemin lisible (Élément - Parent - ... - Racine), construit à partir du chemin du parent et mis en cache."""
+        path = self._path_cache.get(node_id)
+        if path is not None:
+            return path
+        missing = []
+        current_id = node_id
+        while current_id in self.nodes and current_id not in self._path_cache:
+            missing.append(current_id)
+            current_id = self.nodes[current_id]["parent_id"]
+        path = self._path_cache.get(current_id, "")
+        for missing_id in reversed(missing):
+            path = self._extend_path(missing_id, path)
+            self._path_cache[missing_id] = path
+        return path
+
+    def iter_paths(self):
+        """Parcours en profondeur (préfixe) de tout l'arbre : génère (id, niveau, chemin).
+        Chaque chemin prolonge celui du parent pendant la descente et reste en cache."""
+        stack = [(root_id, 0, "") for root_id in reversed(self.children[ROOT_ID])]
+        while stack:
+            node_id, level, parent_path = stack.pop()
+            path = self._path_cache.get(node_id)
+            if path is None:
+                path = self._extend_path(node_id, parent_path)
+                self._path_cache[node_id] = path
+            yield node_id, level, path
+            for child_id in reversed(self.children.get(node_id, ())):
+                stack.append((child_id, level + 1, path))
+
+    def _invalidate_subtree(self, node_id, ancestors=True):
+        """Retire du cache les chemins (et chaînes d'ancêtres) du sous-arbre dont les ancêtres ont changé."""
+        if node_id not in self._path_cache and (not ancestors or node_id not in self._ancestor_cache):
+            # D'après l'invariant, aucun descendant n'est en cache
+            return
+        for current_id, _ in self.iter_subtree(node_id):
+            self._path_cache.pop(current_id, None)
+            if ancestors:
+                self._ancestor_cache.pop(current_id, None)
+
+    def is_ancestor(self, ancestor_id, node_id):
+        """Vrai si ancestor_id est node_id ou l'un de ses ancêtres (coût : profondeur)."""
+        current_id = node_id
+        while current_id in self.nodes:
+            if current_id == ancestor_id:
+                return True
+            current_id = self.nodes[current_id]["parent_id"]
+        return False
+
+    def iter_subtree(self, node_id, level=0):
+        """Parcours en profondeur (préfixe) du sous-arbre : génère (id, niveau relatif)."""
+        stack = [(node_id, level)]
+        while stack:
+            current_id, current_level = stack.pop()
+            yield current_id, current_level
+            for child_id in reversed(self.children.get(current_id, ())):
+                stack.append((child_id, current_level + 1))
+
+    def walk(self):
+        """Parcours en profondeur (préfixe) de tout l'arbre : génère (id, niveau)."""
+        for root_id in list(self.children[ROOT_ID]):
+            yield from self.iter_subtree(root_id)
+
+    def count_subtree(self, node_id):
+        """Nombre de noeuds du sous-arbre (noeud inclus)."""
+        count = 0
+        stack = [node_id]
+        while stack:
+            current_id = stack.pop()
+            count += 1
+            stack.extend(self.children.get(current_id, ()))
+        return count
+
+    # ====== Modification ======
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _notify(self, event, *args):
+        for listener in self.listeners:
+            handler = getattr(listener, event, None)
+            if handler is not None:
+                handler(self, *args)
+
+    def add_node(self, node_id, parent_id, position, part_number, description, index=None):
+        """Ajoute un noeud sous parent_id (à la fin, ou au rang index)."""
+        if node_id in self.nodes:
+            raise ValueError(f"ID déjà présent: {node_id}")
+        if parent_id and parent_id not in self.nodes:
+            raise KeyError(parent_id)
+        self.nodes[node_id] = {"parent_id": parent_id, "position": position, "part_number": part_number, "description": description}
+        siblings = self.children.setdefault(parent_id, [])
+        if index is None:
+            siblings.append(node_id)
+        else:
+            siblings.insert(index, node_id)
+        self._notify("node_added", node_id)
+
+    def add_children(self, parent_id, items):
+        """Ajoute en une fois une suite de noeuds (node_id, position, part_number, description)
+        à la fin des enfants de parent_id (import en masse)."""
+        if parent_id and parent_id not in self.nodes:
+            raise KeyError(parent_id)
+        items = list(items)
+        for node_id, _, _, _ in items:
+            if node_id in self.nodes:
+                raise ValueError(f"ID déjà présent: {node_id}")
+        for node_id, position, part_number, description in items:
+            self.nodes[node_id] = {"parent_id": parent_id, "position": position, "part_number": part_number, "description": description}
+        self.children.setdefault(parent_id, []).extend(node_id for node_id, _, _, _ in items)
+        for node_id, _, _, _ in items:
+            self._notify("node_added", node_id)
+
+    def update_node(self, node_id, **fields):
+        """Met à jour les champs (position, part_number, description) d'un noeud."""
+        node = self.nodes[node_id]
+        old_values = {key: node[key] for key in NODE_FIELDS}
+        old_name = self.display_name(node_id)
+        for key, value in fields.items():
+            if key not in NODE_FIELDS:
+                raise KeyError(key)
+            node[key] = value
+        if self.display_name(node_id) != old_name:
+            # Le nom apparaît dans le chemin de tout le sous-arbre
+            self._invalidate_subtree(node_id, ancestors=False)
+        self._notify("node_updated", node_id, old_values)
+
+    def remove_subtree(self, node_id):
+        """Supprime le noeud et tous ses descendants.
+
+        Retourne les lignes supprimées en ordre préfixe : (id, données), ce qui
+        suffit pour recréer le sous-arbre à l'identique.
+        """
+        node = self.nodes[node_id]
+        removed = [(current_id, dict(self.nodes[current_id])) for current_id, _ in self.iter_subtree(node_id)]
+        self.children[node["parent_id"]].remove(node_id)
+        for current_id, _ in removed:
+            del self.nodes[current_id]
+            self.children.pop(current_id, None)
+            self._path_cache.pop(current_id, None)
+            self._ancestor_cache.pop(current_id, None)
+        self._notify("subtree_removed", removed)
+        return removed
+
+    def remove_subtrees(self, node_ids):
+        """Supprime plusieurs sous-arbres en une fois (chaque liste de frères n'est filtrée qu'une fois).
+        Aucun des noeuds ne doit être descendant d'un autre de la liste.
+        Retourne les lignes supprimées en ordre préfixe, comme remove_subtree."""
+        removed = []
+        by_parent = {}
+        for node_id in node_ids:
+            if node_id not in self.nodes:
+                continue
+            removed.extend((current_id, dict(self.nodes[current_id])) for current_id, _ in self.iter_subtree(node_id))
+            by_parent.setdefault(self.nodes[node_id]["parent_id"], set()).add(node_id)
+        for parent_id, ids in by_parent.items():
+            if parent_id in self.children:
+                self.children[parent_id] = [child_id for child_id in self.children[parent_id] if child_id not in ids]
+        for current_id, _ in removed:
+            self.nodes.pop(current_id, None)
+            self.children.pop(current_id, None)
+            self._path_cache.pop(current_id, None)
+            self._ancestor_cache.pop(current_id, None)
+        if removed:
+            self._notify("subtree_removed", removed)
+        return removed
+
+    def move_subtree(self, node_id, new_parent_id, index=None):
+        """Rattache le sous-arbre à un nouveau parent (à la fin, ou au rang index)."""
+        if new_parent_id and self.is_ancestor(node_id, new_parent_id):
+            raise ValueError("Impossible de déplacer un noeud dans son propre sous-arbre.")
+        if new_parent_id and new_parent_id not in self.nodes:
+            raise KeyError(new_parent_id)
+        node = self.nodes[node_id]
+        old_parent_id = node["parent_id"]
+        self._invalidate_subtree(node_id)
+        self.children[old_parent_id].remove(node_id)
+        node["parent_id"] = new_parent_id
+        siblings = self.children.setdefault(new_parent_id, [])
+        if index is None:
+            siblings.append(node_id)
+        else:
+            siblings.insert(index, node_id)
+        self._notify("subtree_moved", node_id, old_parent_id)
+
+    def ranks(self, node_ids):
+        """{id: rang parmi ses frères} pour plusieurs noeuds ; chaque liste de frères n'est parcourue qu'une fois."""
+        wanted = set(node_ids)
+        ranks = {}
+        for parent_id in {self.nodes[node_id]["parent_id"] for node_id in wanted}:
+            for rank, child_id in enumerate(self.children[parent_id]):
+                if child_id in wanted:
+                    ranks[child_id] = rank
+        return ranks
+
+    def top_level(self, node_ids):
+        """Noeuds de la liste dont aucun ancêtre n'est dans la liste (ordre conservé, doublons retirés).
+        Déplacer, copier ou supprimer ces noeuds suffit pour toute la sélection."""
+        wanted = set(node_ids)
+        result = []
+        for node_id in dict.fromkeys(node_ids):
+            if node_id in self.nodes and not any(ancestor_id in wanted for ancestor_id in self.ancestors(node_id)[:-1]):
+                result.append(node_id)
+        return result
+
+    def place_subtrees(self, placements):
+        """Déplace plusieurs sous-arbres en une fois : placements = [(id, nouveau parent, rang ou None)].
+
+        Les rangs d'un même parent sont ceux qu'auraient donnés des move_subtree successifs
+        par rang croissant (None : à la fin, dans l'ordre de la liste). Chaque liste de frères
+        n'est réécrite qu'une fois : le coût est celui des listes touchées, pas de l'arbre.
+        Retourne les placements inverses (id, ancien parent, ancien rang), par rang croissant.
+        """
+        for node_id, parent_id, _ in placements:
+            if parent_id and parent_id not in self.nodes:
+                raise KeyError(parent_id)
+            if parent_id and self.is_ancestor(node_id, parent_id):
+                raise ValueError("Impossible de déplacer un noeud dans son propre sous-arbre.")
+        moved = {node_id for node_id, _, _ in placements}
+        old_ranks = self.ranks(moved)
+        previous = sorted(((node_id, self.nodes[node_id]["parent_id"], old_ranks[node_id]) for node_id in moved),
+                          key=lambda placement: placement[2])
+        # Retirer les noeuds de leurs anciennes listes (une passe par liste)
+        for parent_id in {parent_id for _, parent_id, _ in previous}:
+            self.children[parent_id] = [child_id for child_id in self.children[parent_id] if child_id not in moved]
+        # Insérer aux rangs demandés (fusion en une passe), puis ajouter les autres à la fin
+        by_parent = {}
+        for node_id, parent_id, rank in placements:
+            self._invalidate_subtree(node_id)
+            self.nodes[node_id]["parent_id"] = parent_id
+            by_parent.setdefault(parent_id, []).append((node_id, rank))
+        for parent_id, items in by_parent.items():
+            siblings = self.children.setdefault(parent_id, [])
+            merged = []
+            taken = 0
+            for node_id, rank in sorted((item for item in items if item[1] is not None), key=lambda item: item[1]):
+                take = rank - len(merged)
+                if take > 0:
+                    merged.extend(siblings[taken:taken + take])
+                    taken += take
+                merged.append(node_id)
+            merged.extend(siblings[taken:])
+            merged.extend(node_id for node_id, rank in items if rank is None)
+            self.children[parent_id] = merged
+        for node_id, parent_id, _ in previous:
+            self._notify("subtree_moved", node_id, parent_id)
+        return previous
+
+    def copy_subtree(self, node_id, new_parent_id, index=None, new_id=None):
+        """Copie le sous-arbre sous new_parent_id avec de nouveaux IDs. Retourne l'ID de la copie."""
+        if new_id is None:
+            new_id = lambda: str(uuid.uuid4())
+        id_map = {}
+        # Liste figée avant insertion : la copie peut être placée dans le sous-arbre source
+        for current_id, _ in list(self.iter_subtree(node_id)):
+            data = self.nodes[current_id]
+            if current_id == node_id:
+                parent_id, rank = new_parent_id, index
+            else:
+                parent_id, rank = id_map[data["parent_id"]], None
+            id_map[current_id] = new_id()
+            self.add_node(id_map[current_id], parent_id, data["position"], data["part_number"], data["description"], index=rank)
+        return id_map[node_id]
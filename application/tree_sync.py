@@ -0,0 +1,72 @@
+"""
+Synchronisation d'un arbre existant avec une nouvelle migration.
+
+Les lignes migrées (ID, ParentID, Position, PartNumber, Description, en ordre préfixe)
+sont comparées au modèle par ID : seules les différences sont appliquées au modèle et
+au stockage (ajouts, déplacements, modifications, suppressions, puis ordre des frères),
+chacune en une seule écriture. Avec le stockage Excel elles vont au journal, sans
+réécrire le classeur. Les IDs doivent être stables d'une migration à l'autre
+(schéma "content", voir node_ids).
+"""
+from tree_model import NODE_FIELDS
+
+
+def sync_model(model, storage, rows):
+    """Applique au modèle et au stockage la différence avec rows
+    ((id, parent_id, position, part_number, description) en ordre préfixe).
+    Retourne le nombre de noeuds ajoutés, déplacés, modifiés, supprimés et de fratries réordonnées."""
+    wanted = {}
+    children = {}
+    for row in rows:
+        wanted[row[0]] = row
+        children.setdefault(row[1], []).append(row[0])
+
+    # Ajouts (parents avant enfants), en fin de fratrie : l'ordre est rétabli à la fin
+    added = [row[0] for row in rows if row[0] not in model]
+    for node_id in added:
+        _, parent_id, position, part_number, description = wanted[node_id]
+        model.add_node(node_id, parent_id, position, part_number, description)
+    if added:
+        storage.add_nodes(model, added)
+    added_ids = set(added)
+
+    # Déplacements, en ordre préfixe : le nouveau parent est déjà à sa place, jamais sous le noeud déplacé
+    moved = []
+    for node_id, parent_id, _, _, _ in rows:
+        if node_id not in added_ids and model.parent(node_id) != parent_id:
+            model.move_subtree(node_id, parent_id)
+            moved.append(node_id)
+    if moved:
+        storage.move_nodes(model, [(node_id, None) for node_id in moved])
+
+    updated = []
+    for node_id, _, position, part_number, description in rows:
+        if node_id in added_ids:
+            continue
+        node = model.nodes[node_id]
+        if (node["position"], node["part_number"], node["description"]) != (position, part_number, description):
+            model.update_node(node_id, **dict(zip(NODE_FIELDS, (position, part_number, description))))
+            updated.append(node_id)
+    if updated:
+        storage.update_nodes(model, updated)
+
+    # Suppressions : après les déplacements, aucun noeud conservé n'est sous un noeud supprimé
+    deleted = model.top_level([node_id for node_id in model.nodes if node_id not in wanted])
+    removed = []
+    if deleted:
+        removed = model.remove_subtrees(deleted)
+        storage.delete_subtrees(deleted)
+
+    # Ordre des frères : seules les fratries différentes sont réécrites
+    placements = []
+    reordered = 0
+    for parent_id, child_ids in children.items():
+        if model.get_children(parent_id) != child_ids:
+            placements.extend((child_id, parent_id, rank) for rank, child_id in enumerate(child_ids))
+            reordered += 1
+    if placements:
+        model.place_subtrees(placements)
+        storage.move_nodes(model, [(node_id, rank) for node_id, _, rank in placements])
+
+    return {"added": len(added), "moved": len(moved), "updated": len(updated), "deleted": len(removed),
+            "reordered": reordered}
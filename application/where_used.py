@@ -0,0 +1,76 @@
+"""
+Cas d'emploi : index inverse Part Number (normalisé) -> noeuds qui l'utilisent.
+Construit au premier usage, puis tenu à jour par le modèle (ajout, import,
+modification, suppression) : une recherche ne coûte que le nombre d'occurrences.
+"""
+import re
+
+# Part number numérique relu d'Excel comme un nombre ("1234567.0")
+_FLOAT_SUFFIX = re.compile(r"^(\d+)\.0$")
+
+
+def normalize_part_number(part_number):
+    """Clé de l'index : sans casse ni espaces, et sans le ".0" d'un nombre relu d'Excel."""
+    key = "".join(str(part_number).split()).casefold()
+    match = _FLOAT_SUFFIX.match(key)
+    return match.group(1) if match else key
+
+
+class WhereUsedIndex:
+    """Part number normalisé -> IDs des noeuds (dans l'ordre d'ajout)."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._by_key = {}       # clé -> dict ordonné {node_id: None}
+        self._key_of = {}       # node_id -> clé
+        self.built = False
+
+    def build(self, model):
+        """Indexe tous les noeuds du modèle (appelé au premier usage)."""
+        self.clear()
+        for node_id, node in model.nodes.items():
+            self._add(node_id, node["part_number"])
+        self.built = True
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def _add(self, node_id, part_number):
+        key = normalize_part_number(part_number)
+        if not key:
+            return
+        self._by_key.setdefault(key, {})[node_id] = None
+        self._key_of[node_id] = key
+
+    def _remove(self, node_id):
+        key = self._key_of.pop(node_id, None)
+        if key is None:
+            return
+        node_ids = self._by_key[key]
+        del node_ids[node_id]
+        if not node_ids:
+            del self._by_key[key]
+
+    # ====== Abonnement au modèle ======
+
+    def node_added(self, model, node_id):
+        if self.built:
+            self._add(node_id, model.nodes[node_id]["part_number"])
+
+    def node_updated(self, model, node_id, old_values):
+        if self.built and old_values["part_number"] != model.nodes[node_id]["part_number"]:
+            self._remove(node_id)
+            self._add(node_id, model.nodes[node_id]["part_number"])
+
+    def subtree_removed(self, model, removed):
+        if self.built:
+            for node_id, _ in removed:
+                self._remove(node_id)
+
+    # ====== Recherche ======
+
+    def lookup(self, part_number):
+        """IDs des noeuds dont le part number (normalisé) est celui demandé."""
+        return list(self._by_key.get(normalize_part_number(part_number), ()))
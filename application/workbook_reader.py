@@ -0,0 +1,76 @@
+"""
+Lecture en flux des classeurs d'arbre (openpyxl en lecture seule).
+
+Le classeur mis en forme par l'application commence par une zone de titre (lignes 1-2) :
+l'en-tête n'est cherché que parmi les HEADER_SCAN_ROWS premières lignes (la première
+qui contient l'un des noms attendus), puis les lignes de données sont lues une seule
+fois, par paquets (migration d'un gros fichier) ou en un seul DataFrame.
+Partagé par le stockage Excel (chargement de l'application), migrate_data et generate_bom.
+"""
+from itertools import chain, islice
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# Lignes examinées pour trouver l'en-tête sous la zone de titre
+HEADER_SCAN_ROWS = 10
+# Lignes par paquet pour la lecture en flux
+CHUNK_ROWS = 50_000
+
+
+class TreeWorkbookReader:
+    """Première feuille d'un classeur, lue en flux.
+
+    - header_row : rang (à partir de 0) de la ligne d'en-tête, None si aucune ligne examinée
+      ne contient l'un des markers (les colonnes sont alors celles de la première ligne)
+    - columns : noms de colonnes (sans les colonnes vides en fin d'en-tête)
+    - empty : la feuille ne contient aucune ligne
+
+    Les cellules gardent leur valeur Python (dtype object) : un part number numérique
+    n'est pas converti en flottant par une colonne contenant des cellules vides.
+    """
+
+    def __init__(self, path, markers, scan_rows=HEADER_SCAN_ROWS):
+        self.workbook = load_workbook(path, read_only=True, data_only=True)
+        rows = self.workbook.worksheets[0].iter_rows(values_only=True)
+        head = list(islice(rows, scan_rows))
+        self.empty = not head
+        self.header_row = None
+        for i, row in enumerate(head):
+            row_values = [str(v).strip() for v in row if v is not None]
+            if any(marker in row_values for marker in markers):
+                self.header_row = i
+                break
+        start = self.header_row or 0
+        header = [str(v).strip() if v is not None else "" for v in head[start]] if head else []
+        while header and not header[-1]:
+            header.pop()
+        self.columns = header
+        self._rows = chain(head[start + 1:], rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.workbook.close()
+
+    def _frame(self, rows):
+        # Les lignes lues en flux peuvent être plus courtes ou plus longues que l'en-tête
+        df = pd.DataFrame(rows, dtype=object).reindex(columns=range(len(self.columns)))
+        df.columns = self.columns
+        return df
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        """Lignes de données par DataFrames d'au plus chunk_rows lignes."""
+        while True:
+            rows = list(islice(self._rows, chunk_rows))
+            if not rows:
+                return
+            yield self._frame(rows)
+
+    def read(self):
+        """Toutes les lignes de données restantes en un DataFrame."""
+        return self._frame(list(self._rows))
@@ -2,11 +2,22 @@
 Script pour générer un BOM (Bill of Materials) en croisant les données
 de l'arborescence (tree_data.xlsx) avec les autres fichiers Excel.
 """
+import argparse
+import glob
 import pandas as pd
 import os
+import sys
 from openpyxl import load_workbook
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 
+# Modules partagés avec l'application (journal de performance, lecture des classeurs d'arbre)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "application"))
+import perf_log
+from perf_log import timed
+from workbook_reader import TreeWorkbookReader
+from cross_reference import consumption_by_key, references_by_key, enrich_bom, QUANTITY_COLUMN, REFERENCES_COLUMN
+from rollup import rollup_frame
+
 # Chemins des fichiers
 BASE_PATH = r"c:\Users\Administrateur\Desktop\PFE"
 
@@ -17,6 +28,9 @@ PMP_PLF_FILE = os.path.join(BASE_PATH, "PMP Condit PLF 2021 (1).xlsx")
 CONSOMATION_FILE = os.path.join(BASE_PATH, "CL_EXPORT_ETAT_CONSOMATION3060118986151578542 (1).xls")
 LISTE_CONTROLE_FILE = os.path.join(BASE_PATH, "LISTE DE CONTRÔLE DISPOSITIF DE SECURITE (1).xlsx")
 
+# Exports de consommation : toutes les périodes présentes dans le dossier sont cumulées
+CONSOMATION_PATTERN = os.path.join(BASE_PATH, "CL_EXPORT_ETAT_CONSOMATION*.xls*")
+
 # Fichier de sortie BOM
 BOM_OUTPUT_FILE = os.path.join(BASE_PATH, "bom_output.xlsx")
 
@@ -72,133 +86,183 @@ def load_tree_data():
         print(f"ERREUR: {TREE_DATA_FILE} n'existe pas")
         return None
     
-    df = pd.read_excel(TREE_DATA_FILE)
+    # Le classeur mis en forme commence par une zone de titre : l'en-tête est cherché
+    # dans les premières lignes, puis les données sont lues une seule fois
+    with TreeWorkbookReader(TREE_DATA_FILE, ["Position", "PartNumber", "ID"]) as reader:
+        if reader.header_row:
+            print(f"En-tête trouvé à la ligne {reader.header_row + 1}")
+        df = reader.read()
     print(f"\nArborescence chargée: {df.shape[0]} lignes, {df.shape[1]} colonnes")
     print(f"Colonnes: {list(df.columns)}")
     return df
 
 def load_source_files():
-    """Charge tous les fichiers sources pour le croisement"""
+    """Charge tous les fichiers sources pour le croisement.
+    PMP et liste de contrôle : toutes les feuilles ({nom de feuille: DataFrame}) ;
+    consommation : tous les exports du dossier, concaténés."""
     sources = {}
     
-    # PMP 2022
-    if os.path.exists(PMP_2022_FILE):
-        try:
-            sources['pmp_2022'] = pd.read_excel(PMP_2022_FILE)
-            print(f"PMP 2022 chargé: {sources['pmp_2022'].shape}")
-        except Exception as e:
-            print(f"Erreur PMP 2022: {e}")
-    
-    # PMP PLF 2021
-    if os.path.exists(PMP_PLF_FILE):
-        try:
-            sources['pmp_plf'] = pd.read_excel(PMP_PLF_FILE)
-            print(f"PMP PLF chargé: {sources['pmp_plf'].shape}")
-        except Exception as e:
-            print(f"Erreur PMP PLF: {e}")
-    
-    # Consommation
-    if os.path.exists(CONSOMATION_FILE):
-        try:
-            sources['consommation'] = pd.read_excel(CONSOMATION_FILE)
-            print(f"Consommation chargé: {sources['consommation'].shape}")
-        except Exception as e:
-            print(f"Erreur Consommation: {e}")
+    # PMP 2022, PMP PLF 2021, Liste Contrôle (feuilles libres : toutes sont lues)
+    for key, name, path in (('pmp_2022', "PMP 2022", PMP_2022_FILE),
+                            ('pmp_plf', "PMP PLF", PMP_PLF_FILE),
+                            ('liste_controle', "Liste Contrôle", LISTE_CONTROLE_FILE)):
+        if os.path.exists(path):
+            try:
+                sources[key] = pd.read_excel(path, sheet_name=None)
+                print(f"{name} chargé: {len(sources[key])} feuille(s), {source_rows(sources[key])} lignes")
+            except ImportError as e:
+                # Les anciens classeurs .xls demandent xlrd (voir application/requirements.txt)
+                print(f"ATTENTION: {name} ignoré ({os.path.basename(path)}) : {e}")
+            except Exception as e:
+                print(f"Erreur {name}: {e}")
     
-    # Liste Contrôle
-    if os.path.exists(LISTE_CONTROLE_FILE):
+    # Consommation (une ou plusieurs périodes)
+    consumption_files = sorted(set(glob.glob(CONSOMATION_PATTERN)) | ({CONSOMATION_FILE} if os.path.exists(CONSOMATION_FILE) else set()))
+    frames = []
+    for path in consumption_files:
         try:
-            sources['liste_controle'] = pd.read_excel(LISTE_CONTROLE_FILE)
-            print(f"Liste Contrôle chargé: {sources['liste_controle'].shape}")
+            frames.append(pd.read_excel(path))
+        except ImportError as e:
+            print(f"ATTENTION: Consommation ignorée ({os.path.basename(path)}) : {e}")
         except Exception as e:
-            print(f"Erreur Liste Contrôle: {e}")
+            print(f"Erreur Consommation ({os.path.basename(path)}): {e}")
+    if frames:
+        sources['consommation'] = pd.concat(frames, ignore_index=True)
+        print(f"Consommation chargé: {sources['consommation'].shape} ({len(frames)} fichier(s))")
     
     return sources
 
+def source_rows(source):
+    """Nombre de lignes d'une source (DataFrame, ou dictionnaire de feuilles)."""
+    if isinstance(source, dict):
+        return sum(len(df) for df in source.values())
+    return len(source)
+
 def generate_bom(tree_df, sources):
     """
-    Génère le BOM en croisant l'arborescence avec les sources.
+    Génère le BOM en croisant l'arborescence avec les sources (voir application/cross_reference.py) :
+    PU moyen, quantité et valeur consommées, nombre de sorties et références de maintenance
+    de chaque noeud, par jointure sur le part number normalisé ; puis quantité et valeur
+    cumulées de chaque ensemble (articles distincts du sous-arbre), voir application/rollup.py.
     """
     if tree_df is None:
         return None
+    if "PartNumber" not in tree_df.columns:
+        print("ERREUR: colonne PartNumber absente de l'arborescence, BOM sans croisement")
+        return tree_df.copy()
     
-    bom_df = tree_df.copy()
-    
-    # TODO: Implémenter la logique de croisement basée sur l'analyse des fichiers
-    # Pour l'instant, on retourne l'arborescence telle quelle
+    # Une table indexée par part number et par source, construite une seule fois
+    with timed("consumption_index") as stage:
+        consumption = consumption_by_key(sources.get('consommation'))
+        stage.rows = len(consumption)
+    with timed("references_index") as stage:
+        sheets = [(f"{name} / {sheet}", df)
+                  for key, name in (('pmp_2022', "PMP 2022"), ('pmp_plf', "PMP PLF"), ('liste_controle', "Liste Contrôle"))
+                  for sheet, df in sources.get(key, {}).items()]
+        references = references_by_key(sheets)
+        stage.rows = len(references)
+    with timed("join", rows=len(tree_df)):
+        bom_df = enrich_bom(tree_df, consumption, references)
+    if {"ID", "ParentID"} <= set(tree_df.columns):
+        # Un seul parcours postfixe de l'arbre (colonnes ID / ParentID)
+        with timed("rollup", rows=len(tree_df)):
+            bom_df = bom_df.assign(**rollup_frame(tree_df, consumption))
+    else:
+        print("Attention: colonnes ID / ParentID absentes, pas de cumul par sous-arbre")
     
+    print(f"\nCroisement: {bom_df[QUANTITY_COLUMN].notna().sum()} noeud(s) avec consommation, "
+          f"{bom_df[REFERENCES_COLUMN].notna().sum()} avec références maintenance (sur {len(bom_df)})")
     return bom_df
 
 def save_bom_with_formatting(bom_df, output_path):
     """
     Sauvegarde le BOM avec le même design que tree_data.xlsx
     """
-    # Sauvegarder d'abord sans mise en forme
-    bom_df.to_excel(output_path, index=False)
-    
-    # Appliquer la mise en forme
-    wb = load_workbook(output_path)
-    ws = wb.active
-    
-    # Style pour l'en-tête
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    # Bordures
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    with timed("to_excel", rows=len(bom_df)):
+        # Sauvegarder d'abord sans mise en forme
+        bom_df.to_excel(output_path, index=False)
+
+    with timed("load_workbook"):
+        # Appliquer la mise en forme
+        wb = load_workbook(output_path)
+        ws = wb.active
+
+    with timed("styles"):
+        # Style pour l'en-tête
+        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        header_font = Font(bold=True, color="FFFFFF")
     
-    # Appliquer le style à l'en-tête
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = thin_border
+        # Bordures
+        thin_border = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
     
-    # Appliquer les bordures à toutes les cellules
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-        for cell in row:
+        # Appliquer le style à l'en-tête
+        for cell in ws[1]:
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = Alignment(horizontal='center')
             cell.border = thin_border
     
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    wb.save(output_path)
+        # Appliquer les bordures à toutes les cellules
+        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
+            for cell in row:
+                cell.border = thin_border
+
+    with timed("column_widths"):
+        # Ajuster la largeur des colonnes
+        for column in ws.columns:
+            max_length = 0
+            column_letter = column[0].column_letter
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = min(max_length + 2, 50)
+            ws.column_dimensions[column_letter].width = adjusted_width
+
+    with timed("wb.save"):
+        wb.save(output_path)
     print(f"\nBOM sauvegardé dans: {output_path}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération du BOM")
+    perf_log.add_arguments(parser)
+    perf_log.apply_arguments(parser.parse_args())
+
     print("="*60)
     print("GÉNÉRATION DU BOM - ANALYSE DES FICHIERS")
     print("="*60)
     
-    # Étape 1: Analyser tous les fichiers
-    analyze_all_files()
-    
-    # Étape 2: Charger l'arborescence
-    tree_df = load_tree_data()
-    
-    # Étape 3: Charger les sources
-    sources = load_source_files()
-    
-    # Étape 4: Générer le BOM
-    if tree_df is not None:
-        bom_df = generate_bom(tree_df, sources)
-        if bom_df is not None:
-            save_bom_with_formatting(bom_df, BOM_OUTPUT_FILE)
+    # Durées, lignes et mémoire de chaque étape : application/perf_log.jsonl
+    with timed("generate_bom"):
+        # Étape 1: Analyser tous les fichiers
+        with timed("analyze_all_files"):
+            analyze_all_files()
+        
+        # Étape 2: Charger l'arborescence
+        with timed("load_tree_data") as stage:
+            tree_df = load_tree_data()
+            stage.rows = None if tree_df is None else len(tree_df)
+        
+        # Étape 3: Charger les sources
+        with timed("load_source_files") as stage:
+            sources = load_source_files()
+            stage.rows = sum(source_rows(source) for source in sources.values())
+        
+        # Étape 4: Générer le BOM
+        if tree_df is not None:
+            with timed("merge") as stage:
+                bom_df = generate_bom(tree_df, sources)
+                stage.rows = None if bom_df is None else len(bom_df)
+            if bom_df is not None:
+                with timed("save_bom_with_formatting", rows=len(bom_df)):
+                    save_bom_with_formatting(bom_df, BOM_OUTPUT_FILE)
     
     print("\n" + "="*60)
     print("FIN DU SCRIPT")
@@ -1,105 +1,250 @@
 """
 Script de migration des données tree_data.xlsx vers tree_data_internal.xlsx
 Ce script reconstruit la hiérarchie parent/enfant à partir du niveau de chaque ligne.
+
+La feuille est lue en flux (workbook_reader, openpyxl en lecture seule) par paquets de CHUNK_ROWS lignes :
+niveaux et parents sont calculés par colonnes entières (numpy), et seule une table
+"dernière ligne vue à chaque niveau" passe d'un paquet au suivant. La mémoire reste
+bornée par la taille d'un paquet, même pour un export d'un million de lignes.
+
+IDs : uuid4 par défaut, ou dérivés du contenu (id_scheme="content", voir application/node_ids.py) :
+la même source redonne alors les mêmes IDs, et sync() n'applique à un arbre existant
+(classeur interne + journal, ou base .db) que la différence.
 """
 import pandas as pd
-import uuid
+import numpy as np
 import os
+import sys
+from openpyxl import Workbook
+
+# Modules de l'application (IDs, stockage)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "application"))
+from node_ids import RANDOM, CONTENT, content_id
+from bulk_import import new_node_ids
+from workbook_reader import TreeWorkbookReader, CHUNK_ROWS
 
 # Fichiers
 SOURCE_FILE = "tree_data.xlsx"
 TARGET_FILE = "tree_data_internal.xlsx"
 
-def migrate():
-    if not os.path.exists(SOURCE_FILE):
-        print(f"Erreur: Le fichier {SOURCE_FILE} n'existe pas.")
-        return
-    
-    print(f"Lecture de {SOURCE_FILE}...")
-    df = pd.read_excel(SOURCE_FILE)
-    
-    # Ignorer les lignes d'en-tête si le fichier a une zone de titre
-    # Chercher la ligne qui contient "Position" ou "PartNumber"
-    header_row = None
-    for i, row in df.iterrows():
-        row_values = [str(v).strip() for v in row.values if pd.notna(v)]
-        if "Position" in row_values or "PartNumber" in row_values:
-            header_row = i
-            break
-    
-    if header_row is not None and header_row > 0:
-        print(f"En-tête trouvé à la ligne {header_row}, réajustement...")
-        df.columns = df.iloc[header_row]
-        df = df.iloc[header_row + 1:].reset_index(drop=True)
+REQUIRED_COLUMNS = ["Position", "PartNumber", "Description"]
+OUTPUT_COLUMNS = ["ID", "ParentID", "Position", "PartNumber", "Description", "Niveau"]
+
+
+# ====== Conversion des colonnes ======
+
+def text_column(values):
+    """Colonne de cellules -> chaînes ("" pour une cellule vide)."""
+    return values.where(values.notna(), "").astype(str)
+
+
+def chunk_levels(df, positions):
+    """Niveau de chaque ligne : colonne Niveau si renseignée, sinon le nombre de points
+    de la position (ex: 1, 1.1, 1.1.1)."""
+    levels = positions.str.count(r"\.").astype(float)
+    if "Niveau" in df.columns:
+        niveau = pd.to_numeric(df["Niveau"], errors="coerce")
+        levels = niveau.where(niveau.notna(), levels)
+    return np.trunc(levels.to_numpy(dtype=float)).astype(np.int64)
+
+
+# ====== Reconstruction des parents ======
+
+class LevelTable:
+    """Dernière ligne vue à chaque niveau, conservée d'un paquet à l'autre.
+
+    Le parent d'une ligne de niveau L > 0 est la ligne précédente la plus proche de niveau
+    inférieur à L : c'est, parmi les niveaux inférieurs à L, la dernière ligne vue au plus
+    grand rang. Un niveau 0 est une racine.
+    """
+
+    def __init__(self):
+        self.last_rank = {}     # niveau -> rang global de la dernière ligne vue
+        self.open_ids = {}      # rang -> ID des lignes de last_rank (parents possibles des paquets suivants)
+        self.count = 0          # lignes déjà traitées
+
+    def parent_ranks(self, levels):
+        """Rang global du parent de chaque ligne du paquet (-1 : racine) ; met la table à jour."""
+        n = len(levels)
+        parent_rank = np.full(n, -1, dtype=np.int64)
+        if not n:
+            return parent_rank
+        ranks = np.arange(self.count, self.count + n)
+        # Rang de la dernière ligne vue avant chaque ligne, tous niveaux déjà parcourus confondus
+        below = np.full(n, -1, dtype=np.int64)
+        for level in sorted(set(np.unique(levels).tolist()) | set(self.last_rank)):
+            at_level = levels == level
+            if level > 0:
+                parent_rank[at_level] = below[at_level]
+            # Dernière ligne de ce niveau strictement avant chaque ligne (le paquet précédent compris)
+            seen = np.where(at_level, ranks, -1)
+            last = np.maximum.accumulate(np.concatenate(([self.last_rank.get(level, -1)], seen[:-1])))
+            np.maximum(below, last, out=below)
+            if at_level.any():
+                self.last_rank[level] = int(ranks[np.flatnonzero(at_level)[-1]])
+        return parent_rank
+
+    def assign_ids(self, levels, parent_rank, new_ids):
+        """IDs et ParentID ("" pour une racine) des lignes du paquet. Les niveaux sont traités du plus
+        haut au plus profond : new_ids(parents, index) reçoit les ParentID des lignes index, déjà connus."""
+        n = len(levels)
+        ids = np.empty(n, dtype=object)
+        parents = np.full(n, "", dtype=object)
+        for level in np.unique(levels).tolist():
+            index = np.flatnonzero(levels == level)
+            if level > 0:
+                ranks = parent_rank[index]
+                inside = ranks >= self.count
+                parents[index[inside]] = ids[ranks[inside] - self.count]
+                before = (ranks >= 0) & ~inside
+                if before.any():
+                    parents[index[before]] = [self.open_ids[rank] for rank in ranks[before].tolist()]
+            ids[index] = new_ids(parents[index], index)
+        self.open_ids = {rank: (ids[rank - self.count] if rank >= self.count else self.open_ids[rank])
+                         for rank in self.last_rank.values()}
+        self.count += n
+        return ids, parents
+
+
+class ContentIds:
+    """IDs dérivés du contenu : le rang d'occurrence de chaque (parent, position, part number), dans
+    l'ordre des lignes, distingue les frères identiques. Seuls les compteurs des parents encore
+    ouverts sont gardés d'un paquet à l'autre."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def occurrences(self, parent_rank, positions, part_numbers):
+        result = []
+        for key in zip(parent_rank.tolist(), positions, part_numbers):
+            occurrence = self.counts.get(key, 0)
+            self.counts[key] = occurrence + 1
+            result.append(occurrence)
+        return result
+
+    def prune(self, open_ranks):
+        self.counts = {key: count for key, count in self.counts.items() if key[0] < 0 or key[0] in open_ranks}
+
+
+def migrated_chunks(reader, chunk_rows=CHUNK_ROWS, id_scheme=RANDOM):
+    """Migre les lignes du classeur paquet par paquet. Génère (lignes lues, lignes migrées), une ligne
+    migrée étant (ID, ParentID, Position, PartNumber, Description, Niveau)."""
+    table = LevelTable()
+    content_ids = ContentIds() if id_scheme == CONTENT else None
+    for df in reader.chunks(chunk_rows):
+        positions = text_column(df["Position"])
+        part_numbers = text_column(df["PartNumber"])
+        descriptions = text_column(df["Description"])
+        levels = chunk_levels(df, positions)
+        
+        # Ignorer les lignes vides
+        keep = (part_numbers.str.strip() != "").to_numpy()
+        levels = levels[keep]
+        positions = positions[keep].tolist()
+        part_numbers = part_numbers[keep].tolist()
+        # Un niveau négatif est une racine, comme le niveau 0 (il reste écrit tel quel)
+        tree_levels = np.maximum(levels, 0)
+        parent_rank = table.parent_ranks(tree_levels)
+        if content_ids is None:
+            ids, parents = table.assign_ids(tree_levels, parent_rank, lambda parents, index: new_node_ids(len(index)))
+        else:
+            occurrences = content_ids.occurrences(parent_rank, positions, part_numbers)
+            content_ids.prune(set(table.last_rank.values()))
+            ids, parents = table.assign_ids(tree_levels, parent_rank, lambda parents, index: [
+                content_id(parent_id, positions[i], part_numbers[i], occurrences[i]) for parent_id, i in zip(parents, index)])
+        yield len(df), list(zip(ids.tolist(), parents.tolist(), positions, part_numbers,
+                                descriptions[keep].tolist(), levels.tolist()))
+
+
+# ====== Migration ======
+
+def open_source(source_file):
+    """Ouvre source_file en flux. Retourne le lecteur, positionné après l'en-tête,
+    ou None (message affiché) si le fichier ou une colonne requise manque."""
+    if not os.path.exists(source_file):
+        print(f"Erreur: Le fichier {source_file} n'existe pas.")
+        return None
     
-    print(f"Colonnes trouvées: {list(df.columns)}")
-    print(f"Nombre de lignes: {len(df)}")
+    print(f"Lecture de {source_file}...")
+    # Ignorer les lignes de titre : l'en-tête est la première ligne contenant "Position" ou "PartNumber"
+    reader = TreeWorkbookReader(source_file, ["Position", "PartNumber"])
+    if reader.header_row:
+        print(f"En-tête trouvé à la ligne {reader.header_row + 1}, réajustement...")
+    print(f"Colonnes trouvées: {reader.columns}")
     
     # Vérifier les colonnes requises
-    required_cols = ["Position", "PartNumber", "Description"]
-    has_niveau = "Niveau" in df.columns
-    
-    for col in required_cols:
-        if col not in df.columns:
+    for col in REQUIRED_COLUMNS:
+        if col not in reader.columns:
             print(f"Erreur: Colonne '{col}' manquante.")
-            return
-    
-    # Construire les données avec ID et ParentID
-    result = []
-    parent_stack = []  # Liste de tuples (niveau, id)
-    
-    for i, row in df.iterrows():
-        position = str(row["Position"]) if pd.notna(row["Position"]) else ""
-        part_number = str(row["PartNumber"]) if pd.notna(row["PartNumber"]) else ""
-        description = str(row["Description"]) if pd.notna(row["Description"]) else ""
-        
-        # Déterminer le niveau
-        if has_niveau and pd.notna(row["Niveau"]):
-            niveau = int(row["Niveau"])
-        else:
-            # Estimer le niveau par l'indentation de la position (ex: 1, 1.1, 1.1.1)
-            niveau = position.count('.') if position else 0
-        
-        # Ignorer les lignes vides
-        if not part_number.strip():
-            continue
-        
-        # Générer un nouvel ID
-        new_id = str(uuid.uuid4())
-        
-        # Trouver le parent
-        parent_id = ""
-        if niveau > 0:
-            # Chercher le dernier élément avec un niveau inférieur
-            while parent_stack and parent_stack[-1][0] >= niveau:
-                parent_stack.pop()
-            if parent_stack:
-                parent_id = parent_stack[-1][1]
-        else:
-            # Niveau 0 = racine, vider la pile
-            parent_stack = []
-        
-        # Ajouter à la pile des parents potentiels
-        parent_stack.append((niveau, new_id))
-        
-        result.append({
-            "ID": new_id,
-            "ParentID": parent_id,
-            "Position": position,
-            "PartNumber": part_number,
-            "Description": description,
-            "Niveau": niveau
-        })
+            reader.close()
+            return None
+    return reader
+
+
+def migrate(source_file=SOURCE_FILE, target_file=TARGET_FILE, chunk_rows=CHUNK_ROWS, id_scheme=RANDOM):
+    """Migre source_file vers target_file. Retourne le nombre d'éléments migrés (None en cas d'erreur)."""
+    reader = open_source(source_file)
+    if reader is None:
+        return
     
-    # Créer le DataFrame résultat
-    df_result = pd.DataFrame(result, columns=["ID", "ParentID", "Position", "PartNumber", "Description", "Niveau"])
+    # Le classeur résultat est écrit au fil des paquets
+    target = Workbook(write_only=True)
+    sheet = target.create_sheet("Sheet1")
+    sheet.append(OUTPUT_COLUMNS)
+    read_count = 0
+    count = 0
+    with reader:
+        for chunk_read, migrated in migrated_chunks(reader, chunk_rows, id_scheme):
+            read_count += chunk_read
+            count += len(migrated)
+            for row in migrated:
+                sheet.append(row)
     
     # Sauvegarder
-    df_result.to_excel(TARGET_FILE, index=False)
+    target.save(target_file)
+    print(f"Nombre de lignes lues: {read_count}")
     print(f"\n✅ Migration réussie!")
-    print(f"   • {len(result)} éléments migrés")
-    print(f"   • Fichier créé: {TARGET_FILE}")
+    print(f"   • {count} éléments migrés")
+    print(f"   • Fichier créé: {target_file}")
     print(f"\nVous pouvez maintenant lancer l'application avec run_app.bat")
+    return count
+
+
+def sync(source_file=SOURCE_FILE, target_file=TARGET_FILE, chunk_rows=CHUNK_ROWS):
+    """Migre source_file avec des IDs dérivés du contenu et n'applique que la différence à target_file :
+    classeur interne (modifications ajoutées à son journal) ou base SQLite (.db).
+    Sans classeur cible existant, équivaut à migrate(..., id_scheme="content").
+    Retourne le nombre de noeuds ajoutés, déplacés, modifiés, supprimés et de fratries réordonnées
+    (None en cas d'erreur)."""
+    is_database = target_file.lower().endswith(".db")
+    if not os.path.exists(target_file) and not is_database:
+        count = migrate(source_file, target_file, chunk_rows, CONTENT)
+        if count is None:
+            return
+        return {"added": count, "moved": 0, "updated": 0, "deleted": 0, "reordered": 0}
+    
+    from storage import ExcelStorage, SQLiteStorage
+    from tree_sync import sync_model
+    
+    reader = open_source(source_file)
+    if reader is None:
+        return
+    with reader:
+        migrated = [row[:5] for _, chunk in migrated_chunks(reader, chunk_rows, CONTENT) for row in chunk]
+    
+    storage = SQLiteStorage(target_file) if is_database else ExcelStorage(target_file)
+    try:
+        model, _ = storage.load()
+        if len(model) and not any(row[0] in model for row in migrated):
+            print("Attention: aucun ID commun, la cible n'a pas été migrée avec des IDs dérivés du contenu "
+                  "(tout est remplacé).")
+        changes = sync_model(model, storage, migrated)
+    finally:
+        storage.close()
+    print(f"\n✅ Synchronisation réussie ({target_file})")
+    print(f"   • {changes['added']} ajouté(s), {changes['moved']} déplacé(s), {changes['updated']} modifié(s), "
+          f"{changes['deleted']} supprimé(s), {changes['reordered']} fratrie(s) réordonnée(s)")
+    return changes
 
 if __name__ == "__main__":
     migrate()
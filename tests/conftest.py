@@ -0,0 +1,65 @@
+"""
+Configuration commune des tests.
+Les modules de l'application s'importent à plat (comme depuis application/), de même
+que les scripts de la racine (migrate_data, generate_bom). Le journal de performance
+(perf_log) est désactivé.
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "application"))
+sys.path.insert(0, ROOT)
+
+import perf_log  # noqa: E402
+from storage import ExcelStorage, SQLiteStorage  # noqa: E402
+from tree_model import TreeModel  # noqa: E402
+
+perf_log.configure(log_file="")
+
+
+def tree_frame(rows):
+    """DataFrame d'arbre (ID, ParentID, Position, PartNumber, Description) depuis des tuples."""
+    return pd.DataFrame(rows, columns=["ID", "ParentID", "Position", "PartNumber", "Description"])
+
+
+# R1
+# ├── A (A1, A2)
+# └── B
+# R2
+SAMPLE_ROWS = [
+    ("R1", "", "1", "100-0001", "Racine 1"),
+    ("A", "R1", "10", "200-0001", "Ensemble A"),
+    ("A1", "A", "11", "300-0001", "Pièce A1"),
+    ("A2", "A", "12", "300-0002", ""),
+    ("B", "R1", "20", "200-0002", "Ensemble B"),
+    ("R2", "", "2", "100-0002", "Racine 2"),
+]
+
+
+@pytest.fixture
+def sample_model():
+    model, _ = TreeModel.from_dataframe(tree_frame(SAMPLE_ROWS))
+    return model
+
+
+def sample_storage(backend, tmp_path):
+    """Stockage ("sqlite" ou "excel") initialisé avec SAMPLE_ROWS."""
+    if backend == "excel":
+        excel_path = str(tmp_path / "arbre.xlsx")
+        tree_frame(SAMPLE_ROWS).to_excel(excel_path, index=False)
+        return ExcelStorage(excel_path)
+    model, _ = TreeModel.from_dataframe(tree_frame(SAMPLE_ROWS))
+    storage = SQLiteStorage(str(tmp_path / "arbre.db"))
+    storage.add_nodes(model, [node_id for node_id, _ in model.walk()])
+    return storage
+
+
+def snapshot(model):
+    """État comparable d'un modèle : (id, parent, niveau, champs) en ordre préfixe."""
+    return [(node_id, model.nodes[node_id]["parent_id"], level, model.nodes[node_id]["position"],
+             model.nodes[node_id]["part_number"], model.nodes[node_id]["description"])
+            for node_id, level in model.walk()]
@@ -0,0 +1,58 @@
+"""Nomenclature synthétique et suite de mesures (sur un petit arbre)."""
+import hashlib
+import json
+import os
+
+import pytest
+
+import benchmark
+from bulk_import import DEFAULT_LAYOUT, parse_fixed_width
+from tree_model import TreeModel
+
+
+def test_synthetic_bom_shape():
+    df = benchmark.synthetic_bom(500, depth=4, fan_out=3, seed=1)
+    assert len(df) == 500 and df["ID"].is_unique
+    assert df.equals(benchmark.synthetic_bom(500, depth=4, fan_out=3, seed=1))
+    model, _ = TreeModel.from_dataframe(df)
+    assert len(model) == 500
+    assert max(level for _, level in model.walk()) == 3
+
+
+def test_synthetic_orphans_are_reported():
+    df = benchmark.synthetic_bom(300, orphan_rate=0.1, seed=2)
+    orphans = df["ParentID"].str.startswith("ORPHELIN-").sum()
+    assert orphans > 0
+    model, _ = TreeModel.from_dataframe(df)
+    assert len(model) == 300
+
+
+def test_level_rows_follow_the_tree():
+    df = benchmark.synthetic_bom(200, seed=3)
+    levels = benchmark.level_rows(df)
+    model, _ = TreeModel.from_dataframe(df)
+    assert levels["Niveau"].tolist() == [level for _, level in model.walk()]
+
+
+def test_fixed_width_text_matches_the_default_layout():
+    rows, rejects = parse_fixed_width(benchmark.fixed_width_text(300), DEFAULT_LAYOUT)
+    assert len(rows) == 300 and rejects == []
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "excel"])
+def test_run_all_benchmarks(tmp_path, backend):
+    workbook = os.path.join(benchmark.PROJECT_DIR, "application", "tree_data_internal copy.xlsx")
+    before = file_digest(workbook) if os.path.exists(workbook) else None
+    output = str(tmp_path / "resultats.json")
+    benchmark.main(["--nodes", "80", "--backend", backend, "--import-lines", "25", "--output", output])
+    with open(output, encoding="utf-8") as f:
+        report = json.load(f)
+    assert [result["benchmark"] for result in report["results"]] == list(benchmark.BENCHMARKS)
+    assert all(result["seconds"] >= 0 for result in report["results"])
+    # Les mesures travaillent dans un dossier temporaire : le classeur de l'application n'est pas modifié
+    assert (file_digest(workbook) if os.path.exists(workbook) else None) == before
@@ -0,0 +1,111 @@
+"""Fil d'Ariane : liens réutilisés d'une sélection à l'autre, sélections rapprochées regroupées."""
+import pytest
+
+import tree_app
+from benchmark import headless_app
+from conftest import sample_storage
+
+
+class FakeLabel:
+    """Label Tk factice : texte et visibilité."""
+    created = 0
+
+    def __init__(self, master=None, text="", **kw):
+        FakeLabel.created += 1
+        self.text = text
+        self.packed = False
+        self.bindings = {}
+
+    def config(self, text=None, **kw):
+        if text is not None:
+            self.text = text
+
+    def pack(self, **kw):
+        self.packed = True
+
+    def pack_forget(self):
+        self.packed = False
+
+    def bind(self, event, callback):
+        self.bindings[event] = callback
+
+
+class FakeRoot:
+    """Racine Tk dont les rappels différés sont gardés pour être exécutés par le test."""
+
+    def __init__(self):
+        self.pending = {}
+        self.cancelled = []
+
+    def after(self, delay, callback=None, *args):
+        after_id = f"after#{len(self.pending) + len(self.cancelled)}"
+        self.pending[after_id] = callback
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.cancelled.append(self.pending.pop(after_id))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(tree_app.tk, "Label", FakeLabel)
+    FakeLabel.created = 0
+    storage = sample_storage("sqlite", tmp_path)
+    app = headless_app(storage, str(tmp_path / "arbre.xlsx"))
+    # Les vraies méthodes du fil d'Ariane, sur des widgets factices
+    del app.update_breadcrumb, app.clear_breadcrumb
+    app.breadcrumb_frame = None
+    app.breadcrumb_placeholder = FakeLabel()
+    app.breadcrumb_slots = []
+    app.breadcrumb_path = ()
+    app.load_data()
+    yield app
+    storage.close()
+
+
+def shown(app):
+    return [(slot[0].text, slot[1].packed) for slot in app.breadcrumb_slots if slot[0].packed]
+
+
+def test_labels_are_reused(app):
+    app.update_breadcrumb("A1")
+    assert shown(app) == [("Pièce A1", True), ("Ensemble A", True), ("Racine 1", False)]
+    created = FakeLabel.created
+    # A2 sans description : le part number est affiché
+    app.update_breadcrumb("A2")
+    assert shown(app) == [("300-0002", True), ("Ensemble A", True), ("Racine 1", False)]
+    app.update_breadcrumb("R2")
+    assert shown(app) == [("Racine 2", False)]
+    app.update_breadcrumb("B")
+    assert FakeLabel.created == created
+    assert not app.breadcrumb_placeholder.packed
+
+
+def test_click_reads_the_current_path(app, monkeypatch):
+    visited = []
+    monkeypatch.setattr(app, "navigate_to_node", visited.append, raising=False)
+    app.update_breadcrumb("A1")
+    app.update_breadcrumb("B")
+    # Le lien n° 1 a été créé pour A1 ; il mène maintenant au parent de B
+    app.breadcrumb_slots[1][0].bindings["<Button-1>"](None)
+    assert visited == ["R1"]
+
+
+def test_clear(app):
+    app.update_breadcrumb("A1")
+    app.clear_breadcrumb()
+    assert shown(app) == [] and app.breadcrumb_placeholder.packed
+
+
+def test_close_selections_render_once(app, monkeypatch):
+    app.root = FakeRoot()
+    app._select_after_id = None
+    rendered = []
+    monkeypatch.setattr(app, "render_selection", lambda: rendered.append(app.tree.selection()), raising=False)
+    for node_id in ["R1", "A", "A1", "A2"]:
+        app.tree.selection_set([node_id])
+        app.on_tree_select()
+    assert len(app.root.cancelled) == 3
+    [callback] = app.root.pending.values()
+    callback()
+    assert rendered == [("A2",)]
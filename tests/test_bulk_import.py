@@ -0,0 +1,151 @@
+"""Import en masse : découpage à largeur fixe, rejets, ajout en un seul lot."""
+import random
+import uuid
+
+import pytest
+
+import bulk_import
+from bulk_import import (DEFAULT_LAYOUT, ColumnLayout, blank_profile, column_spans, detect_layout, new_node_ids,
+                         parse_fixed_width)
+from storage import SQLiteStorage
+from tree_core import TreeCore
+
+# Position 0-3, Part Number 4-16, Description à partir de 19, arrêt au "."
+DUMP = "\n".join([
+    "010 315105-0153    Vis à tête. Qté 4",
+    "",
+    "020 315105-0160    Rondelle",
+    "030",
+    "040                Sans part number",
+    "    900-1          Sans position  ",
+])
+
+
+def test_parse_rows_and_rejects():
+    rows, rejects = parse_fixed_width(DUMP, DEFAULT_LAYOUT)
+    assert [tuple(row) for row in rows] == [
+        (1, "010", "315105-0153", "Vis à tête"),
+        (3, "020", "315105-0160", "Rondelle"),
+        (6, "", "900-1", "Sans position"),
+    ]
+    # Lignes vides ignorées ; numéros de ligne du texte collé
+    assert [(reject.line_no, reject.reason) for reject in rejects] == [
+        (4, "ligne trop courte (pas de Part Number)"),
+        (5, "Part Number vide"),
+    ]
+    assert rejects[0].text == "030"
+
+
+def test_without_stop_char_the_description_runs_to_the_end():
+    layout = DEFAULT_LAYOUT._replace(stop_char="")
+    rows, _ = parse_fixed_width(DUMP, layout)
+    assert rows[0].description == "Vis à tête. Qté 4"
+
+
+def test_empty_text():
+    assert parse_fixed_width("\n  \n", DEFAULT_LAYOUT) == ([], [])
+
+
+@pytest.mark.parametrize("stop_char", [".", ""])
+def test_highlighted_spans_match_the_parsed_fields(stop_char):
+    layout = DEFAULT_LAYOUT._replace(stop_char=stop_char)
+    rows, _ = parse_fixed_width(DUMP, layout)
+    lines = DUMP.split("\n")
+    for row in rows:
+        line = lines[row.line_no - 1]
+        spans = {tag: line[start:end].strip() for tag, start, end in column_spans(line, layout)}
+        assert (spans.get("pos", ""), spans["pn"], spans.get("desc", "")) == (row.position, row.part_number, row.description)
+    assert column_spans("   ", layout) == []
+    assert [tag for tag, _, _ in column_spans("030", layout)] == ["pos"]
+
+
+def naive_profile(lines):
+    width = min(max(len(line) for line in lines), bulk_import.DETECT_MAX_WIDTH)
+    blanks = [sum(1 for line in lines if col >= len(line) or line[col] in " \t") for col in range(width)]
+    digits = [sum(1 for line in lines if col < len(line) and line[col].isdigit()) for col in range(width)]
+    return blanks, digits
+
+
+def test_blank_profile_across_chunks(monkeypatch):
+    monkeypatch.setattr(bulk_import, "DETECT_CHUNK_LINES", 7)
+    rng = random.Random(5)
+    alphabet = "  \t0123456789abcé€-"
+    lines = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 40))) for _ in range(50)]
+    blanks, digits = blank_profile(lines)
+    assert (blanks.tolist(), digits.tolist()) == naive_profile(lines)
+
+
+def test_blank_profile_is_bounded_in_width(monkeypatch):
+    monkeypatch.setattr(bulk_import, "DETECT_MAX_WIDTH", 10)
+    blanks, digits = blank_profile(["x" * 25, "1 2"])
+    assert len(blanks) == len(digits) == 10
+    assert blanks.tolist() == [0, 1, 0] + [1] * 7
+
+
+def test_detect_layout_with_position_column():
+    assert detect_layout(DUMP, ".") == ColumnLayout(0, 3, 4, 15, 19, ".")
+
+
+def test_detect_layout_without_position_column():
+    text = "\n".join(f"PN-{i:05d}    Description {i}" for i in range(40))
+    assert detect_layout(text) == ColumnLayout(0, 0, 0, 8, 12, "")
+
+
+def test_detect_layout_tolerates_a_few_irregular_lines():
+    lines = [f"{i:04d}  {i:06d}-01  Pièce {i}" for i in range(100)]
+    lines[10] = "remarque : ligne de texte libre sans colonnes"
+    assert detect_layout("\n".join(lines)) == ColumnLayout(0, 4, 6, 15, 17, "")
+
+
+def test_detect_layout_needs_two_fields():
+    assert detect_layout("315105-0153\n315105-0160") is None
+    assert detect_layout("") is None
+
+
+def test_new_node_ids_are_unique_uuid4():
+    ids = new_node_ids(1000)
+    assert len(set(ids)) == 1000
+    assert all(uuid.UUID(node_id).version == 4 for node_id in ids)
+
+
+class CountingStorage(SQLiteStorage):
+    """Base SQLite qui compte les écritures d'ajout."""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.add_calls = 0
+
+    def add_nodes(self, model, node_ids):
+        self.add_calls += 1
+        super().add_nodes(model, node_ids)
+
+
+@pytest.fixture
+def core(tmp_path):
+    storage = CountingStorage(str(tmp_path / "arbre.db"))
+    core = TreeCore(storage)
+    core.load()
+    core.add_node("", "", "100-0001", "Racine")
+    storage.add_calls = 0
+    yield core
+    storage.close()
+
+
+def test_import_is_one_write_and_one_undo(core):
+    parent_id = core.model.get_children("")[0]
+    text = "\n".join(f"{i:03d} {i:06d}-0001  Pièce {i}" for i in range(500))
+    new_ids, rejects = core.import_fixed_width(parent_id, text, ColumnLayout(0, 3, 4, 17, 19, ""))
+    assert rejects == []
+    assert core.storage.add_calls == 1
+    assert core.model.get_children(parent_id) == new_ids
+    assert core.model.nodes[new_ids[42]]["part_number"] == "000042-0001"
+    reloaded, _ = core.storage.load()
+    assert reloaded.get_children(parent_id) == new_ids
+    core.undo()
+    assert core.model.get_children(parent_id) == []
+
+
+def test_import_under_a_missing_parent(core):
+    with pytest.raises(ValueError):
+        core.import_fixed_width("inconnu", DUMP, DEFAULT_LAYOUT)
+    assert core.storage.add_calls == 0
@@ -0,0 +1,131 @@
+"""Commandes annulables : annuler puis rétablir redonne le même arbre, en mémoire et dans le stockage."""
+import pytest
+
+from bulk_import import ImportRow
+from commands import CommandHistory
+from conftest import sample_storage, snapshot
+from tree_core import TreeCore
+
+
+@pytest.fixture(params=["sqlite", "excel"])
+def core(request, tmp_path):
+    storage = sample_storage(request.param, tmp_path)
+    core = TreeCore(storage)
+    core.load()
+    yield core
+    storage.close()
+
+
+def stored(core):
+    model, _ = core.storage.load()
+    return snapshot(model)
+
+
+def check_undo_redo(core, action):
+    """Exécute action(core), puis vérifie annuler / rétablir contre les états avant et après."""
+    before = snapshot(core.model)
+    action(core)
+    after = snapshot(core.model)
+    assert after != before
+    assert stored(core) == after
+    assert core.undo() is not None
+    assert snapshot(core.model) == before
+    assert stored(core) == before
+    assert core.redo() is not None
+    assert snapshot(core.model) == after
+    assert stored(core) == after
+
+
+def test_add_node(core):
+    check_undo_redo(core, lambda core: core.add_node("A", "13", "300-0003", "Nouveau"))
+
+
+def test_add_rows(core):
+    rows = [ImportRow(i, str(i), f"400-{i}", "") for i in range(1, 6)]
+    check_undo_redo(core, lambda core: core.add_rows("B", rows))
+
+
+def test_edit_node(core):
+    check_undo_redo(core, lambda core: core.edit_node("A2", position="99", description="Pièce A2"))
+
+
+def test_delete_subtree_restores_the_rank(core):
+    check_undo_redo(core, lambda core: core.delete_subtree("A"))
+    core.undo()
+    assert core.model.get_children("R1") == ["A", "B"]
+
+
+@pytest.mark.parametrize("new_parent_id, index", [("R2", None), ("R1", 0), ("", 0), ("B", None)])
+def test_move_subtree(core, new_parent_id, index):
+    check_undo_redo(core, lambda core: core.move_subtree("A2", new_parent_id, index))
+
+
+def test_move_within_the_same_parent(core):
+    check_undo_redo(core, lambda core: core.move_subtree("A1", "A", 1))
+
+
+def test_history_limit_and_redo_cleared_by_a_new_command(core):
+    core.history.limit = 3
+    for i in range(5):
+        core.edit_node("B", description=f"v{i}")
+    assert [core.undo() is not None for _ in range(4)] == [True, True, True, False]
+    assert core.model.nodes["B"]["description"] == "v1"
+    core.edit_node("A", description="autre")
+    assert not core.history.can_redo()
+
+
+def test_history_without_commands():
+    history = CommandHistory()
+    assert history.undo(None) is None and history.redo(None) is None
+
+
+# ====== Sélection multiple : un lot = une commande ======
+
+def test_move_subtrees(core):
+    # A1 suit A (ancêtre sélectionné) ; l'ordre de sélection est conservé
+    check_undo_redo(core, lambda core: core.move_subtrees(["B", "A1", "A"], "R2"))
+    core.undo()
+    core.redo()
+    assert core.model.get_children("R2") == ["B", "A"]
+
+
+def test_move_subtrees_to_the_root(core):
+    check_undo_redo(core, lambda core: core.move_subtrees(["A2", "A1"], ""))
+
+
+def test_move_into_own_subtree_is_refused(core):
+    with pytest.raises(ValueError):
+        core.move_subtrees(["R2", "A"], "A1")
+    assert not core.history.can_undo()
+
+
+def test_copy_subtrees(core):
+    check_undo_redo(core, lambda core: core.copy_subtrees(["A", "B", "A2"], "R2"))
+    copies = core.model.get_children("R2")
+    assert len(copies) == 2 and not set(copies) & {"A", "B"}
+    copy_a = copies[0]
+    assert [core.model.nodes[node_id]["part_number"] for node_id in core.model.get_children(copy_a)] == ["300-0001", "300-0002"]
+    assert len(core.model) == 6 + 4
+
+
+def test_delete_subtrees_restores_ranks(core):
+    # Sélection dans le désordre : chaque racine retrouve son rang à l'annulation
+    check_undo_redo(core, lambda core: core.delete_subtrees(["R2", "A2", "A1", "B"]))
+    core.undo()
+    assert core.model.get_children("") == ["R1", "R2"]
+    assert core.model.get_children("A") == ["A1", "A2"]
+
+
+def test_batch_is_a_single_write(core):
+    """Un COMMIT (SQLite) ou un ajout au journal (Excel) par commande."""
+    writes = []
+    if hasattr(core.storage, "conn"):
+        core.storage.conn.set_trace_callback(lambda statement: statement == "COMMIT" and writes.append(statement))
+    else:
+        record_many = core.storage.journal.record_many
+        core.storage.journal.record_many = lambda entries: writes.append(len(entries)) or record_many(entries)
+    core.move_subtrees(["A1", "A2", "B"], "R2")
+    core.copy_subtrees(["R2"], "")
+    core.delete_subtrees(["A", "B", "R1"])
+    core.undo()
+    assert len(writes) == 4
@@ -0,0 +1,104 @@
+"""Croisement du BOM : tables par part number normalisé et jointures sur l'arbre."""
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import generate_bom
+from conftest import SAMPLE_ROWS, tree_frame
+from cross_reference import (BOM_COLUMNS, ISSUES_COLUMN, MAX_REFERENCES, PRICE_COLUMN, QUANTITY_COLUMN,
+                             REFERENCES_COLUMN, VALUE_COLUMN, consumption_by_key, enrich_bom, extract_part_codes,
+                             normalize_part_numbers, references_by_key)
+from where_used import normalize_part_number
+
+
+def test_normalize_part_numbers_matches_the_scalar_version():
+    values = pd.Series([" 315105-0153", "315105-0153 ", 1234567.0, None, "AbC", np.nan, "1234567.0"], index=list("abcdefg"))
+    keys = normalize_part_numbers(values)
+    assert keys.index.tolist() == list("abcdefg")
+    assert keys.tolist() == ["315105-0153", "315105-0153", "1234567", "", "abc", "", "1234567"]
+    assert keys["a"] == normalize_part_number(values["a"])
+
+
+def test_extract_part_codes():
+    texts = pd.Series(["O-RING REF 315206-0805 et 2555655-0000", "X315105-0153", "123-4567", None, "9315105-01531"],
+                      index=[10, 11, 12, 13, 14])
+    codes = extract_part_codes(texts)
+    assert list(zip(codes["row"], codes["key"])) == [(10, "315206-0805"), (10, "2555655-0000")]
+
+
+def consumption_export():
+    return pd.DataFrame({
+        "Article": ["300-0001", " 300-0001", "999-9999", "KIT", "200-0002"],
+        "Libelle Article": ["", "", "JOINT 200-0001", "KIT POUR 3000001-0001 ET 2000001-0001 (2000001-0001)", None],
+        "Qté": [2, 3, 1, 4, "?"],
+        "PU": [10.0, 10.0, 5.0, 1.5, 7.0],
+        "Valeur": [20.0, None, 5.0, 6.0, 14.0],
+    })
+
+
+def test_consumption_by_key():
+    table = consumption_by_key(consumption_export())
+    # Article (casse et espaces ignorés) ; valeur absente : quantité x PU
+    assert table.loc["300-0001", [QUANTITY_COLUMN, VALUE_COLUMN, ISSUES_COLUMN]].tolist() == [5.0, 50.0, 2]
+    assert table.loc["300-0001", PRICE_COLUMN] == 10.0
+    # Part numbers du libellé ; une sortie citée deux fois pour la même clé compte une fois
+    assert table.loc["2000001-0001", [QUANTITY_COLUMN, ISSUES_COLUMN]].tolist() == [4.0, 1]
+    assert table.loc["kit", QUANTITY_COLUMN] == 4.0
+    # Quantité illisible : 0, pas de prix moyen
+    assert table.loc["200-0002", QUANTITY_COLUMN] == 0.0
+    assert np.isnan(table.loc["200-0002", PRICE_COLUMN])
+
+
+def test_consumption_missing_columns():
+    assert consumption_by_key(None).empty
+    with pytest.raises(ValueError, match="Valeur"):
+        consumption_by_key(pd.DataFrame({"Article": ["1"], "Qté": [1]}))
+
+
+def test_references_by_key():
+    sheet = pd.DataFrame({"Tâche": ["Changer 315105-0153", "Graisser", "Contrôle"],
+                          "Pièces": [None, "315105-0153 / 315105-0160", 3151050153]})
+    many = pd.DataFrame({"Pièce": ["315105-0160"] * (MAX_REFERENCES + 2)})
+    table = references_by_key([("PMP / Feuil1", sheet), ("Liste / Vide", pd.DataFrame()), ("Liste / Longue", many)])
+    # Numéro de ligne Excel (en-tête en ligne 1) ; une ligne citée deux fois n'est notée qu'une fois
+    assert table.loc["315105-0153", REFERENCES_COLUMN] == "PMP / Feuil1 l.2; PMP / Feuil1 l.3"
+    # 1 + MAX_REFERENCES + 2 lignes citent 315105-0160 : MAX_REFERENCES sont listées
+    assert table.loc["315105-0160", REFERENCES_COLUMN].endswith("(+3)")
+    assert references_by_key([]).empty
+
+
+def test_enrich_bom_keeps_the_tree_rows():
+    tree_df = tree_frame(SAMPLE_ROWS + [("C", "B", "30", "300-0001 ", "Deuxième occurrence")])
+    references = references_by_key([("PMP / F", pd.DataFrame({"x": ["voir 2000001-0001"]}))])
+    bom = enrich_bom(tree_df, consumption_by_key(consumption_export()), references)
+    assert bom["ID"].tolist() == tree_df["ID"].tolist()
+    assert list(bom.columns) == list(tree_df.columns) + BOM_COLUMNS
+    by_id = bom.set_index("ID")
+    assert by_id.loc["A1", QUANTITY_COLUMN] == by_id.loc["C", QUANTITY_COLUMN] == 5.0
+    assert pd.isna(by_id.loc["R1", QUANTITY_COLUMN]) and pd.isna(by_id.loc["R1", REFERENCES_COLUMN])
+
+
+def test_generate_bom(capsys):
+    tree_df = tree_frame(SAMPLE_ROWS + [("C", "B", "30", "315105-0153", "Vis")])
+    sources = {"consommation": consumption_export(),
+               "pmp_plf": {"Feuil1": pd.DataFrame({"Pièce": ["Vis 315105-0153"]})}}
+    bom = generate_bom.generate_bom(tree_df, sources)
+    by_id = bom.set_index("ID")
+    assert by_id.loc["C", REFERENCES_COLUMN] == "PMP PLF / Feuil1 l.2"
+    assert by_id.loc["B", VALUE_COLUMN] == 14.0
+    assert "2 noeud(s) avec consommation, 1 avec références maintenance (sur 7)" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(importlib.util.find_spec("xlrd") is not None, reason="xlrd installé")
+def test_xls_export_is_skipped_without_xlrd(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "CL_EXPORT_ETAT_CONSOMATION1.xls"
+    # Signature d'un classeur .xls (OLE2) : pandas demande xlrd
+    path.write_bytes(bytes.fromhex("D0CF11E0A1B11AE1") + bytes(504))
+    monkeypatch.setattr(generate_bom, "CONSOMATION_PATTERN", str(tmp_path / "CL_EXPORT_ETAT_CONSOMATION*.xls*"))
+    monkeypatch.setattr(generate_bom, "CONSOMATION_FILE", str(tmp_path / "absent.xls"))
+    for name in ("PMP_2022_FILE", "PMP_PLF_FILE", "LISTE_CONTROLE_FILE"):
+        monkeypatch.setattr(generate_bom, name, str(tmp_path / "absent.xlsx"))
+    assert generate_bom.load_source_files() == {}
+    assert "ATTENTION: Consommation ignorée (CL_EXPORT_ETAT_CONSOMATION1.xls)" in capsys.readouterr().out
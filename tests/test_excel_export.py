@@ -0,0 +1,74 @@
+"""Export Excel mis en forme (écriture en flux) : relecture, plan et styles partagés."""
+import tracemalloc
+
+import openpyxl
+
+import excel_export
+from conftest import snapshot
+from excel_export import HEADERS, PATH_HEADER, ExportRow, write_styled_workbook
+from storage import read_tree_workbook
+from tree_model import TreeModel
+
+
+def export_rows(model):
+    return [ExportRow(model.nodes[node_id]["position"], model.nodes[node_id]["part_number"],
+                      model.nodes[node_id]["description"], level, node_id, model.nodes[node_id]["parent_id"], chemin)
+            for node_id, level, chemin in model.iter_paths()]
+
+
+def test_round_trip(tmp_path, sample_model):
+    path = str(tmp_path / "export.xlsx")
+    assert write_styled_workbook(export_rows(sample_model), path) == len(sample_model)
+    model, _ = TreeModel.from_dataframe(read_tree_workbook(path))
+    assert snapshot(model) == snapshot(sample_model)
+
+
+def test_outline_styles_and_path_comments(tmp_path, sample_model):
+    path = str(tmp_path / "export.xlsx")
+    write_styled_workbook(export_rows(sample_model), path)
+    ws = openpyxl.load_workbook(path).active
+    assert [cell.value for cell in ws[3]] == HEADERS
+    assert ws.freeze_panes == "A4"
+    # Lignes 4.. : R1, A, A1, A2, B, R2
+    assert [ws.row_dimensions[row].outlineLevel for row in range(4, 10)] == [0, 1, 2, 2, 1, 0]
+    assert ws["A6"].style == "Niveau 2"
+    assert ws["C6"].comment.text.endswith(sample_model.path_string("A1"))
+    assert ws["C9"].comment.text.endswith(sample_model.path_string("R2"))
+
+
+def test_empty_tree_writes_headers_only(tmp_path):
+    path = str(tmp_path / "vide.xlsx")
+    assert write_styled_workbook([], path) == 0
+    assert read_tree_workbook(path).empty
+
+
+def test_path_column_above_the_comment_limit(tmp_path, sample_model, monkeypatch):
+    monkeypatch.setattr(excel_export, "PATH_COMMENT_MAX_ROWS", 3)
+    path = str(tmp_path / "export.xlsx")
+    write_styled_workbook(export_rows(sample_model), path)
+    ws = openpyxl.load_workbook(path).active
+    assert [cell.value for cell in ws[3]] == HEADERS + [PATH_HEADER]
+    assert ws["G6"].value == sample_model.path_string("A1")
+    assert ws["C6"].comment is None
+    model, _ = TreeModel.from_dataframe(read_tree_workbook(path))
+    assert snapshot(model) == snapshot(sample_model)
+
+
+def peak_memory(rows, path):
+    tracemalloc.start()
+    try:
+        write_styled_workbook(rows, path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_stays_flat_above_the_comment_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_export, "PATH_COMMENT_MAX_ROWS", 100)
+    peaks = []
+    for count in (500, 2000):
+        rows = [ExportRow(str(i), f"PN{i}", f"Pièce {i}", i % 4, f"id-{i}", "", f"Racine - Ensemble - PN{i}")
+                for i in range(count)]
+        peaks.append(peak_memory(rows, str(tmp_path / f"export_{count}.xlsx")))
+    # Quatre fois plus de lignes : le pic ne grandit pas avec elles
+    assert peaks[1] < 1.5 * peaks[0]
@@ -0,0 +1,73 @@
+"""Journal des modifications : enregistrement, relecture sur l'instantané, compaction."""
+from conftest import SAMPLE_ROWS, snapshot, tree_frame
+from journal import ChangeJournal, add_entries
+from tree_model import TreeModel
+
+
+def fresh_model():
+    model, _ = TreeModel.from_dataframe(tree_frame(SAMPLE_ROWS))
+    return model
+
+
+def test_replay_reproduces_the_edits(tmp_path, sample_model):
+    journal = ChangeJournal(str(tmp_path / "arbre.xlsx.journal"))
+    sample_model.add_node("N", "A", "13", "300-0003", "Nouveau")
+    journal.record_add(sample_model, "N")
+    sample_model.update_node("B", description="Ensemble B modifié")
+    journal.record_update("B", description="Ensemble B modifié")
+    sample_model.move_subtree("A", "R2", 0)
+    journal.record_move("A", "R2", 0)
+    sample_model.remove_subtree("A1")
+    journal.record_delete("A1")
+    assert len(journal) == 4
+
+    replayed = fresh_model()
+    assert ChangeJournal(journal.path).replay(replayed) == 4
+    assert snapshot(replayed) == snapshot(sample_model)
+
+
+def test_replay_is_idempotent(tmp_path, sample_model):
+    journal = ChangeJournal(str(tmp_path / "j"))
+    sample_model.add_node("N", "R2", "", "400", "")
+    journal.record_add(sample_model, "N")
+    sample_model.remove_subtree("B")
+    journal.record_delete("B")
+    # Compaction interrompue : l'instantané contient déjà les opérations
+    assert journal.replay(sample_model) == 0
+    assert "N" in sample_model and "B" not in sample_model
+
+
+def test_truncated_last_line_is_ignored(tmp_path, sample_model):
+    journal = ChangeJournal(str(tmp_path / "j"))
+    journal.record_update("A", description="ok")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"op": "delete", "id": "R')
+    model = fresh_model()
+    assert journal.replay(model) == 1
+    assert model.nodes["A"]["description"] == "ok"
+    assert "R1" in model
+
+
+def test_inserted_ranks_are_recorded(sample_model):
+    sample_model.add_node("N", "R1", "", "", "", index=0)
+    sample_model.add_node("M", "R2", "", "", "")
+    entries = add_entries(sample_model, ["N", "M"])
+    assert entries[0]["index"] == 0
+    assert "index" not in entries[1]
+
+
+def test_discard_keeps_operations_recorded_after_the_checkpoint(tmp_path):
+    journal = ChangeJournal(str(tmp_path / "j"), threshold=3)
+    journal.record_update("A", description="1")
+    journal.record_update("A", description="2")
+    mark = journal.checkpoint()
+    journal.record_update("A", description="3")
+    assert journal.needs_compaction()
+    journal.discard(mark)
+    assert len(journal) == 1
+    model = fresh_model()
+    journal.replay(model)
+    assert model.nodes["A"]["description"] == "3"
+    # Un second checkpoint se compte à partir de la nouvelle base
+    journal.discard(journal.checkpoint())
+    assert len(journal) == 0 and not (tmp_path / "j").exists()
@@ -0,0 +1,65 @@
+"""Remplissage paresseux du Treeview, sur l'application sans affichage de benchmark.py."""
+import pytest
+
+import tree_app
+from benchmark import headless_app
+from conftest import SAMPLE_ROWS, tree_frame
+from storage import SQLiteStorage
+from tree_model import TreeModel
+
+PLACEHOLDER = tree_app.PLACEHOLDER_PREFIX
+
+
+@pytest.fixture
+def lazy_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(tree_app, "LAZY_LOAD_THRESHOLD", 3)
+    model, _ = TreeModel.from_dataframe(tree_frame(SAMPLE_ROWS))
+    storage = SQLiteStorage(str(tmp_path / "arbre.db"))
+    storage.add_nodes(model, [node_id for node_id, _ in model.walk()])
+    app = headless_app(storage, str(tmp_path / "arbre.xlsx"))
+    app.load_data()
+    yield app
+    storage.close()
+
+
+def test_only_roots_are_inserted(lazy_app):
+    assert lazy_app.lazy_mode
+    assert lazy_app.tree.get_children("") == ("R1", "R2")
+    assert lazy_app.tree.get_children("R1") == (PLACEHOLDER + "R1",)
+    assert lazy_app.tree.get_children("R2") == ()
+    assert not lazy_app.tree.exists("A")
+
+
+def test_children_are_loaded_one_level_at_a_time(lazy_app):
+    lazy_app.load_children("R1")
+    assert lazy_app.tree.get_children("R1") == ("A", "B")
+    assert lazy_app.tree.get_children("A") == (PLACEHOLDER + "A",)
+    # Deuxième dépliage : rien n'est inséré deux fois
+    lazy_app.load_children("R1")
+    assert lazy_app.tree.get_children("R1") == ("A", "B")
+
+
+def test_closing_drops_the_loaded_subtree(lazy_app):
+    lazy_app.load_children("R1")
+    lazy_app.load_children("A")
+    lazy_app.tree.focus("R1")
+    lazy_app.on_tree_close()
+    assert lazy_app.tree.get_children("R1") == (PLACEHOLDER + "R1",)
+    assert not lazy_app.tree.exists("A1")
+
+
+def test_reveal_node_loads_its_ancestors(lazy_app):
+    lazy_app.reveal_node("A2")
+    assert lazy_app.tree.exists("A2")
+    assert lazy_app.tree.parent("A2") == "A"
+    assert lazy_app.tree.item("R1", "open") and lazy_app.tree.item("A", "open")
+
+
+def test_placeholders_are_not_selected_nodes(lazy_app, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(tree_app.messagebox, "showwarning", lambda *args, **kw: warnings.append(args))
+    lazy_app.tree.selection_set([PLACEHOLDER + "R1"])
+    assert lazy_app.selected_nodes() == []
+    lazy_app.add_sibling()
+    lazy_app.add_child()
+    assert len(warnings) == 2
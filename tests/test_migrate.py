@@ -0,0 +1,104 @@
+"""Migration par niveaux : parents reconstruits par paquets, comparés à la pile de parents ligne à ligne."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import migrate_data
+from migrate_data import LevelTable
+
+
+def baseline_parents(levels):
+    """Ancien algorithme : pile des lignes ouvertes, parcourue ligne par ligne (-1 : racine)."""
+    parents = []
+    stack = []
+    for rank, level in enumerate(levels):
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        parents.append(stack[-1][1] if level > 0 and stack else -1)
+        stack.append((level, rank))
+    return parents
+
+
+def random_levels(rng, count):
+    levels = []
+    for _ in range(count):
+        previous = levels[-1] if levels else 0
+        levels.append(max(0, rng.choice([previous + 1, previous, previous - 1, previous - 2, 0, previous + 3])))
+    return levels
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 7, 100000])
+def test_parent_ranks_match_the_baseline_across_chunks(chunk_rows):
+    rng = random.Random(chunk_rows)
+    for _ in range(20):
+        levels = random_levels(rng, rng.randint(0, 300))
+        table = LevelTable()
+        parent_ranks = []
+        parent_ids = []
+        for start in range(0, len(levels), chunk_rows):
+            chunk = np.array(levels[start:start + chunk_rows], dtype=np.int64)
+            ranks = table.parent_ranks(chunk)
+            # ID de chaque ligne : son rang global ; les parents des paquets précédents viennent de la table
+            _, parents = table.assign_ids(chunk, ranks, lambda parents, index: [str(start + i) for i in index])
+            parent_ranks.extend(ranks.tolist())
+            parent_ids.extend(parents.tolist())
+        expected = baseline_parents(levels)
+        assert parent_ranks == expected
+        assert parent_ids == [str(rank) if rank >= 0 else "" for rank in expected]
+
+
+def test_parent_is_the_closest_lower_level():
+    # Un saut de niveau (0 -> 2) rattache la ligne au dernier niveau inférieur
+    assert LevelTable().parent_ranks(np.array([0, 2, 1, 2, 0, 1])).tolist() == [-1, 0, 0, 2, -1, 4]
+
+
+def write_source(path, rows):
+    pd.DataFrame(rows, columns=["Position", "PartNumber", "Description", "Niveau"]).to_excel(path, index=False)
+
+
+def read_structure(path):
+    """Lignes migrées avec le rang du parent à la place des IDs."""
+    df = pd.read_excel(path, dtype=str).fillna("")
+    rank_of = {node_id: rank for rank, node_id in enumerate(df["ID"])}
+    assert len(rank_of) == len(df)
+    return [(rank_of[parent_id] if parent_id else -1, position, part_number, description, int(level))
+            for parent_id, position, part_number, description, level
+            in zip(df["ParentID"], df["Position"], df["PartNumber"], df["Description"], df["Niveau"])]
+
+
+def test_migrate_matches_the_baseline_for_any_chunk_size(tmp_path, capsys):
+    rng = random.Random(4)
+    levels = random_levels(rng, 250)
+    rows = []
+    for i, level in enumerate(levels):
+        position = ".".join(["1"] * (level + 1))
+        # Niveau absent : déduit des points de la position ; part number vide : ligne ignorée
+        rows.append((position, "" if i % 37 == 5 else f"PN{i % 40}", f"d{i}", None if i % 3 == 0 else level))
+    source = str(tmp_path / "source.xlsx")
+    write_source(source, rows)
+
+    kept = [(row, level) for row, level in zip(rows, levels) if row[1]]
+    expected_parents = baseline_parents([level for _, level in kept])
+    expected = [(parent, row[0], row[1], row[2], level) for parent, (row, level) in zip(expected_parents, kept)]
+    for chunk_rows in (1, 7, 100000):
+        target = str(tmp_path / f"cible_{chunk_rows}.xlsx")
+        assert migrate_data.migrate(source, target, chunk_rows=chunk_rows) == len(kept)
+        assert read_structure(target) == expected
+
+
+def test_negative_level_is_a_root_written_as_is(tmp_path, capsys):
+    source = str(tmp_path / "source.xlsx")
+    write_source(source, [("1", "A", "", 0), ("1.1", "B", "", 1), ("x", "C", "", -1), ("1", "D", "", 1)])
+    target = str(tmp_path / "cible.xlsx")
+    migrate_data.migrate(source, target, chunk_rows=2)
+    assert [(parent, level) for parent, _, _, _, level in read_structure(target)] == [(-1, 0), (0, 1), (-1, -1), (2, 1)]
+
+
+def test_missing_source_or_column(tmp_path, capsys):
+    assert migrate_data.migrate(str(tmp_path / "absent.xlsx"), str(tmp_path / "cible.xlsx")) is None
+    source = str(tmp_path / "source.xlsx")
+    pd.DataFrame({"Position": ["1"], "PartNumber": ["A"]}).to_excel(source, index=False)
+    assert migrate_data.migrate(source, str(tmp_path / "cible.xlsx")) is None
+    assert "Colonne 'Description' manquante" in capsys.readouterr().out
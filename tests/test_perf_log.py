@@ -0,0 +1,72 @@
+"""Instrumentation : étapes imbriquées, une ligne JSON par opération, capture cProfile."""
+import json
+import os
+
+import pytest
+
+import perf_log
+from perf_log import timed
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    """Journal dans un dossier temporaire ; réglages et logger rétablis après le test."""
+    path = str(tmp_path / "perf_log.jsonl")
+    monkeypatch.setitem(perf_log.settings, "log_file", path)
+    monkeypatch.setitem(perf_log.settings, "profile", False)
+    monkeypatch.setattr(perf_log, "_logger", None)
+    return path
+
+
+def records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_nested_stages_make_one_record(log_file):
+    with timed("save_data", rows=3):
+        with timed("snapshot") as stage:
+            stage.rows = 3
+            with timed("paths"):
+                pass
+        with timed("write_workbook"):
+            pass
+    [record] = records(log_file)
+    assert record["operation"] == "save_data" and record["rows"] == 3
+    assert [stage["name"] for stage in record["stages"]] == ["snapshot", "write_workbook"]
+    assert record["stages"][0]["rows"] == 3
+    assert record["stages"][0]["stages"][0]["name"] == "paths"
+    assert record["seconds"] >= record["stages"][0]["seconds"]
+
+
+def test_operation_is_logged_when_it_fails(log_file):
+    with pytest.raises(KeyError):
+        with timed("load_data"):
+            with timed("read_sql"):
+                raise KeyError("ID")
+    [record] = records(log_file)
+    assert record["operation"] == "load_data"
+    assert record["stages"][0]["name"] == "read_sql"
+
+
+def test_profile_capture(log_file, monkeypatch):
+    monkeypatch.setitem(perf_log.settings, "profile", True)
+    with timed("generate_bom"):
+        sum(range(1000))
+    [record] = records(log_file)
+    assert os.path.dirname(record["profile"]) == os.path.join(os.path.dirname(log_file), "profiles")
+    assert os.path.exists(record["profile"])
+
+
+def test_disabled_log(log_file, monkeypatch):
+    monkeypatch.setitem(perf_log.settings, "log_file", "")
+    with timed("load"):
+        pass
+    assert not os.path.exists(log_file)
+
+
+def test_unwritable_log_does_not_fail_the_operation(tmp_path, log_file, monkeypatch, capsys):
+    monkeypatch.setitem(perf_log.settings, "log_file", str(tmp_path / "absent" / "perf_log.jsonl"))
+    with timed("load"):
+        pass
+    assert "journal de performance non écrit" in capsys.readouterr().out
@@ -0,0 +1,213 @@
+"""Cumul de la consommation par sous-arbre : parcours postfixe, mises à jour incrémentales, colonnes du BOM."""
+import random
+
+import pandas as pd
+import pytest
+
+import generate_bom
+from benchmark import headless_app
+from conftest import SAMPLE_ROWS, sample_storage, tree_frame
+from cross_reference import QUANTITY_COLUMN, VALUE_COLUMN
+from rollup import ROLLUP_COLUMNS, ROLLUP_QUANTITY_COLUMN, ROLLUP_VALUE_COLUMN, RollupIndex, rollup_frame
+from tree_model import TreeModel
+from where_used import normalize_part_number
+
+
+def consumption_table(rows):
+    """Table au format de consumption_by_key : {clé: (quantité, valeur)} -> DataFrame."""
+    return pd.DataFrame({QUANTITY_COLUMN: [float(quantity) for quantity, _ in rows.values()],
+                         VALUE_COLUMN: [float(value) for _, value in rows.values()]}, index=list(rows))
+
+
+SAMPLE_CONSUMPTION = {"300-0001": (2, 20.0), "300-0002": (1, 5.0), "200-0002": (4, 1.5), "999-9999": (7, 7.0)}
+
+
+def brute_force(model, consumption, node_id):
+    """Somme directe sur les part numbers distincts du sous-arbre (chacun compté une fois)."""
+    keys = set()
+    stack = [node_id]
+    while stack:
+        current = stack.pop()
+        keys.add(normalize_part_number(model.nodes[current]["part_number"]))
+        stack.extend(model.get_children(current))
+    quantity = value = 0.0
+    for key in keys:
+        own_quantity, own_value = consumption.get(key, (0.0, 0.0))
+        quantity += own_quantity
+        value += own_value
+    return quantity, value
+
+
+def built_index(model, rows):
+    index = RollupIndex()
+    model.add_listener(index)
+    index.set_consumption(model, consumption_table(rows))
+    index.build(model)
+    return index
+
+
+def test_build_matches_the_subtree_sums(sample_model):
+    index = built_index(sample_model, SAMPLE_CONSUMPTION)
+    assert index.totals(sample_model, "A") == (3.0, 25.0)
+    assert index.totals(sample_model, "R1") == (7.0, 26.5)
+    assert index.totals(sample_model, "R2") == (0.0, 0.0)
+    for node_id in sample_model.nodes:
+        assert index.totals(sample_model, node_id) == brute_force(sample_model, index.consumption, node_id)
+    assert index.totals(sample_model, "absent") is None
+
+
+def test_repeated_article_counts_once():
+    # Le même article sous deux ensembles : l'export donne sa consommation totale, comptée une fois
+    model, _ = TreeModel.from_dataframe(tree_frame([
+        ("R", "", "1", "100-0001", ""), ("S1", "R", "10", "200-0001", ""), ("P1", "S1", "11", "300-0001", ""),
+        ("S2", "R", "20", "200-0002", ""), ("P2", "S2", "21", " 300-0001", ""), ("P3", "S2", "22", "300-0001", "")]))
+    index = built_index(model, {"300-0001": (5, 50.0), "200-0002": (1, 2.0)})
+    assert index.totals(model, "R") == (6.0, 52.0)
+    assert index.totals(model, "S1") == (5.0, 50.0)
+    assert index.totals(model, "S2") == (6.0, 52.0)
+    # Retirer une des occurrences ne change rien ; retirer la dernière retire l'article
+    model.remove_subtree("P2")
+    assert index.totals(model, "S2") == (6.0, 52.0)
+    model.update_node("P3", part_number="300-0009")
+    assert index.totals(model, "S2") == (1.0, 2.0)
+    assert index.totals(model, "R") == (6.0, 52.0)
+    model.move_subtree("S1", "S2")
+    assert index.totals(model, "S2") == (6.0, 52.0)
+    model.remove_subtree("P1")
+    assert index.totals(model, "S1") == (0.0, 0.0)
+    assert index.totals(model, "R") == (1.0, 2.0)
+
+
+def test_totals_build_on_first_use(sample_model):
+    index = RollupIndex()
+    index.set_consumption(sample_model, consumption_table(SAMPLE_CONSUMPTION))
+    assert not index.built
+    assert index.totals(sample_model, "R1") == (7.0, 26.5)
+
+
+def test_set_consumption_marks_only_the_changed_keys(sample_model):
+    index = built_index(sample_model, SAMPLE_CONSUMPTION)
+    index.take_changed(sample_model)
+    # 300-0002 change, 999-9999 (hors de l'arbre) disparaît : seule la chaîne A2 -> R1 est recalculée
+    changed = dict(SAMPLE_CONSUMPTION, **{"300-0002": (3, 5.0)})
+    del changed["999-9999"]
+    index.set_consumption(sample_model, consumption_table(changed))
+    assert sorted(index.take_changed(sample_model)) == ["A", "A2", "R1"]
+    assert index.totals(sample_model, "R1") == (9.0, 26.5)
+    # Même table : rien à recalculer
+    index.set_consumption(sample_model, consumption_table(changed))
+    assert index.take_changed(sample_model) == []
+
+
+def test_edits_mark_the_ancestors(sample_model):
+    index = built_index(sample_model, SAMPLE_CONSUMPTION)
+    index.take_changed(sample_model)
+    sample_model.update_node("B", description="Sans effet sur le cumul")
+    assert index.take_changed(sample_model) == []
+    # 300-0001 figure déjà sous R1 (A1) : compté une seule fois
+    sample_model.update_node("B", part_number="300-0001")
+    assert sorted(index.take_changed(sample_model)) == ["B", "R1"]
+    assert index.totals(sample_model, "R1") == (3.0, 25.0)
+    # Noeuds supprimés : retirés des cumuls et des noeuds à rafraîchir
+    sample_model.remove_subtree("A")
+    assert index.take_changed(sample_model) == ["R1"]
+    assert index.totals(sample_model, "R1") == (2.0, 20.0)
+    assert index.totals(sample_model, "A1") is None
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_random_edits_match_a_fresh_build(seed):
+    rng = random.Random(seed)
+    part_numbers = [f"{i}-0000" for i in range(15)]
+
+    def random_table():
+        return consumption_table({key: (rng.randint(0, 9), rng.random()) for key in rng.sample(part_numbers, 10)})
+
+    model = TreeModel()
+    count = [0]
+
+    def new_id():
+        count[0] += 1
+        return f"n{count[0]}"
+
+    for _ in range(60):
+        node_ids = list(model.nodes)
+        model.add_node(new_id(), rng.choice(node_ids + [""]), "", rng.choice(part_numbers), "")
+    index = RollupIndex()
+    model.add_listener(index)
+    index.set_consumption(model, random_table())
+    index.build(model)
+
+    def check():
+        fresh = RollupIndex()
+        fresh.consumption = index.consumption
+        fresh.build(model)
+        for node_id in model.nodes:
+            assert index.totals(model, node_id) == pytest.approx(fresh.totals(model, node_id)), node_id
+            assert index.totals(model, node_id) == pytest.approx(brute_force(model, index.consumption, node_id)), node_id
+
+    for _ in range(200):
+        node_ids = list(model.nodes)
+        operation = rng.randrange(7)
+        if operation == 0 or len(node_ids) < 5:
+            model.add_node(new_id(), rng.choice(node_ids + [""]), "", rng.choice(part_numbers), "")
+        elif operation == 1:
+            model.update_node(rng.choice(node_ids), part_number=rng.choice(part_numbers))
+        elif operation == 2:
+            model.remove_subtrees(model.top_level(rng.sample(node_ids, 2)))
+        elif operation == 3:
+            node_id, parent_id = rng.choice(node_ids), rng.choice(node_ids + [""])
+            if not (parent_id and model.is_ancestor(node_id, parent_id)):
+                model.move_subtree(node_id, parent_id)
+        elif operation == 4:
+            # Placement groupé sous des parents distincts, sans déplacer un noeud sous lui-même
+            node_id, parent_id = rng.choice(node_ids), rng.choice(node_ids + [""])
+            if not (parent_id and model.is_ancestor(node_id, parent_id)):
+                model.place_subtrees([(node_id, parent_id, None)])
+        elif operation == 5:
+            index.set_consumption(model, random_table())
+        else:
+            model.add_children(rng.choice(node_ids), [(new_id(), "", rng.choice(part_numbers), "") for _ in range(3)])
+        if rng.random() < 0.3:
+            check()
+    check()
+
+
+def test_rollup_frame_keeps_the_row_order():
+    # C et D forment un cycle : hors de l'arbre, sans cumul
+    tree_df = tree_frame([("B", "R1", "20", "200-0002", ""), ("R1", "", "1", "100-0001", ""),
+                          ("A1", "R1", "11", "300-0001", ""), ("C", "D", "", "300-0001", ""), ("D", "C", "", "", "")])
+    columns = rollup_frame(tree_df, consumption_table(SAMPLE_CONSUMPTION))
+    assert list(columns) == ROLLUP_COLUMNS
+    assert columns[ROLLUP_QUANTITY_COLUMN] == [4.0, 6.0, 2.0, None, None]
+    assert columns[ROLLUP_VALUE_COLUMN] == [1.5, 21.5, 20.0, None, None]
+
+
+def test_generate_bom_adds_the_rollup_columns(capsys):
+    sources = {"consommation": pd.DataFrame({"Article": ["300-0001", "300-0002"], "Qté": [2, 1],
+                                             "PU": [10.0, 5.0], "Valeur": [20.0, 5.0]})}
+    bom = generate_bom.generate_bom(tree_frame(SAMPLE_ROWS), sources).set_index("ID")
+    assert bom.loc["R1", ROLLUP_COLUMNS].tolist() == [3.0, 25.0]
+    assert bom.loc["R2", ROLLUP_COLUMNS].tolist() == [0.0, 0.0]
+    # Sans colonnes ID / ParentID : BOM sans cumuls
+    bom = generate_bom.generate_bom(tree_frame(SAMPLE_ROWS).drop(columns=["ID", "ParentID"]), sources)
+    assert not set(ROLLUP_COLUMNS) & set(bom.columns)
+    assert "colonnes ID / ParentID absentes" in capsys.readouterr().out
+
+
+def test_tree_columns_follow_the_edits(tmp_path):
+    storage = sample_storage("sqlite", tmp_path)
+    app = headless_app(storage, str(tmp_path / "arbre.xlsx"))
+    app.load_data()
+    # Sans consommation chargée : colonnes vides
+    assert app.tree.item("R1", "values")[2:] == ("", "")
+    app.rollup.set_consumption(app.model, consumption_table(SAMPLE_CONSUMPTION))
+    app.refresh_rollup_columns(all_items=True)
+    assert app.tree.item("R1", "values")[2:] == ("7", "26.50")
+    assert app.tree.item("R2", "values")[2:] == ("", "")
+    app.core.edit_node("A1", part_number="200-0002")
+    assert app.tree.item("A", "values")[2:] == ("5", "6.50")
+    # B porte déjà 200-0002 : compté une fois pour R1
+    assert app.tree.item("R1", "values")[2:] == ("5", "6.50")
+    app.save_worker.wait_idle(timeout=10)
+    storage.close()
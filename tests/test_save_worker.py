@@ -0,0 +1,49 @@
+"""Thread de sauvegarde : demandes fusionnées, événements de fin et d'erreur."""
+import queue
+import threading
+
+from save_worker import SaveWorker
+
+
+def drain(events):
+    result = []
+    while True:
+        try:
+            result.append(events.get_nowait())
+        except queue.Empty:
+            return result
+
+
+def test_pending_requests_are_coalesced():
+    release = threading.Event()
+    started = threading.Event()
+    written = []
+
+    def write(snapshot, path):
+        started.set()
+        release.wait(5)
+        written.append(snapshot)
+        return len(snapshot)
+
+    worker = SaveWorker(write)
+    worker.submit(("a",), "f.xlsx", token=1)
+    assert started.wait(5)
+    # Pendant l'écriture : seule la dernière demande en attente sera écrite
+    worker.submit(("b", "b"), "f.xlsx", token=2)
+    worker.submit(("c", "c", "c"), "f.xlsx", token=3)
+    assert not worker.is_idle()
+    release.set()
+    assert worker.wait_idle(5)
+    assert written == [("a",), ("c", "c", "c")]
+    assert [event for event in drain(worker.events) if event[0] == "done"] == [("done", 1, 1), ("done", 3, 3)]
+
+
+def test_errors_are_reported_with_their_token():
+    def fail(snapshot, path):
+        raise OSError("fichier ouvert ailleurs")
+
+    worker = SaveWorker(fail)
+    worker.submit((), "f.xlsx", token=7)
+    assert worker.wait_idle(5)
+    assert drain(worker.events) == [("start", 0), ("error", "fichier ouvert ailleurs", 7)]
+    assert worker.is_idle()
@@ -0,0 +1,75 @@
+"""Index de recherche : classement, requêtes courtes, mise à jour par le modèle."""
+import random
+
+from search_index import SearchIndex, normalize
+
+
+def built_index(model):
+    index = SearchIndex()
+    index.build(model)
+    model.add_listener(index)
+    return index
+
+
+def brute_force(model, query):
+    """Noeuds trouvés par un parcours complet (même règle que SearchIndex.search)."""
+    q = normalize(query)
+    found = set()
+    for node_id, node in model.nodes.items():
+        pn, desc = normalize(node["part_number"]), normalize(node["description"])
+        if pn.startswith(q) or (len(q) >= 3 and (q in pn or q in desc)):
+            found.add(node_id)
+    return found
+
+
+def test_ranking(sample_model):
+    sample_model.add_node("X", "B", "", "9200-0001", "Adaptateur 200-0001")
+    index = built_index(sample_model)
+    # Exact, puis préfixe, puis sous-chaîne du part number, puis description
+    sample_model.add_node("P", "B", "", "200-00010", "")
+    assert index.search("200-0001") == ["A", "P", "X"]
+    assert index.search("  ENSEMBLE   a ") == ["A"]
+    assert sorted(index.search("ensemble")) == ["A", "B"]
+
+
+def test_short_queries_match_part_number_prefixes(sample_model):
+    index = built_index(sample_model)
+    assert sorted(index.search("3")) == ["A1", "A2"]
+    assert sorted(index.search("10")) == ["R1", "R2"]
+    # Moins de 3 caractères : pas de recherche dans la description
+    assert index.search("ra") == []
+
+
+def test_limit(sample_model):
+    index = built_index(sample_model)
+    assert len(index.search("-000", limit=2)) == 2
+
+
+def test_follows_model_edits(sample_model):
+    index = built_index(sample_model)
+    sample_model.update_node("A1", part_number="555-0001", description="Joint torique")
+    assert index.search("300-0001") == []
+    assert index.search("joint") == ["A1"]
+    sample_model.remove_subtree("A")
+    assert index.search("555") == []
+    assert index.search("300") == []
+    assert len(index) == len(sample_model)
+
+
+def test_matches_brute_force_after_random_edits(sample_model):
+    rng = random.Random(3)
+    index = built_index(sample_model)
+    words = ["vis", "écrou", "joint", "ensemble", "support", "plaque"]
+    for step in range(300):
+        node_ids = list(sample_model.nodes)
+        action = rng.random()
+        if action < 0.5 or len(node_ids) < 5:
+            parent_id = rng.choice(node_ids + [""])
+            sample_model.add_node(f"N{step}", parent_id, "", f"{rng.randint(100, 999)}-{rng.randint(0, 99):04d}",
+                                  f"{rng.choice(words)} {rng.choice(words).upper()}")
+        elif action < 0.8:
+            sample_model.update_node(rng.choice(node_ids), description=rng.choice(words))
+        else:
+            sample_model.remove_subtree(rng.choice(node_ids))
+    for query in words + ["1", "12", "-00", "ens", "Joint"]:
+        assert set(index.search(query, limit=10 ** 6)) == brute_force(sample_model, query)
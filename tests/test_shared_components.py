@@ -0,0 +1,69 @@
+"""Rapport des sous-ensembles répétés : sous-arbres identiques regroupés, occurrence d'exemple, commande shared."""
+import tree_cli
+from conftest import SAMPLE_ROWS, tree_frame
+from shared_components import ComponentGraph
+from storage import SQLiteStorage
+
+
+def model_with_copy(sample_model):
+    """SAMPLE_ROWS avec une copie de l'ensemble A (et de ses enfants) sous R2."""
+    copy_ids = iter(["C", "C1", "C2"])
+    sample_model.copy_subtree("A", "R2", new_id=lambda: next(copy_ids))
+    return sample_model
+
+
+def fields(model, node_id):
+    node = model.nodes[node_id]
+    return node["position"], node["part_number"], node["description"]
+
+
+def test_repeated_assembly_is_stored_once(sample_model):
+    model = model_with_copy(sample_model)
+    graph = ComponentGraph.from_model(model)
+    assert graph.occurrence_count() == len(model) == 9
+    # R1, A, A1, A2, B, R2 : la copie de A ne crée pas de composant
+    assert len(graph) == 6
+    [(component, uses, saved)] = graph.shared()
+    assert graph.display_name(component) == "Ensemble A"
+    assert (uses, saved) == (2, 3)
+    assert graph.stats() == {"occurrences": 9, "components": 6, "shared_assemblies": 1, "edges": 7}
+
+
+def test_different_children_are_not_shared(sample_model):
+    model = model_with_copy(sample_model)
+    model.update_node(model.get_children("C")[1], position="99")
+    graph = ComponentGraph.from_model(model)
+    assert graph.shared() == []
+    # Seule la copie de A devient un composant distinct : la position est portée par la référence
+    assert len(graph) == 7
+
+
+def test_from_dataframe_matches_from_model(sample_model):
+    graph = ComponentGraph.from_dataframe(tree_frame(SAMPLE_ROWS))
+    expected = ComponentGraph.from_model(sample_model)
+    assert (graph.components, graph.roots, graph.uses, graph.sizes) == \
+           (expected.components, expected.roots, expected.uses, expected.sizes)
+
+
+def test_first_node_locates_an_occurrence(sample_model):
+    model = model_with_copy(sample_model)
+    graph = ComponentGraph.from_model(model)
+    [(component, _, _)] = graph.shared()
+    assert graph.first_node[component] == "A"
+    assert graph.components[component][:2] == fields(model, graph.first_node[component])[1:]
+
+
+def test_shared_command_reports_without_changing_the_tree(tmp_path, sample_model, capsys):
+    model = model_with_copy(sample_model)
+    db_path = str(tmp_path / "arbre.db")
+    storage = SQLiteStorage(db_path)
+    storage.add_nodes(model, [node_id for node_id, _ in model.walk()])
+    storage.close()
+    assert tree_cli.main(["shared", db_path]) == 0
+    out = capsys.readouterr().out
+    assert "shared_assemblies : 1" in out
+    assert "x2  (3 lignes en copies)" in out
+    assert "ex. Ensemble A - Racine 1" in out
+    storage = SQLiteStorage(db_path)
+    assert len(storage.load()[0]) == 9
+    storage.close()
@@ -0,0 +1,92 @@
+"""Stockages SQLite et Excel : chaque modification écrite puis relue redonne le même arbre."""
+import pytest
+
+from conftest import SAMPLE_ROWS, sample_storage, snapshot, tree_frame
+from storage import SQLiteStorage, import_workbook
+from tree_model import TreeModel
+
+
+def open_backend(backend, tmp_path):
+    """Stockage initialisé avec SAMPLE_ROWS, et le modèle correspondant."""
+    model, _ = TreeModel.from_dataframe(tree_frame(SAMPLE_ROWS))
+    return sample_storage(backend, tmp_path), model
+
+
+def reloaded(storage):
+    model, _ = storage.load()
+    return snapshot(model)
+
+
+@pytest.fixture(params=["sqlite", "excel"])
+def backend(request, tmp_path):
+    storage, model = open_backend(request.param, tmp_path)
+    yield storage, model
+    storage.close()
+
+
+def test_initial_load(backend):
+    storage, model = backend
+    assert reloaded(storage) == snapshot(model)
+
+
+def test_append_after_a_deleted_sibling(backend):
+    storage, model = backend
+    model.remove_subtree("A1")
+    storage.delete_subtree("A1")
+    model.add_node("N", "A", "13", "300-0003", "Nouveau")
+    storage.add_nodes(model, ["N"])
+    assert reloaded(storage) == snapshot(model)
+    assert model.get_children("A") == ["A2", "N"]
+
+
+def test_insert_in_the_middle(backend):
+    storage, model = backend
+    model.add_node("N", "R1", "", "200-0003", "", index=1)
+    model.add_node("M", "R1", "", "200-0004", "", index=0)
+    storage.add_nodes(model, ["N", "M"])
+    assert model.get_children("R1") == ["M", "A", "N", "B"]
+    assert reloaded(storage) == snapshot(model)
+
+
+def test_update_and_move(backend):
+    storage, model = backend
+    model.update_node("A2", description="Pièce A2")
+    storage.update_node(model, "A2", description="Pièce A2")
+    model.move_subtree("B", "R1", 0)
+    storage.move_node(model, "B", 0)
+    model.move_subtree("A", "R2")
+    storage.move_node(model, "A")
+    assert reloaded(storage) == snapshot(model)
+
+
+def test_batch_move_and_delete(backend):
+    storage, model = backend
+    previous = model.place_subtrees([("A1", "R2", None), ("B", "R2", 0)])
+    storage.move_nodes(model, [("A1", None), ("B", 0)])
+    assert reloaded(storage) == snapshot(model)
+    # Retour aux anciennes places, puis suppression de sous-arbres entiers
+    model.place_subtrees(previous)
+    storage.move_nodes(model, [(node_id, rank) for node_id, _, rank in previous])
+    model.remove_subtrees(["A", "R2"])
+    storage.delete_subtrees(["A", "R2"])
+    assert reloaded(storage) == snapshot(model)
+    assert [node_id for node_id, _ in model.walk()] == ["R1", "B"]
+
+
+def test_deleted_descendants_leave_no_rows(tmp_path):
+    storage, model = open_backend("sqlite", tmp_path)
+    storage.delete_subtree("R1")
+    count = storage.conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+    storage.close()
+    assert count == 1
+
+
+def test_import_workbook_replays_the_journal(tmp_path):
+    excel_storage, model = open_backend("excel", tmp_path)
+    model.add_node("N", "R2", "", "100-0003", "")
+    excel_storage.add_nodes(model, ["N"])
+    db_path = str(tmp_path / "import.db")
+    assert import_workbook(excel_storage.excel_path, db_path) == len(model)
+    storage = SQLiteStorage(db_path)
+    assert reloaded(storage) == snapshot(model)
+    storage.close()
@@ -0,0 +1,148 @@
+"""IDs dérivés du contenu et synchronisation incrémentale (migrate -> modification de la source -> sync)."""
+import pandas as pd
+import pytest
+
+import migrate_data
+from bulk_import import ImportRow
+from conftest import sample_storage, snapshot
+from node_ids import CONTENT, content_id, free_content_id
+from storage import ExcelStorage, SQLiteStorage, read_tree_workbook
+from tree_core import TreeCore
+from tree_model import TreeModel
+
+# Source par niveaux : deux ensembles identiques (même position, même part number) sous la racine
+SOURCE_ROWS = [
+    ("1", "100-0001", "Machine", 0),
+    ("10", "200-0001", "Ensemble A", 1),
+    ("11", "300-0001", "Vis", 2),
+    ("12", "300-0002", "Écrou", 2),
+    ("10", "200-0001", "Ensemble A", 1),
+    ("11", "300-0001", "Vis", 2),
+    ("20", "200-0002", "Ensemble B", 1),
+    ("2", "100-0002", "Outillage", 0),
+    ("10", "400-0001", "Gabarit", 1),
+]
+
+
+def test_content_id_is_deterministic():
+    assert content_id("P", "10", "200-0001") == content_id("P", "10", "200-0001")
+    assert len({content_id("P", "10", "200-0001", 0), content_id("P", "10", "200-0001", 1),
+                content_id("Q", "10", "200-0001"), content_id("P", "20", "200-0001"),
+                content_id("P", "10", "200-0002")}) == 5
+    # Les champs ne se confondent pas en changeant de colonne
+    assert content_id("P", "1", "0-1") != content_id("P", "10", "-1")
+    taken = {content_id("P", "10", "X"), content_id("P", "10", "X", 1)}
+    assert free_content_id("P", "10", "X", taken.__contains__) == content_id("P", "10", "X", 2)
+
+
+def test_core_content_ids(tmp_path):
+    storage = sample_storage("sqlite", tmp_path)
+    core = TreeCore(storage, id_scheme=CONTENT)
+    core.load()
+    assert core.add_node("B", "10", "400-0001", "") == content_id("B", "10", "400-0001")
+    rows = [ImportRow(1, "10", "400-0001", ""), ImportRow(2, "20", "400-0002", "")]
+    assert core.add_rows("B", rows) == [content_id("B", "10", "400-0001", 1), content_id("B", "20", "400-0002")]
+    storage.close()
+
+
+def write_source(path, rows):
+    pd.DataFrame(rows, columns=["Position", "PartNumber", "Description", "Niveau"]).to_excel(path, index=False)
+
+
+def migrated_model(source, target):
+    migrate_data.migrate(source, target, id_scheme=CONTENT)
+    model, _ = TreeModel.from_dataframe(read_tree_workbook(target))
+    return model
+
+
+def test_migrating_twice_gives_the_same_ids(tmp_path, capsys):
+    source = str(tmp_path / "source.xlsx")
+    write_source(source, SOURCE_ROWS)
+    first = migrated_model(source, str(tmp_path / "v1.xlsx"))
+    second = migrated_model(source, str(tmp_path / "v2.xlsx"))
+    assert snapshot(first) == snapshot(second)
+    assert len(first) == len(SOURCE_ROWS)
+    # Les deux ensembles identiques ont des IDs distincts (rang d'occurrence)
+    root_id = first.get_children("")[0]
+    assert first.get_children(root_id)[:2] == [content_id(root_id, "10", "200-0001", 0), content_id(root_id, "10", "200-0001", 1)]
+
+
+def edited_rows():
+    """Source modifiée : description changée, pièce remplacée, ensemble B déplacé sous la deuxième racine,
+    nouvel ensemble inséré avant les autres (frères réordonnés)."""
+    rows = list(SOURCE_ROWS)
+    rows[3] = ("12", "300-0002", "Écrou frein", 2)
+    del rows[5]
+    rows.insert(5, ("13", "300-0003", "Rondelle", 2))
+    ensemble_b = rows.pop(6)
+    rows.append(ensemble_b)
+    rows.insert(1, ("05", "200-0009", "Nouvel ensemble", 1))
+    return rows
+
+
+@pytest.mark.parametrize("target_name", ["interne.xlsx", "arbre.db"])
+def test_sync_equals_a_fresh_migration(tmp_path, capsys, target_name):
+    source = str(tmp_path / "source.xlsx")
+    write_source(source, SOURCE_ROWS)
+    target = str(tmp_path / target_name)
+    if target_name.endswith(".db"):
+        # Base créée depuis une première migration
+        model = migrated_model(source, str(tmp_path / "initial.xlsx"))
+        storage = SQLiteStorage(target)
+        storage.add_nodes(model, [node_id for node_id, _ in model.walk()])
+        storage.close()
+    else:
+        migrate_data.migrate(source, target, id_scheme=CONTENT)
+
+    write_source(source, edited_rows())
+    changes = migrate_data.sync(source, target)
+    # L'ID dépend du parent : l'ensemble B rattaché à un autre parent est supprimé puis ajouté
+    assert changes == {"added": 3, "moved": 0, "updated": 1, "deleted": 2, "reordered": 1}
+
+    storage = SQLiteStorage(target) if target_name.endswith(".db") else ExcelStorage(target)
+    synced, _ = storage.load()
+    storage.close()
+    fresh = migrated_model(source, str(tmp_path / "fresh.xlsx"))
+    assert snapshot(synced) == snapshot(fresh)
+
+    # Source inchangée : aucune modification
+    assert set(migrate_data.sync(source, target).values()) == {0}
+
+
+def test_sync_without_target_is_a_content_migration(tmp_path, capsys):
+    source = str(tmp_path / "source.xlsx")
+    write_source(source, SOURCE_ROWS)
+    target = str(tmp_path / "interne.xlsx")
+    assert migrate_data.sync(source, target)["added"] == len(SOURCE_ROWS)
+    assert snapshot(TreeModel.from_dataframe(read_tree_workbook(target))[0]) == \
+           snapshot(migrated_model(source, str(tmp_path / "fresh.xlsx")))
+
+
+@pytest.mark.parametrize("target_name", ["interne.xlsx", "arbre.db"])
+def test_sync_restores_edits_made_in_the_target(tmp_path, capsys, target_name):
+    source = str(tmp_path / "source.xlsx")
+    write_source(source, SOURCE_ROWS)
+    fresh = migrated_model(source, str(tmp_path / "fresh.xlsx"))
+    target = str(tmp_path / target_name)
+    storage = SQLiteStorage(target) if target_name.endswith(".db") else ExcelStorage(target)
+    if target_name.endswith(".db"):
+        storage.add_nodes(fresh, [node_id for node_id, _ in fresh.walk()])
+    else:
+        migrate_data.migrate(source, target, id_scheme=CONTENT)
+    # Modifications faites dans l'application : déplacement, texte, ajout, suppression
+    core = TreeCore(storage, id_scheme=CONTENT)
+    core.load()
+    machine, outillage = core.model.get_children("")
+    ensemble_a = core.model.get_children(machine)[0]
+    core.move_subtree(ensemble_a, outillage)
+    core.edit_node(outillage, description="Outillage modifié")
+    core.add_node(machine, "90", "900-0001", "Ajout manuel")
+    core.delete_subtree(core.model.get_children(machine)[-2])
+    storage.close()
+
+    changes = migrate_data.sync(source, target)
+    assert changes == {"added": 1, "moved": 1, "updated": 1, "deleted": 1, "reordered": 1}
+    storage = SQLiteStorage(target) if target_name.endswith(".db") else ExcelStorage(target)
+    synced, _ = storage.load()
+    storage.close()
+    assert snapshot(synced) == snapshot(fresh)
@@ -0,0 +1,89 @@
+"""Noyau sans affichage (TreeCore) et ligne de commande tree_cli."""
+import os
+
+import pytest
+
+import tree_cli
+from conftest import sample_storage, snapshot
+from tree_core import TreeCore
+
+
+class RecordingView:
+    """Vue qui note les mises à jour ciblées reçues du noyau."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        if not name.startswith("view_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+
+@pytest.fixture
+def core(tmp_path):
+    storage = sample_storage("sqlite", tmp_path)
+    core = TreeCore(storage)
+    core.load()
+    yield core
+    storage.close()
+
+
+def test_view_receives_targeted_updates(tmp_path):
+    storage = sample_storage("sqlite", tmp_path)
+    view = RecordingView()
+    core = TreeCore(storage, view=view)
+    core.load()
+    core.edit_node("A", description="x")
+    core.undo()
+    assert [name for name, _, _ in view.calls] == ["view_update", "view_command_done", "view_update", "view_command_done"]
+    assert view.calls[-1][2] == {"undone": True}
+    storage.close()
+
+
+def test_unknown_id_scheme(tmp_path):
+    with pytest.raises(ValueError):
+        TreeCore(None, id_scheme="sequence")
+
+
+def test_stats_and_snapshot(core):
+    assert core.stats() == {"nodes": 6, "roots": 2, "leaves": 4, "depth": 3, "max_children": 2}
+    rows = core.snapshot()
+    assert [(row.node_id, row.level) for row in rows] == [(node_id, level) for node_id, level in core.model.walk()]
+    assert rows[2].chemin == core.path_string("A1")
+
+
+# ====== Ligne de commande ======
+
+def test_cli_import_on_a_database(tmp_path, capsys):
+    sample_storage("sqlite", tmp_path).close()
+    db_path = str(tmp_path / "arbre.db")
+    text_path = tmp_path / "export.txt"
+    text_path.write_text("\n".join(f"{i:04d}  {i:06d}-01  Pièce {i}" for i in range(1, 21)), encoding="utf-8")
+    assert tree_cli.main(["import-fixed-width", db_path, str(text_path), "--parent", "B", "--detect", "--stop-char", ""]) == 0
+    assert "20 éléments importés" in capsys.readouterr().out
+    core = tree_cli.load_core(db_path)
+    assert [core.model.nodes[node_id]["part_number"] for node_id in core.model.get_children("B")][:2] == ["000001-01", "000002-01"]
+    core.storage.close()
+
+
+def test_cli_import_rewrites_the_workbook(tmp_path):
+    storage = sample_storage("excel", tmp_path)
+    text_path = tmp_path / "export.txt"
+    text_path.write_text("010 315105-0153    Vis", encoding="utf-8")
+    assert tree_cli.main(["import-fixed-width", storage.excel_path, str(text_path), "--parent", "R2"]) == 0
+    assert not os.path.exists(storage.journal.path) or os.path.getsize(storage.journal.path) == 0
+    core = tree_cli.load_core(storage.excel_path)
+    assert len(core.model.get_children("R2")) == 1
+
+
+def test_cli_export_and_errors(tmp_path, capsys):
+    sample_storage("sqlite", tmp_path).close()
+    db_path = str(tmp_path / "arbre.db")
+    output = str(tmp_path / "export.xlsx")
+    assert tree_cli.main(["export", db_path, output]) == 0
+    assert snapshot(tree_cli.load_core(output).model) == snapshot(tree_cli.load_core(db_path).model)
+    assert tree_cli.main(["load", str(tmp_path / "absent.db")]) == 1
+    assert "Erreur" in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        tree_cli.parse_layout("0,3,4", "")
@@ -0,0 +1,153 @@
+"""Modèle de l'arbre : reconstruction depuis un classeur, opérations sur les sous-arbres, chemins en cache."""
+import numpy as np
+import pytest
+
+from conftest import SAMPLE_ROWS, tree_frame
+from tree_model import TreeModel, build_tree_index, report_summary
+
+
+def test_children_keep_file_order():
+    nodes, children, report = build_tree_index(tree_frame(SAMPLE_ROWS))
+    assert children[""] == ["R1", "R2"]
+    assert children["R1"] == ["A", "B"]
+    assert children["A"] == ["A1", "A2"]
+    assert nodes["A1"] == {"parent_id": "A", "part_number": "300-0001", "description": "Pièce A1", "position": "11"}
+    assert report_summary(report) is None
+
+
+def test_children_listed_before_their_parent():
+    rows = [SAMPLE_ROWS[2], SAMPLE_ROWS[3], SAMPLE_ROWS[1], SAMPLE_ROWS[0]]
+    _, children, _ = build_tree_index(tree_frame(rows))
+    assert children["A"] == ["A1", "A2"]
+    assert children["R1"] == ["A"]
+
+
+def test_orphans_are_attached_to_the_root():
+    nodes, children, report = build_tree_index(tree_frame(SAMPLE_ROWS + [("X", "absent", "", "999", "")]))
+    assert report["orphans"] == ["X"]
+    assert children[""][-1] == "X"
+    assert nodes["X"]["parent_id"] == ""
+
+
+def test_duplicate_ids_keep_the_first_row():
+    nodes, children, report = build_tree_index(tree_frame(SAMPLE_ROWS + [("A1", "B", "", "autre", "")]))
+    assert report["duplicates"] == ["A1"]
+    assert nodes["A1"]["parent_id"] == "A"
+    assert "B" not in children or "A1" not in children["B"]
+
+
+def test_cycles_are_reported_and_dropped_from_the_model():
+    rows = SAMPLE_ROWS + [("C1", "C2", "", "c1", ""), ("C2", "C1", "", "c2", ""), ("C3", "C3", "", "c3", "")]
+    model, report = TreeModel.from_dataframe(tree_frame(rows))
+    assert sorted(report["unreachable"]) == ["C1", "C2"]
+    # Un noeud qui est son propre parent est rattaché à la racine
+    assert model.parent("C3") == ""
+    assert "C1" not in model and "C2" not in model
+    assert "C1" not in model.children
+    assert report_summary(report)
+
+
+def test_empty_cells_become_empty_strings():
+    df = tree_frame([("R", np.nan, np.nan, "1", np.nan)])
+    nodes, children, _ = build_tree_index(df)
+    assert nodes["R"] == {"parent_id": "", "part_number": "1", "description": "", "position": ""}
+    assert children[""] == ["R"]
+
+
+def test_missing_optional_columns():
+    df = tree_frame(SAMPLE_ROWS)[["ID", "ParentID"]]
+    nodes, _, _ = build_tree_index(df)
+    assert nodes["A"]["part_number"] == "" and nodes["A"]["description"] == ""
+
+
+# ====== Opérations sur les sous-arbres ======
+
+def test_add_node_at_end_or_at_index(sample_model):
+    sample_model.add_node("N", "R1", "30", "400", "Nouveau")
+    sample_model.add_node("M", "R1", "05", "401", "Premier", index=0)
+    assert sample_model.get_children("R1") == ["M", "A", "B", "N"]
+    assert sample_model.index_of("N") == 3
+
+
+def test_add_node_rejects_duplicate_and_unknown_parent(sample_model):
+    with pytest.raises(ValueError):
+        sample_model.add_node("A", "R1", "", "", "")
+    with pytest.raises(KeyError):
+        sample_model.add_node("N", "absent", "", "", "")
+
+
+def test_remove_subtree_returns_prefix_rows(sample_model):
+    removed = sample_model.remove_subtree("A")
+    assert [node_id for node_id, _ in removed] == ["A", "A1", "A2"]
+    assert removed[1][1]["parent_id"] == "A"
+    assert sample_model.get_children("R1") == ["B"]
+    assert "A1" not in sample_model and "A" not in sample_model.children
+    assert len(sample_model) == 3
+
+
+def test_remove_subtrees_in_one_pass(sample_model):
+    removed = sample_model.remove_subtrees(["A1", "B", "absent"])
+    assert [node_id for node_id, _ in removed] == ["A1", "B"]
+    assert sample_model.get_children("A") == ["A2"]
+    assert sample_model.get_children("R1") == ["A"]
+
+
+def test_move_subtree(sample_model):
+    sample_model.move_subtree("A", "R2")
+    assert sample_model.get_children("R1") == ["B"]
+    assert sample_model.get_children("R2") == ["A"]
+    assert [node_id for node_id, _ in sample_model.iter_subtree("R2")] == ["R2", "A", "A1", "A2"]
+    sample_model.move_subtree("A2", "A", 0)
+    assert sample_model.get_children("A") == ["A2", "A1"]
+
+
+def test_move_into_own_subtree_is_refused(sample_model):
+    with pytest.raises(ValueError):
+        sample_model.move_subtree("R1", "A1")
+    assert sample_model.parent("R1") == ""
+
+
+def test_copy_subtree_creates_new_ids(sample_model):
+    ids = iter(["c1", "c2", "c3"])
+    copy_id = sample_model.copy_subtree("A", "B", new_id=lambda: next(ids))
+    assert copy_id == "c1"
+    assert sample_model.get_children("B") == ["c1"]
+    assert sample_model.get_children("c1") == ["c2", "c3"]
+    assert sample_model.nodes["c2"]["part_number"] == "300-0001"
+    assert sample_model.count_subtree("R1") == 8
+
+
+def test_walk_and_count(sample_model):
+    assert [(node_id, level) for node_id, level in sample_model.walk()] == [
+        ("R1", 0), ("A", 1), ("A1", 2), ("A2", 2), ("B", 1), ("R2", 0)]
+    assert sample_model.count_subtree("A") == 3
+    assert sample_model.is_ancestor("R1", "A2")
+    assert not sample_model.is_ancestor("B", "A2")
+
+
+# ====== Chemins et ancêtres en cache ======
+
+def test_path_string_and_ancestors(sample_model):
+    assert sample_model.ancestors("A2") == ("R1", "A", "A2")
+    assert sample_model.path_string("A1") == "Pièce A1 - Ensemble A - Racine 1"
+    # Sans description, le part number sert de nom
+    assert sample_model.path_string("A2") == "300-0002 - Ensemble A - Racine 1"
+
+
+def test_iter_paths_matches_path_string(sample_model):
+    paths = {node_id: path for node_id, _, path in sample_model.iter_paths()}
+    fresh, _ = TreeModel.from_dataframe(tree_frame(SAMPLE_ROWS))
+    assert paths == {node_id: fresh.path_string(node_id) for node_id in fresh.nodes}
+
+
+def test_caches_follow_renames_and_moves(sample_model):
+    sample_model.path_string("A1")
+    sample_model.ancestors("A1")
+    sample_model.update_node("A", description="Ensemble renommé")
+    assert sample_model.path_string("A1") == "Pièce A1 - Ensemble renommé - Racine 1"
+    sample_model.move_subtree("A", "R2")
+    assert sample_model.ancestors("A1") == ("R2", "A", "A1")
+    assert sample_model.path_string("A1") == "Pièce A1 - Ensemble renommé - Racine 2"
+    sample_model.place_subtrees([("A1", "B", None)])
+    assert sample_model.ancestors("A1") == ("R1", "B", "A1")
+    assert sample_model.path_string("A1") == "Pièce A1 - Ensemble B - Racine 1"
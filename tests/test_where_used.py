@@ -0,0 +1,62 @@
+"""Cas d'emploi : index inverse par part number normalisé, tenu à jour par le modèle."""
+import pytest
+
+from where_used import WhereUsedIndex, normalize_part_number
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("315105-0153", "315105-0153"),
+    (" 315105 - 0153 ", "315105-0153"),
+    ("AbC-12", "abc-12"),
+    ("1234567.0", "1234567"),
+    (1234567.0, "1234567"),
+    ("12.05", "12.05"),
+    ("", ""),
+])
+def test_normalize_part_number(raw, key):
+    assert normalize_part_number(raw) == key
+
+
+def built_index(model):
+    index = WhereUsedIndex()
+    index.build(model)
+    model.add_listener(index)
+    return index
+
+
+def test_lookup_ignores_case_and_spaces(sample_model):
+    sample_model.add_node("X", "R2", "", "200-0001 ", "Autre occurrence de A")
+    index = built_index(sample_model)
+    assert index.lookup(" 200-0001") == ["A", "X"]
+    assert index.lookup("999") == []
+
+
+def test_follows_model_edits(sample_model):
+    index = built_index(sample_model)
+    sample_model.add_node("X", "B", "", "300-0001", "")
+    assert index.lookup("300-0001") == ["A1", "X"]
+    sample_model.update_node("A1", part_number="300-0009")
+    assert index.lookup("300-0001") == ["X"]
+    assert index.lookup("300-0009") == ["A1"]
+    # La description ne change pas l'index
+    sample_model.update_node("X", description="Pièce X")
+    assert index.lookup("300-0001") == ["X"]
+    sample_model.remove_subtree("R1")
+    assert index.lookup("300-0009") == [] and index.lookup("300-0001") == []
+    assert len(index) == 1
+
+
+def test_empty_part_numbers_are_not_indexed(sample_model):
+    sample_model.add_node("X", "B", "", "  ", "")
+    index = built_index(sample_model)
+    assert index.lookup("") == []
+    assert len(index) == 6
+
+
+def test_not_updated_before_build(sample_model):
+    index = WhereUsedIndex()
+    sample_model.add_listener(index)
+    sample_model.add_node("X", "B", "", "300-0001", "")
+    assert not index.built and len(index) == 0
+    index.build(sample_model)
+    assert index.lookup("300-0001") == ["A1", "X"]
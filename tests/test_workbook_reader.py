@@ -0,0 +1,75 @@
+"""Lecture en flux des classeurs : recherche bornée de l'en-tête, paquets, valeurs conservées."""
+import openpyxl
+import pandas as pd
+import pytest
+
+import migrate_data
+from workbook_reader import TreeWorkbookReader
+
+
+def write_rows(path, rows):
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def titled(tmp_path):
+    """Classeur avec zone de titre (comme l'export mis en forme), en-tête à la ligne 3."""
+    return write_rows(tmp_path / "titre.xlsx", [
+        ["📍 CHEMIN : ..."],
+        [],
+        ["Position", "PartNumber", "Description", None, None],
+        ["10", 1234567, "Pièce", "en trop"],
+        ["20", None],
+        ["30", "315105-0153", "Vis"],
+    ])
+
+
+def test_header_after_title_rows(titled):
+    with TreeWorkbookReader(titled, ["PartNumber"]) as reader:
+        assert reader.header_row == 2
+        assert reader.columns == ["Position", "PartNumber", "Description"]
+        df = reader.read()
+    # Lignes plus courtes ou plus longues que l'en-tête ; part number numérique non converti
+    assert df["PartNumber"].tolist()[0] == 1234567
+    assert isinstance(df["PartNumber"].tolist()[0], int)
+    assert df["Description"].isna().tolist() == [False, True, False]
+    assert list(df.columns) == ["Position", "PartNumber", "Description"]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 50])
+def test_chunks_cover_every_row_once(titled, chunk_rows):
+    with TreeWorkbookReader(titled, ["PartNumber"]) as reader:
+        chunks = list(reader.chunks(chunk_rows))
+    assert all(len(chunk) <= chunk_rows for chunk in chunks)
+    with TreeWorkbookReader(titled, ["PartNumber"]) as reader:
+        whole = reader.read()
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
+
+
+def test_header_search_is_bounded(tmp_path):
+    path = write_rows(tmp_path / "loin.xlsx", [["Titre"]] * 5 + [["ID", "ParentID"], ["a", ""]])
+    with TreeWorkbookReader(path, ["ID"], scan_rows=3) as reader:
+        # En-tête non trouvé : les colonnes sont celles de la première ligne
+        assert reader.header_row is None
+        assert reader.columns == ["Titre"]
+    with TreeWorkbookReader(path, ["ID"], scan_rows=10) as reader:
+        assert reader.header_row == 5
+        assert reader.read()["ID"].tolist() == ["a"]
+
+
+def test_empty_workbook(tmp_path):
+    path = write_rows(tmp_path / "vide.xlsx", [])
+    with TreeWorkbookReader(path, ["ID"]) as reader:
+        assert reader.empty and reader.header_row is None and reader.columns == []
+        assert reader.read().empty
+
+
+def test_migrate_reports_the_excel_header_row(tmp_path, capsys):
+    source = write_rows(tmp_path / "source.xlsx", [["Nomenclature"], [], ["Position", "PartNumber", "Description", "Niveau"],
+                                                   ["1", "A", "Machine", 0], ["1.1", "B", "Ensemble", 1]])
+    assert migrate_data.migrate(source, str(tmp_path / "cible.xlsx")) == 2
+    assert "En-tête trouvé à la ligne 3" in capsys.readouterr().out